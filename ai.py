@@ -0,0 +1,209 @@
+"""CPU drivers
+
+Each track gets a racing line when it is compiled: a closed Catmull-Rom
+spline through the checkpoint centres, resampled every LINE_SPACING pixels
+(see racingLine()). A CPUDriver follows it with every CPU car at once. It
+tracks each car's place on the line with a short forward search, then
+plans steering, throttle and power-up use for all of them in one
+vectorized pass. The work per car is constant, however long the track
+is and however many cars there are.
+"""
+import numpy as np
+from enum import Enum
+import fastmath
+from driving import PowerupType
+
+LINE_SPACING = 4  # distance between racing line samples, in pixels
+SEGMENT_SAMPLES = 64  # spline samples between two checkpoints
+
+
+class Difficulty(Enum):
+    EASY = 0
+    MEDIUM = 1
+    HARD = 2
+
+
+# closed Catmull-Rom spline through the points, evenly resampled
+def racingLine(points, spacing=LINE_SPACING):
+    p1 = np.asarray(points, dtype=float)
+    p0 = np.roll(p1, 1, axis=0)
+    p2 = np.roll(p1, -1, axis=0)
+    p3 = np.roll(p1, -2, axis=0)
+    t = np.linspace(0, 1, SEGMENT_SAMPLES, endpoint=False)[:, np.newaxis,
+                                                           np.newaxis]
+    curve = 0.5 * (2 * p1 + (p2 - p0) * t
+                   + (2 * p0 - 5 * p1 + 4 * p2 - p3) * t ** 2
+                   + (3 * p1 - p0 - 3 * p2 + p3) * t ** 3)
+    dense = curve.transpose(1, 0, 2).reshape(-1, 2)
+    dense = np.vstack([dense, dense[:1]])
+
+    # distance along the curve, to place samples evenly
+    steps = np.diff(dense, axis=0)
+    lengths = np.concatenate([[0], np.cumsum(
+        fastmath.vhypot(steps[:, 0], steps[:, 1]))])
+    s = np.arange(0, lengths[-1], spacing)
+    return np.stack([np.interp(s, lengths, dense[:, 0]),
+                     np.interp(s, lengths, dense[:, 1])], axis=1)
+
+
+class CPUDriver:
+    """drives every CPU car along a track's racing line"""
+    LOOKAHEAD = {Difficulty.EASY: 40,
+                 Difficulty.MEDIUM: 50,
+                 Difficulty.HARD: 60}  # distance to the steering target
+    PACE = {Difficulty.EASY: 0.7,
+            Difficulty.MEDIUM: 0.85,
+            Difficulty.HARD: 1.0}  # fraction of the car's top speed
+    LANE_SPREAD = {Difficulty.EASY: 12,
+                   Difficulty.MEDIUM: 8,
+                   Difficulty.HARD: 4}  # largest offset from the line
+    REACTION = {Difficulty.EASY: 0.01,
+                Difficulty.MEDIUM: 0.05,
+                Difficulty.HARD: 0.2}  # chance per frame to use a power-up
+    CORNER_SLOWDOWN = 0.4  # speed given up in a U-turn
+    STRAIGHT_LENGTH = 120  # distance that must be straight to use a boost
+    STRAIGHT_ANGLE = 0.3  # most a straight can turn, in radians
+    SEARCH_BACK = 4  # line samples searched behind a car
+    SEARCH_AHEAD = 12  # line samples searched ahead of a car
+    LOST_DISTANCE = 100  # distance from the line to search all of it again
+    # power-ups the driver decides when to use, the others can't wait
+    HELD_POWERUPS = (PowerupType.RANDOMIZER, PowerupType.POWER_WHEELS,
+                     PowerupType.CONTROLLED_BOOST)
+
+    def __init__(self, line, difficulty=Difficulty.MEDIUM, rng=None):
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.line = np.asarray(line, dtype=float)
+        self.difficulty = difficulty
+        n = len(self.line)
+
+        # unit normals of the line, to offset cars into lanes
+        tangents = np.roll(self.line, -1, axis=0) \
+            - np.roll(self.line, 1, axis=0)
+        lengths = fastmath.vhypot(tangents[:, 0], tangents[:, 1])
+        tangents /= np.maximum(lengths, 1e-9)[:, np.newaxis]
+        self.normals = np.stack([-tangents[:, 1], tangents[:, 0]], axis=1)
+
+        # how much the line turns over the lookahead, and the next straight
+        headings = fastmath.vatan2(tangents[:, 1], tangents[:, 0])
+        self.lookahead = max(1, round(self.LOOKAHEAD[difficulty]
+                                      / self._spacing()))
+        turn = self._turn(headings, self.lookahead)
+        self.pace = self.PACE[difficulty] \
+            * (1 - self.CORNER_SLOWDOWN * turn / fastmath.pi)
+        straight = max(1, round(self.STRAIGHT_LENGTH / self._spacing()))
+        self.straight = self._turn(headings, straight) < self.STRAIGHT_ANGLE
+
+        self.window = np.arange(-self.SEARCH_BACK, self.SEARCH_AHEAD + 1)
+        self.slot = {}  # car -> index into the arrays below
+        self.index = np.zeros(0, dtype=int)  # place of each car on the line
+        self.lane = np.zeros(0)  # offset of each car from the line
+        self.samples = n
+
+    def addCar(self, car):
+        self.slot[car] = len(self.index)
+        self.index = np.append(self.index,
+                               self._nearest(np.array([car.rect.center]))[0])
+        spread = self.LANE_SPREAD[self.difficulty]
+        self.lane = np.append(self.lane, self.rng.uniform(-spread, spread))
+
+    # steers the cars and uses their power-ups
+    def drive(self, cars):
+        if not cars:
+            return
+        slots = self.slots(cars)
+        positions = np.array([car.rect.center for car in cars], dtype=float)
+        self.apply(cars, *self.plan(slots, positions))
+
+    def slots(self, cars):
+        return np.fromiter((self.slot[car] for car in cars), dtype=int,
+                           count=len(cars))
+
+    # steers the cars as planned
+    def apply(self, cars, angles, pace, use, release):
+        for car, angle, carPace, useNow, releaseNow in zip(cars, angles, pace,
+                                                           use, release):
+            car.steer(angle, carPace * car.MAX_FWD_SPEED)
+            if car.hasPower() and car.power.type in self.HELD_POWERUPS:
+                if useNow and not car.powerActive:
+                    car.activatePower()
+                elif releaseNow and car.powerActive:
+                    car.deactivatePower()
+
+    # headings in degrees, fractions of top speed, and whether to use or
+    # let go of a held power-up, for the cars in the slots
+    def plan(self, slots, positions):
+        index, angles, pace, use, release = self.follow(
+            self.index[slots], self.lane[slots], positions,
+            self.rng.random(len(slots)))
+        self.index[slots] = index
+        return angles, pace, use, release
+
+    # plan() for cars at positions, given their last places on the line,
+    # their lanes and a uniform draw each deciding whether they react;
+    # returns their new places first
+    def follow(self, index, lane, positions, chances):
+        n = self.samples
+        # follow each car's place along the line
+        window = (index[:, np.newaxis] + self.window) % n
+        offsets = self.line[window] - positions[:, np.newaxis]
+        distances = (offsets ** 2).sum(axis=2)
+        nearest = np.argmin(distances, axis=1)
+        rows = np.arange(len(index))
+        index = window[rows, nearest]
+        lost = distances[rows, nearest] > self.LOST_DISTANCE ** 2
+        if lost.any():
+            index[lost] = self._nearest(positions[lost])
+
+        # aim at a point further along the car's lane
+        target = (index + self.lookahead) % n
+        aim = self.line[target] \
+            + self.normals[target] * lane[:, np.newaxis] - positions
+        angles = -fastmath.vdegrees(fastmath.vatan2(aim[:, 1], aim[:, 0]))
+
+        use = self.straight[index] \
+            & (chances < self.REACTION[self.difficulty])
+        release = ~self.straight[index]
+        return index, angles, self.pace[index], use, release
+
+    # index of the line sample nearest to each position
+    def _nearest(self, positions):
+        offsets = self.line[np.newaxis] - positions[:, np.newaxis]
+        return np.argmin((offsets ** 2).sum(axis=2), axis=1)
+
+    # most the line's heading changes within the next `ahead` samples
+    def _turn(self, headings, ahead):
+        n = len(headings)
+        later = headings[(np.arange(n)[:, np.newaxis]
+                          + np.arange(1, ahead + 1)) % n]
+        change = np.abs((later - headings[:, np.newaxis] + fastmath.pi)
+                        % (2 * fastmath.pi) - fastmath.pi)
+        return change.max(axis=1)
+
+    # average distance between line samples
+    def _spacing(self):
+        steps = np.diff(np.vstack([self.line, self.line[:1]]), axis=0)
+        return fastmath.vhypot(steps[:, 0], steps[:, 1]).mean()
+
+
+# drive() for the CPU cars of several races on the same line at once,
+# carsOf[i] being driven by drivers[i]; every driver keeps its own places
+# and random draws, so each race plays out as if driven on its own
+def driveAll(drivers, carsOf):
+    drivers = [driver for driver, cars in zip(drivers, carsOf) if cars]
+    carsOf = [cars for cars in carsOf if cars]
+    if not drivers:
+        return
+    slots = [driver.slots(cars) for driver, cars in zip(drivers, carsOf)]
+    cars = [car for group in carsOf for car in group]
+    positions = np.array([car.rect.center for car in cars], dtype=float)
+    index, angles, pace, use, release = drivers[0].follow(
+        np.concatenate([driver.index[s] for driver, s in zip(drivers, slots)]),
+        np.concatenate([driver.lane[s] for driver, s in zip(drivers, slots)]),
+        positions,
+        np.concatenate([driver.rng.random(len(s)) for driver, s
+                        in zip(drivers, slots)]))
+    start = 0
+    for driver, s in zip(drivers, slots):
+        driver.index[s] = index[start:start + len(s)]
+        start += len(s)
+    drivers[0].apply(cars, angles, pace, use, release)
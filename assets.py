@@ -0,0 +1,299 @@
+"""shared images and sounds, decoded ahead of time
+
+Each scene lists the files it needs in its ASSETS. preload() hands them
+to a thread pool, which reads and decodes them (PNG decoding releases the
+GIL). image() and sound() return the shared copy of a file: they only wait
+if the file is still being decoded, and load it there and then if it was
+never preloaded. Images are converted to the display's format the first
+time they are asked for, or by convertReady() between frames, since
+convert() needs the display.
+
+Files packed into the archive skip all of that. compile() decodes every
+file in resources/ once into resources.pack, next to this module:
+
+    header    magic, then a JSON header of the source files' sizes and
+              modification times, the mixer format and an index of entries
+    images    BGRA bytes per image, made opaque as convert() would
+    sounds    raw PCM samples per sound, in the mixer's format
+
+load() memory-maps the archive (compiling it first if it is missing or
+stale) and the loader makes images straight out of the mapping with
+pygame.image.frombuffer(), so they are neither decoded nor copied. Run
+`python assets.py` to build it ahead of time.
+
+Assets are shared, so callers must not draw on them or change their
+colorkey or alpha: utilities.load_image() returns a copy for that.
+"""
+import os
+import json
+import mmap
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pygame
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+RESOURCES = os.path.join(HERE, 'resources')  # directory assets are loaded from
+ARCHIVE = os.path.join(HERE, 'resources.pack')
+WORKERS = 4  # decoding threads
+
+MAGIC = b'BRASSET1'
+VERSION = 1
+ALIGN = 64  # alignment of the entries in the archive
+MASKS = (0xff0000, 0xff00, 0xff)  # display masks BGRA pixels blit from as is
+
+
+def path(name):
+    return os.path.join(RESOURCES, name)
+
+
+def isSound(name):
+    return name.endswith('.wav')
+
+
+def isAsset(name):
+    return isSound(name) or name.endswith('.png')
+
+
+# reads and decodes a file, on a worker thread
+def decode(name):
+    if isSound(name):
+        return pygame.mixer.Sound(path(name))
+    return pygame.image.load(path(name))
+
+
+# size and modification time of each file in resources/
+def sources():
+    stamps = {}
+    for name in sorted(os.listdir(RESOURCES)):
+        if isAsset(name):
+            stat = os.stat(path(name))
+            stamps[name] = [stat.st_size, stat.st_mtime_ns]
+    return stamps
+
+
+def load(archive=ARCHIVE):
+    header = _readHeader(archive)
+    if header is None or header['sources'] != sources() \
+            or header['mixer'] != _mixer():
+        compile(archive)
+        header = _readHeader(archive)
+
+    with open(archive, 'rb') as f:
+        # copy-on-write, so a stray draw on a shared image can't crash
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    return Archive(header, buffer)
+
+
+def compile(archive=ARCHIVE):
+    header = {'version': VERSION, 'sources': sources(), 'mixer': _mixer(),
+              'entries': {}}
+    blobs = []
+    for name in header['sources']:
+        if isSound(name):
+            if header['mixer'] is None:
+                continue  # no mixer to decode it for
+            blobs.append((name, decode(name).get_raw(), {'kind': 'sound'}))
+        else:
+            image = pygame.image.load(path(name))
+            pixels = bytearray(pygame.image.tostring(image, 'BGRA'))
+            pixels[3::4] = b'\xff' * (len(pixels) // 4)
+            blobs.append((name, pixels, {'kind': 'image',
+                                         'size': list(image.get_size())}))
+    # lay out the entries, then write the header in front of them
+    headerLength = 4096
+    while True:
+        offset = _align(len(MAGIC) + 4 + headerLength)
+        for name, blob, meta in blobs:
+            header['entries'][name] = dict(meta, offset=offset,
+                                           length=len(blob))
+            offset = _align(offset + len(blob))
+        encoded = json.dumps(header).encode('utf-8')
+        if len(encoded) <= headerLength:
+            break
+        headerLength = 2 * len(encoded)
+
+    # written aside and moved into place, as a running game may map it
+    partial = archive + '.partial'
+    with open(partial, 'wb') as f:
+        f.write(MAGIC)
+        f.write(len(encoded).to_bytes(4, 'little'))
+        f.write(encoded)
+        for name, blob, meta in blobs:
+            f.seek(header['entries'][name]['offset'])
+            f.write(blob)
+    os.replace(partial, archive)
+
+
+def _mixer():
+    init = pygame.mixer.get_init() if pygame.mixer else None
+    return list(init) if init else None
+
+
+def _align(offset):
+    return -(-offset // ALIGN) * ALIGN
+
+
+def _readHeader(archive):
+    try:
+        with open(archive, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                return None
+            length = int.from_bytes(f.read(4), 'little')
+            header = json.loads(f.read(length).decode('utf-8'))
+    except (OSError, ValueError):
+        return None
+    if header.get('version') != VERSION:
+        return None
+    return header
+
+
+class Archive:
+    """the packed assets, viewed out of a memory-mapped resources.pack"""
+
+    def __init__(self, header, buffer):
+        self.entries = header['entries']
+        self.buffer = buffer
+        self.view = memoryview(buffer)
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    def data(self, name):
+        entry = self.entries[name]
+        return self.view[entry['offset']:entry['offset'] + entry['length']]
+
+    # an image over the archive's memory; needs the display, like convert()
+    def image(self, name):
+        image = pygame.image.frombuffer(self.data(name),
+                                        self.entries[name]['size'], 'BGRA')
+        display = pygame.display.get_surface()
+        if display is None:
+            raise pygame.error("no display to convert {0} for".format(name))
+        if display.get_bitsize() == 32 and display.get_masks()[:3] == MASKS:
+            # same layout as the display: blit without blending
+            image.set_alpha(None)
+            return image
+        return image.convert()
+
+    def sound(self, name):
+        return pygame.mixer.Sound(buffer=self.data(name))
+
+
+class Loader:
+    """decodes assets on a thread pool and caches them
+
+    Files in the archive are taken from it instead; archive=None always
+    decodes the files.
+    """
+
+    def __init__(self, workers=WORKERS, archive=ARCHIVE):
+        self.workers = workers
+        self.archivePath = archive
+        self.archive = None
+        self.opening = threading.Lock()  # held while mapping the archive
+        self.pool = None
+        self.pending = {}  # name -> future of the decoded file
+        self.loaded = {}  # name -> converted image or sound
+        self.lock = threading.Lock()
+
+    # maps the archive on first use, building it if needed
+    def packed(self, name):
+        with self.opening:
+            if self.archivePath is not None and self.archive is None:
+                try:
+                    self.archive = load(self.archivePath)
+                except (OSError, pygame.error) as message:
+                    print('Cannot use {0}: {1}'.format(self.archivePath,
+                                                      message))
+                    self.archivePath = None  # decode the files instead
+        return self.archive is not None and name in self.archive
+
+    # the decoded file, or None if it is in the archive
+    def fetch(self, name):
+        return None if self.packed(name) else decode(name)
+
+    # queues files on the pool; mapping the archive, and building it on a
+    # cold start, happens there too, not on the caller's thread
+    def preload(self, names):
+        with self.lock:
+            for name in names:
+                if name in self.loaded or name in self.pending:
+                    continue
+                if self.pool is None:
+                    self.pool = ThreadPoolExecutor(self.workers,
+                                                   thread_name_prefix='assets')
+                self.pending[name] = self.pool.submit(self.fetch, name)
+
+    # whether a file can be had without waiting on decoding
+    def ready(self, name):
+        with self.lock:
+            future = self.pending.get(name)
+            return name in self.loaded \
+                or (future is not None and future.done()) \
+                or (self.archive is not None and name in self.archive)
+
+    # fraction of the files that are ready
+    def progress(self, names):
+        names = set(names)
+        if not names:
+            return 1
+        return sum(self.ready(name) for name in names) / len(names)
+
+    # converts images that finished decoding; returns how many were
+    def convertReady(self):
+        with self.lock:
+            done = [name for name, future in self.pending.items()
+                    if future.done() and not isSound(name)]
+        for name in done:
+            self.get(name)
+        return len(done)
+
+    def image(self, name):
+        try:
+            return self.get(name)
+        except pygame.error as message:
+            print('Cannot load image: {0}'.format(name))
+            raise SystemExit(message)
+
+    def sound(self, name):
+        try:
+            return self.get(name)
+        except pygame.error as message:
+            print('Cannot load sound: {0}'.format(name))
+            raise SystemExit(message)
+
+    def get(self, name):
+        with self.lock:
+            asset = self.loaded.get(name)
+            future = self.pending.pop(name, None)
+        if asset is not None:
+            return asset
+        asset = future.result() if future is not None else self.fetch(name)
+        if asset is None:
+            asset = self.archive.sound(name) if isSound(name) \
+                else self.archive.image(name)
+        elif not isSound(name):
+            asset = asset.convert()
+        with self.lock:
+            return self.loaded.setdefault(name, asset)
+
+
+loader = Loader()
+
+
+def preload(names):
+    loader.preload(names)
+
+
+def image(name):
+    return loader.image(name)
+
+
+def sound(name):
+    return loader.sound(name)
+
+
+if __name__ == '__main__':
+    pygame.init()
+    compile()
+    print("Packed {0} to {1}".format(RESOURCES, ARCHIVE))
@@ -0,0 +1,579 @@
+import os
+import sys
+import time
+import argparse
+
+# benchmarks run headless
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import numpy as np
+import pygame
+
+pygame.init()
+screen = pygame.display.set_mode((1000, 800))
+
+import scenes
+import driving
+import colors
+import utilities
+import fastmath
+import geometry as geo
+
+
+# initializes a scene and skips countdowns so it goes straight to gameplay
+def start_scene(scene):
+    scene.initGraphics(screen)
+    scene.initialized = True
+    if isinstance(scene, scenes.DrivingScene):
+        scene.started = True
+        scene.startTime = scene.clock()
+    return scene
+
+
+# fills a driving scene up to n cars by adding CPU cars at the start line
+def add_cars(scene, n):
+    screenWidth, screenHeight = scene.viewport.size()
+    for i in range(len(scene.cars), n):
+        scene.addCar(driving.Car((50, screenHeight / 2), 90, colors.BLUE,
+                                 'CPU {0}'.format(i), isCPU=True))
+    scene.spaceoutCars(0, 0.2 * screenWidth / 2, True)
+    return scene
+
+
+# runs a scene for a number of frames, returns the seconds per frame
+def run_frames(scene, frames):
+    start = time.perf_counter()
+    for i in range(frames):
+        scene.ProcessInput([], pygame.key.get_pressed())
+        scene.Update()
+        scene.Render()
+    return (time.perf_counter() - start) / frames
+
+
+# counts the pygame.display.Info() driver queries made per frame
+def bench_display_info(frames=300):
+    info = pygame.display.Info
+    calls = [0]
+
+    def counted():
+        calls[0] += 1
+        return info()
+
+    start = time.perf_counter()
+    for i in range(10000):
+        info()
+    cost = (time.perf_counter() - start) / 10000
+
+    print("pygame.display.Info(): {0:.2f} us per call".format(cost * 1e6))
+    pygame.display.Info = counted
+    try:
+        for scene in [scenes.DrivingScene(), scenes.CopterScene(),
+                      scenes.TestScene()]:
+            start_scene(scene)
+            calls[0] = 0
+            run_frames(scene, frames)
+            print("{0}: {1:.1f} driver calls per frame"
+                  .format(type(scene).__name__, calls[0] / frames))
+    finally:
+        pygame.display.Info = info
+
+
+# per-frame cost of the car code (steering, physics and drawing) with
+# fastmath's scalar paths against the same code running on NumPy ufuncs
+def bench_fastmath(frames=300, repeats=5):
+    scalar = {name: getattr(fastmath, name)
+              for name in ['radians', 'degrees', 'cos', 'sin', 'ceil']}
+    ufuncs = {name: getattr(np, name) for name in scalar}
+
+    def drive(cars):
+        start = time.perf_counter()
+        for i in range(frames):
+            for car in cars:
+                car.driveTowards(target)
+            cars.update()
+            cars.draw(screen)
+        return (time.perf_counter() - start) / frames
+
+    for ncars in [4, 100]:
+        scene = add_cars(start_scene(scenes.DrivingScene()), ncars)
+        target = geo.Vector2D(*scene.checkpoints[1].rect.center)
+        timings = {'numpy': np.inf, 'fastmath': np.inf}
+        try:
+            for i in range(repeats):
+                for label, funcs in [('numpy', ufuncs), ('fastmath', scalar)]:
+                    for name, func in funcs.items():
+                        setattr(fastmath, name, func)
+                    timings[label] = min(timings[label], drive(scene.cars))
+        finally:
+            for name, func in scalar.items():
+                setattr(fastmath, name, func)
+        print("{0:>3} cars: numpy {1:.3f} ms, fastmath {2:.3f} ms, "
+              "saving {3:.3f} ms per frame"
+              .format(ncars, timings['numpy'] * 1e3,
+                      timings['fastmath'] * 1e3,
+                      (timings['numpy'] - timings['fastmath']) * 1e3))
+
+
+# per-car cost of the CPU driver: the vectorized planning pass alone, and
+# together with steering every car
+def bench_ai(frames=300):
+    for ncars in [4, 100, 500]:
+        scene = add_cars(start_scene(scenes.DrivingScene()), ncars)
+        cars = scene.cars.sprites()
+        slots = np.arange(len(cars))
+        positions = np.array([car.rect.center for car in cars], dtype=float)
+
+        start = time.perf_counter()
+        for i in range(frames):
+            scene.driver.plan(slots, positions)
+        plan = (time.perf_counter() - start) / frames
+
+        start = time.perf_counter()
+        for i in range(frames):
+            scene.driver.drive(cars)
+        drive = (time.perf_counter() - start) / frames
+        print("{0:>3} cars: plan {1:.3f} ms ({2:.2f} us per car), "
+              "drive {3:.3f} ms ({4:.2f} us per car)"
+              .format(ncars, plan * 1e3, plan / ncars * 1e6,
+                      drive * 1e3, drive / ncars * 1e6))
+
+
+# environment steps per second, for one race and for K races in lockstep,
+# driving with random actions
+def bench_env(steps=3000):
+    import env
+    rng = np.random.default_rng(0)
+    single = env.DrivingEnv()
+    single.reset(seed=0)
+    start = time.perf_counter()
+    for i in range(steps):
+        obs, reward, done, info = single.step(rng.uniform(-1, 1, 3))
+        if done:
+            single.reset()
+    rate = steps / (time.perf_counter() - start)
+    print("DrivingEnv: {0:.0f} steps/s".format(rate))
+
+    for k in [8, 32]:
+        vec = env.DrivingVecEnv(k)
+        vec.reset(seed=0)
+        start = time.perf_counter()
+        for i in range(steps // k):
+            vec.step(rng.uniform(-1, 1, (k, env.DrivingEnv.ACTION_SIZE)))
+        rate = (steps // k) * k / (time.perf_counter() - start)
+        print("DrivingVecEnv({0}): {1:.0f} env-steps/s".format(k, rate))
+
+
+def bench_copter_env(steps=3000):
+    import env
+    rng = np.random.default_rng(0)
+    single = env.CopterEnv()
+    single.reset(seed=0)
+    start = time.perf_counter()
+    for i in range(steps):
+        obs, reward, done, info = single.step(rng.random() < 0.5, True,
+                                              rng.uniform(-30, 30))
+        if done:
+            single.reset()
+    rate = steps / (time.perf_counter() - start)
+    print("CopterEnv: {0:.0f} steps/s".format(rate))
+
+    for m in [64, 256, 1024]:
+        vec = env.CopterVecEnv(m)
+        vec.reset(seed=0)
+        start = time.perf_counter()
+        for i in range(steps // 10):
+            vec.step(rng.random(m) < 0.5, True, rng.uniform(-30, 30, m))
+        rate = (steps // 10) * m / (time.perf_counter() - start)
+        print("CopterVecEnv({0}): {1:.0f} env-steps/s, {2:.0f}M per hour"
+              .format(m, rate, rate * 3600 / 1e6))
+
+
+# frame pacing of a race in sequential and threaded mode, when every
+# hitchEvery-th present stalls for `hitch` seconds of extra scaling work
+def bench_frameloop(frames=600, hitchEvery=30, hitch=0.05):
+    import frameloop
+    from viewport import Display
+
+    class HitchDisplay(Display):
+        presented = 0
+
+        def present(self):
+            Display.present(self)
+            self.presented += 1
+            if self.presented % hitchEvery == 0:
+                end = time.perf_counter() + hitch
+                while time.perf_counter() < end:
+                    pygame.transform.smoothscale(self.target,
+                                                 self.window.get_size())
+
+    display = HitchDisplay(1000, 800)
+    for name, run in [('sequential', frameloop.runSequential),
+                      ('threaded', frameloop.runThreaded)]:
+        scene = start_scene(scenes.DrivingScene(
+            rng=np.random.default_rng(0), saveResults=False))
+        scene.player.isCPU = True
+        profiler = run(display, 60, scene, frames=frames)
+        print("{0}:".format(name))
+        print(profiler.report())
+
+
+# run in a fresh interpreter by bench_startup: seconds from `spawned` (a
+# time.time() in the parent) to the first menu frame, then seconds to the
+# first frame of each scene after a second on the menu
+def startup_probe(preload, spawned, archive=False):
+    import json
+    import assets
+    import copter
+    from viewport import Display
+    if not archive:
+        assets.loader = assets.Loader(archive=None)
+    if not preload:
+        assets.preload = lambda names: None
+
+    display = Display(1000, 800)
+    clock = pygame.time.Clock()
+    start = start_scene(scenes.Start())
+    start.Render()
+    display.present()
+    times = {'menu': time.time() - spawned}
+
+    # a second on the menu, as a player would take to choose
+    end = time.perf_counter() + 1
+    while time.perf_counter() < end:
+        start.Update()
+        start.Render()
+        display.present()
+        clock.tick(60)
+
+    for name, make in [('driving', scenes.DrivingScene),
+                       ('copter', scenes.CopterScene),
+                       ('test', scenes.TestScene)]:
+        begin = time.perf_counter()
+        scene = start_scene(make(saveResults=False) if name != 'test'
+                            else make())
+        scene.ProcessInput([], pygame.key.get_pressed())
+        scene.Update()
+        scene.Render()
+        display.present()
+        times[name] = time.perf_counter() - begin
+
+    # things the copter game used to load mid-game
+    begin = time.perf_counter()
+    scene.copter = copter.Copter((0, 0), scene.viewport)
+    scene.copter.shootAt(0)
+    times['first shot'] = time.perf_counter() - begin
+    begin = time.perf_counter()
+    copter.Explosion((0, 0))
+    times['first explosion'] = time.perf_counter() - begin
+    print(json.dumps(times))
+
+
+# cold start to an interactive menu, and time to each scene's first frame,
+# with and without preloading or the packed archive, each in a fresh
+# interpreter
+def bench_startup(runs=3):
+    import json
+    import subprocess
+    import assets
+    assets.load()  # build the archive if it is stale
+    for mode, preload, archive in [('lazy', False, False),
+                                   ('preloaded', True, False),
+                                   ('archive', True, True)]:
+        results = []
+        for i in range(runs):
+            code = "import benchmark; " \
+                "benchmark.startup_probe({0}, {1!r}, {2})"\
+                .format(preload, time.time(), archive)
+            output = subprocess.run([sys.executable, '-c', code],
+                                    capture_output=True, text=True,
+                                    check=True).stdout
+            results.append(json.loads(output.strip().splitlines()[-1]))
+        print("{0}:".format(mode))
+        for name in results[0]:
+            print("  {0:>15}: {1:6.1f} ms".format(
+                name, 1000 * np.median([r[name] for r in results])))
+
+
+# walls, obstacles and bullets, half of them off screen, drawn one by one
+# as DrawGroup used to, batched, and batched with culling
+def bench_drawgroup(sprites=1000, frames=200):
+    import copter
+    from viewport import Viewport
+    rng = np.random.default_rng(0)
+    viewport = Viewport(screen)
+    makes = [lambda: copter.Wall(0, 10, 40, 30, viewport),
+             lambda: copter.Obstacle(0, 30, viewport),
+             lambda: copter.Bullet((0, 0), geo.Vector2D.zero())]
+    group = utilities.DrawGroup()
+    for i in range(sprites):
+        sprite = makes[i % len(makes)]()
+        sprite.rect.topleft = (rng.integers(0, 2000), rng.integers(0, 800))
+        group.add(sprite)
+
+    def loop():
+        for sprite in group.sprites():
+            sprite.draw(screen)
+
+    for name, draw in [('loop', loop),
+                       ('batched', lambda: group.draw(screen)),
+                       ('culled', lambda: group.draw(screen, viewport.rect))]:
+        begin = time.perf_counter()
+        for i in range(frames):
+            draw()
+        print("{0:>8}: {1:6.3f} ms per draw of {2} sprites".format(
+            name, 1000 * (time.perf_counter() - begin) / frames, sprites))
+
+
+# finding the sprites that left the screen, one isOutOfBounds() test per
+# sprite against one cull() pass; nothing is removed, so every pass sees
+# the same sprites
+def bench_cull(sprites=1000, repeats=200):
+    from viewport import Viewport
+    rng = np.random.default_rng(0)
+    viewport = Viewport(screen)
+    group = utilities.DrawGroup()
+    for i in range(sprites):
+        sprite = utilities.DrawSprite()
+        sprite.rect = pygame.Rect(rng.integers(-200, 1200),
+                                  rng.integers(-200, 1000), 10, 10)
+        sprite.kill = lambda: None
+        group.add(sprite)
+
+    def loop():
+        for sprite in group:
+            if viewport.isOutOfBounds(sprite.rect):
+                sprite.kill()
+
+    for name, cull in [('loop', loop),
+                       ('cull', lambda: group.cull(viewport.rect))]:
+        begin = time.perf_counter()
+        for i in range(repeats):
+            cull()
+        print("{0:>5}: {1:6.1f} us per pass over {2} sprites".format(
+            name, 1e6 * (time.perf_counter() - begin) / repeats, sprites))
+    print("culled per pass: {0}".format(group.culled))
+
+
+# time a frame spends saving a score: writing the file in the frame, as
+# scenes used to, against submitting it to a score store; and how many
+# files the store writes for a burst of scores
+def bench_scores(submits=1000):
+    import tempfile
+    import scores
+    with tempfile.TemporaryDirectory() as directory:
+        legacy = os.path.join(directory, 'old-score.save')
+        times = []
+        for i in range(submits):
+            begin = time.perf_counter()
+            with open(legacy, 'w') as f:
+                f.write("High-score,{0:.2f}".format(i))
+            times.append(time.perf_counter() - begin)
+        store = scores.ScoreStore(os.path.join(directory, 'scores.json'))
+        store.load()
+        submitted = []
+        for i in range(submits):
+            begin = time.perf_counter()
+            store.submit('copter-score', float(i))
+            submitted.append(time.perf_counter() - begin)
+        begin = time.perf_counter()
+        store.flush()
+        flushed = time.perf_counter() - begin
+        for name, series in [('in frame', times), ('submit', submitted)]:
+            series = 1e6 * np.array(series)
+            print("{0:>8}: mean {1:7.1f} us, p99 {2:7.1f} us, max {3:7.1f} us"
+                  .format(name, series.mean(), np.percentile(series, 99),
+                          series.max()))
+        print("{0} scores saved in {1} fsynced write(s), {2:.1f} ms after "
+              "the last".format(submits, store.writes, 1000 * flushed))
+        store.close()
+
+
+# top-N and personal-best queries over a history of rows races and runs,
+# and the cost of recording one more of each during a game
+def bench_leaderboard(rows=1000000, players=1000, queries=1000):
+    import tempfile
+    import json
+    import leaderboard
+    rng = np.random.default_rng(0)
+    tracks = ['track.txt', 'oval.txt', 'figure8.txt']
+    levels = ['EASY', 'MEDIUM', 'HARD']
+    with tempfile.TemporaryDirectory() as directory:
+        board = leaderboard.Leaderboard(os.path.join(directory, 'board.db'))
+        board.open()
+        laps = json.dumps([30.0, 29.5, 29.8])
+        races = [(i, 'player{0}'.format(i % players), tracks[i % 3],
+                  levels[i // 3 % 3], i, float(t), 1, 3, laps, '[]', '[]')
+                 for i, t in enumerate(rng.uniform(60, 200, rows))]
+        runs = [(i, 'player{0}'.format(i % players), i, float(s), 5, 2)
+                for i, s in enumerate(rng.uniform(0, 5000, rows))]
+        connection = board.connect()
+        begin = time.perf_counter()
+        with connection:
+            connection.executemany(leaderboard.insert(
+                'races', leaderboard.RACE_COLUMNS), races)
+            connection.executemany(leaderboard.insert(
+                'runs', leaderboard.RUN_COLUMNS), runs)
+        connection.close()
+        print("inserted {0} races and runs: {1:.1f} s".format(
+            rows, time.perf_counter() - begin))
+        lookups = [
+            ('top races', lambda i: board.topRaces(
+                tracks[i % 3], levels[i % 3])),
+            ('best race', lambda i: board.personalBestRace(
+                tracks[i % 3], levels[i % 3], 'player{0}'.format(i))),
+            ('top runs', lambda i: board.topRuns()),
+            ('best run', lambda i: board.personalBestRun(
+                'player{0}'.format(i))),
+            ('record', lambda i: board.recordRun(
+                float(i), 1, 0, player='bench')),
+        ]
+        for name, lookup in lookups:
+            times = []
+            for i in range(queries):
+                begin = time.perf_counter()
+                lookup(i % players)
+                times.append(time.perf_counter() - begin)
+            times = 1e6 * np.array(times)
+            print("{0:>10}: median {1:6.1f} us, p99 {2:6.1f} us".format(
+                name, np.median(times), np.percentile(times, 99)))
+        begin = time.perf_counter()
+        board.flush()
+        print("{0} recorded runs committed {1:.1f} ms after the last".format(
+            queries, 1000 * (time.perf_counter() - begin)))
+        board.close()
+
+
+# size of the ghost of a 3-lap race driven by the CPU driver, and the
+# per-frame cost of playing it back against rotating the car every frame
+def bench_ghost(frames=1000):
+    import tempfile
+    import ghost
+    import writer
+    steps = [0]
+
+    def clock():
+        return steps[0] / 60
+
+    with tempfile.TemporaryDirectory() as directory:
+        scene = scenes.DrivingScene(clock, np.random.default_rng(0))
+        scene.GHOST_FILE = os.path.join(directory, 'ghost.npz')
+        scene.saveResults = False  # keep the store and leaderboard out
+        scene.recording = ghost.Recording()
+        start_scene(scene)
+        scene.controller = lambda car: scene.driver.drive([car])
+        while not scene.player.isCPU:
+            steps[0] += 1
+            scene.Update()
+        scene.recording.save(scene.GHOST_FILE, scene.timeElapsed,
+                             os.path.basename(scene.TRACK_FILE),
+                             scene.viewport.size())
+        writer.writer.flush()
+        print("{0} steps, {1:.1f} s race: {2} bytes".format(
+            len(scene.recording), scene.timeElapsed,
+            os.path.getsize(scene.GHOST_FILE)))
+        replay = ghost.load(scene.GHOST_FILE,
+                            os.path.basename(scene.TRACK_FILE),
+                            scene.viewport.size(), scene.player.car_img)
+    poses = scene.recording.poses
+    image = scene.player.car_img
+
+    # both ways draw the same see-through car; this one turns it each frame
+    def rotated(i):
+        turned = pygame.transform.rotate(image, ghost.dequantize(poses[i, 2]))
+        turned.set_alpha(ghost.ALPHA)
+        screen.blit(turned, (poses[i, 0], poses[i, 1]))
+
+    for name, draw in [
+            ('rotated', rotated),
+            ('ghost', lambda i: screen.blit(*replay.pose(i)))]:
+        begin = time.perf_counter()
+        for i in range(frames):
+            draw(i % len(replay))
+        print("{0:>8}: {1:5.2f} us per frame".format(
+            name, 1e6 * (time.perf_counter() - begin) / frames))
+
+
+# a hosted race with n clients over loopback, each steering at random:
+# the server's step and send times, and the bytes sent to each client a
+# second, against sending every snapshot whole and uncompressed
+def bench_server(counts=(1, 4, 16, 64), seconds=20):
+    import server
+    rng = np.random.default_rng(0)
+    for n in counts:
+        host = server.Server('127.0.0.1', 0, seed=0)
+        address = host.listen()
+        clients = [server.Client(address) for i in range(n)]
+        while len(host.connections) < n:
+            host.poll(0.1)
+        for i in range(seconds * host.fps):
+            for client in clients:
+                client.send(rng.uniform(-0.3, 0.3), 1)
+            host.poll(0)
+            host.step()
+            for client in clients:
+                client.poll()
+        step = host.profiler.stats('step')
+        send = host.profiler.stats('send')
+        cars = len(host.scene.cars)
+        whole = host.fps / host.every \
+            * (server.HEADER.size + 2 * cars * len(server.COLUMNS))
+        sent = sum(connection.sent for connection in host.connections)
+        print("{0:>2} clients, {1:>2} cars: step {2:5.2f} ms (p99 {3:5.2f}),"
+              " send {4:5.2f} ms (p99 {5:5.2f}), {6:6.0f} B/s per client"
+              " ({7:.0f} whole)".format(
+                  n, cars, step['mean'], step['p99'], send['mean'],
+                  send['p99'], sent / n / seconds, whole))
+        for client in clients:
+            client.close()
+        host.close()
+
+
+# every asset loaded through a fresh loader, decoded from the files or
+# viewed out of the archive
+def bench_assets(repeats=5):
+    import assets
+    names = list(assets.sources())
+    print("building archive: {0:.1f} ms".format(
+        1000 * timed(assets.compile)))
+    for mode, archive in [('decoded', None), ('archive', assets.ARCHIVE)]:
+        times = []
+        for i in range(repeats):
+            loader = assets.Loader(archive=archive)
+            times.append(timed(lambda: [loader.get(name) for name in names]))
+        print("{0:>8}: {1:6.2f} ms for {2} files".format(
+            mode, 1000 * np.median(times), len(names)))
+
+
+def timed(function):
+    begin = time.perf_counter()
+    function()
+    return time.perf_counter() - begin
+
+
+BENCHMARKS = {
+    'display_info': bench_display_info,
+    'fastmath': bench_fastmath,
+    'ai': bench_ai,
+    'env': bench_env,
+    'copter_env': bench_copter_env,
+    'frameloop': bench_frameloop,
+    'startup': bench_startup,
+    'assets': bench_assets,
+    'drawgroup': bench_drawgroup,
+    'cull': bench_cull,
+    'scores': bench_scores,
+    'leaderboard': bench_leaderboard,
+    'ghost': bench_ghost,
+    'server': bench_server,
+}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run game benchmarks")
+    parser.add_argument('names', nargs='*', default=list(BENCHMARKS),
+                        help="benchmarks to run (default: all)")
+    args = parser.parse_args()
+    for name in args.names:
+        print("== {0} ==".format(name))
+        BENCHMARKS[name]()
+        sys.stdout.flush()
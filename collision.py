@@ -0,0 +1,132 @@
+"""swept axis-aligned box collisions
+
+Moving boxes are swept against static boxes instead of being tested for
+overlap after the move, so a fast box can't tunnel through a thin
+obstacle. Every function works on all moving boxes at once:
+
+    boxes      (n, 4) array of left, top, width, height
+    moves      (n, 2) array of x and y displacements for this step
+    obstacles  (m, 4) array of left, top, width, height
+"""
+import numpy as np
+
+
+# earliest time of impact (between 0 and 1) of each box along its move,
+# and the normal of the face it hits; boxes that hit nothing get 1 and (0, 0)
+# (boxes already overlapping an obstacle are left to separate())
+def sweep(boxes, moves, obstacles):
+    boxes = np.asarray(boxes, dtype=float)[:, np.newaxis, :]
+    moves = np.asarray(moves, dtype=float)[:, np.newaxis, :]
+    obstacles = np.asarray(obstacles, dtype=float)[np.newaxis, :, :]
+
+    entries = []
+    exits = []
+    for axis in range(2):
+        start = boxes[..., axis]
+        size = boxes[..., axis + 2]
+        lower = obstacles[..., axis]
+        upper = lower + obstacles[..., axis + 2]
+        d = moves[..., axis]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # distances to the near and far faces, in units of the move
+            near = np.where(d > 0, lower - (start + size), upper - start) / d
+            far = np.where(d > 0, upper - start, lower - (start + size)) / d
+        # not moving on this axis: overlapping for all time or never
+        overlapping = (start + size > lower) & (start < upper)
+        near = np.where(d == 0, np.where(overlapping, -np.inf, np.inf), near)
+        far = np.where(d == 0, np.inf, far)
+        entries.append(near)
+        exits.append(far)
+
+    entry = np.maximum(entries[0], entries[1])
+    exit = np.minimum(exits[0], exits[1])
+    hit = (entry < exit) & (entry >= 0) & (entry <= 1)
+    entry = np.where(hit, entry, np.inf)
+
+    # the first obstacle each box reaches
+    first = np.argmin(entry, axis=1)
+    rows = np.arange(len(entry))
+    toi = entry[rows, first]
+    hitAny = np.isfinite(toi)
+
+    # the face hit is on the axis that was entered last
+    xFace = entries[0][rows, first] >= entries[1][rows, first]
+    normals = np.zeros((len(entry), 2))
+    normals[:, 0] = np.where(hitAny & xFace, -np.sign(moves[:, 0, 0]), 0)
+    normals[:, 1] = np.where(hitAny & ~xFace, -np.sign(moves[:, 0, 1]), 0)
+    return np.where(hitAny, toi, 1.0), normals
+
+
+# pushes boxes that overlap an obstacle out along the shallowest axis
+def separate(boxes, obstacles):
+    boxes = np.array(boxes, dtype=float)
+    obstacles = np.asarray(obstacles, dtype=float)
+    for obstacle in obstacles:
+        left, top, width, height = obstacle
+        pushLeft = boxes[:, 0] + boxes[:, 2] - left
+        pushRight = left + width - boxes[:, 0]
+        pushUp = boxes[:, 1] + boxes[:, 3] - top
+        pushDown = top + height - boxes[:, 1]
+        overlapping = (pushLeft > 0) & (pushRight > 0) & \
+            (pushUp > 0) & (pushDown > 0)
+        pushes = np.stack([pushLeft, pushRight, pushUp, pushDown], axis=1)
+        shallowest = np.argmin(pushes, axis=1)
+        depth = pushes[np.arange(len(boxes)), shallowest]
+        boxes[:, 0] -= np.where(overlapping & (shallowest == 0), depth, 0)
+        boxes[:, 0] += np.where(overlapping & (shallowest == 1), depth, 0)
+        boxes[:, 1] -= np.where(overlapping & (shallowest == 2), depth, 0)
+        boxes[:, 1] += np.where(overlapping & (shallowest == 3), depth, 0)
+    return boxes
+
+
+# moves boxes as far as they can go, sliding along the faces they hit;
+# returns the new top-left corners and whether each box hit something.
+# near(topLeft, bottomRight) picks the boxes that may reach an obstacle
+# (like track.Track.nearBarrier), by default tested against every one
+def resolve(boxes, moves, obstacles, iterations=2, near=None):
+    boxes = np.array(boxes, dtype=float)
+    moves = np.array(moves, dtype=float)
+    obstacles = np.asarray(obstacles, dtype=float)
+    positions = boxes[:, :2] + moves
+    hit = np.zeros(len(boxes), dtype=bool)
+    if len(obstacles) == 0:
+        return positions, hit
+
+    # only boxes whose swept bounds touch an obstacle need sweeping
+    if near is None:
+        def near(topLeft, bottomRight):
+            return touching(topLeft, bottomRight, obstacles)
+    near = near(np.minimum(boxes[:, :2], positions),
+                np.maximum(boxes[:, :2], positions) + boxes[:, 2:])
+    if not near.any():
+        return positions, hit
+    boxes, moves = boxes[near], moves[near]
+
+    nearHit = np.zeros(len(boxes), dtype=bool)
+    for i in range(iterations):
+        toi, normals = sweep(boxes, moves, obstacles)
+        boxes[:, :2] += moves * toi[:, np.newaxis]
+        # slide: keep the rest of the move, minus the part into the face
+        moves *= (1 - toi)[:, np.newaxis]
+        moves[normals != 0] = 0
+        nearHit |= toi < 1
+        if not moves.any():
+            break
+    # whatever is left can't be resolved without another sweep, drop it;
+    # boxes that started inside an obstacle are pushed out of it
+    separated = separate(boxes, obstacles)
+    nearHit |= (separated != boxes).any(axis=1)
+    positions[near] = separated[:, :2]
+    hit[near] = nearHit
+    return positions, hit
+
+
+# whether each box, given by its top-left and bottom-right corners,
+# overlaps any of the obstacles
+def touching(topLeft, bottomRight, obstacles):
+    left, top = obstacles[:, 0], obstacles[:, 1]
+    right, bottom = left + obstacles[:, 2], top + obstacles[:, 3]
+    return ((topLeft[:, 0, np.newaxis] < right)
+            & (bottomRight[:, 0, np.newaxis] > left)
+            & (topLeft[:, 1, np.newaxis] < bottom)
+            & (bottomRight[:, 1, np.newaxis] > top)).any(axis=1)
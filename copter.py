@@ -1,7 +1,9 @@
 import pygame
 import utilities
 import colors
+import palette
 import numpy as np
+import fastmath
 from enum import Enum
 import time
 import geometry as geo
@@ -29,18 +31,22 @@ class Copter(utilities.DrawSprite):
     INVINCIBILITY_TIME = 1  # time of invincibility after copter is hurt
     WEIGHT = 0.8  # affects acceleration
     ENGINE_STARTUP_TIME = 0.5  # time for the engine to rev up
+    SIZE = (85, 30)  # displayed size of the copter
+    SPRITESHEET = 'helicopter-spritesheet.png'
 
-    def __init__(self, pos):
+    def __init__(self, pos, viewport, clock=time.time):
         # Call the parent class (Sprite) constructor
         utilities.DrawSprite.__init__(self)
 
+        self.viewport = viewport
+        self.clock = clock
         self.angle = 0
         self.weapon = self.DEFAULT_WEAPON
-        self.lastShootTime = 0
+        self.lastShootTime = -np.inf
         self.ammo = self.DEFAULT_AMMO
         self.powerupText = pygame.font.SysFont('arial', 12)
         self.lives = 3
-        self.lastHurtTime = 0
+        self.lastHurtTime = -np.inf
 
         self.power = None
         self.powerActive = False
@@ -52,10 +58,11 @@ class Copter(utilities.DrawSprite):
         self.controlled = True
         self.lastFlyTime = 0
 
-        self.strips = utilities.SpriteStripAnim('helicopter-spritesheet.png',
+        self.strips = utilities.SpriteStripAnim(self.SPRITESHEET,
                                                 (0, 0, 423, 150), (1, 4),
                                                 frames=1,
-                                                loop=True)
+                                                loop=True,
+                                                size=self.SIZE)
         self.strips.iter()
         self.image = self.strips.next()
         self.setCopterImage()
@@ -107,7 +114,7 @@ class Copter(utilities.DrawSprite):
     def update(self):
         # powerup logic
         if self.powerActive:
-            timeSpentActivated = time.time() - self.lastPowerupTime
+            timeSpentActivated = self.clock() - self.lastPowerupTime
             self.power.timeLeft = self.power.startTimeLeft - timeSpentActivated
             if self.power.timeLeft <= 0:
                 self.removePower()
@@ -136,7 +143,7 @@ class Copter(utilities.DrawSprite):
             nextImage = self.strips.next()
         else:
             if self.flying:
-                T = time.time() - self.lastFlyTime
+                T = self.clock() - self.lastFlyTime
                 if T < self.ENGINE_STARTUP_TIME:
                     # t goes from 0 to 1
                     t = T / self.ENGINE_STARTUP_TIME
@@ -149,14 +156,15 @@ class Copter(utilities.DrawSprite):
             else:
                 nextImage = self.image  # stop animation
 
-        self.image = pygame.transform.scale(nextImage, (85, 30))
+        # frames are shared, so copy before changing the alpha
+        self.image = nextImage.copy()
 
         if self.invincible():
             alpha = 100
             self.image.set_alpha(alpha)
         elif self.hasPower(PowerupType.SHIELD):
             # T is the time since last loop
-            T = (time.time() - self.lastPowerupTime)\
+            T = (self.clock() - self.lastPowerupTime)\
                 % self.SHIELD_LOOP_TIME
             # t goes from 0 to 1 in a loop
             t = T / self.SHIELD_LOOP_TIME
@@ -172,27 +180,29 @@ class Copter(utilities.DrawSprite):
             self.removePower()
 
         pos = self.gunLocation()
+        angle = fastmath.radians(self.angle)
 
         if self.weapon == Weapon.MACHINE_GUN:
             ball_speed = 20
             power = 1
 
             ball = Bullet(pos,
-                          geo.Vector2D(power * ball_speed * np.cos(np.radians(self.angle)),
-                                       -power * ball_speed * np.sin(np.radians(self.angle))))
+                          geo.Vector2D(power * ball_speed * fastmath.cos(angle),
+                                       -power * ball_speed * fastmath.sin(angle)),
+                          self.clock)
 
         elif self.weapon == Weapon.LASER:
-            info = pygame.display.Info()
-            screenWidth, screenHeight = info.current_w, info.current_h
+            screenWidth, screenHeight = self.viewport.size()
 
             ball = Laser(pos,
-                         geo.Vector2D(2 * screenWidth * np.cos(np.radians(self.angle)),
-                                      -2 * screenHeight * np.sin(np.radians(self.angle))))
+                         geo.Vector2D(2 * screenWidth * fastmath.cos(angle),
+                                      -2 * screenHeight * fastmath.sin(angle)),
+                         self.clock)
 
         pygame.mixer.Sound.play(ball.sound)
 
         self.ammo -= 1
-        self.lastShootTime = time.time()
+        self.lastShootTime = self.clock()
 
         return ball
 
@@ -202,14 +212,17 @@ class Copter(utilities.DrawSprite):
             reload_time = self.BOOSTED_MACHINE_GUN_RELOAD_TIME
         elif self.hasPower(PowerupType.LASER):
             reload_time = 0.5
-        return time.time() - self.lastShootTime > reload_time
+        return self.clock() - self.lastShootTime > reload_time
 
     def shootTowards(self, pos):
         # shoot towards the mouse location
         dr = geo.Vector2D(*pos) - geo.Vector2D(*self.rect.center)
-        self.angle = (np.degrees(geo.Vector2D.angle_between(dr,
-                                                            geo.Vector2D(1,
-                                                                         0))))
+        return self.shootAt(fastmath.degrees(
+            geo.Vector2D.angle_between(dr, geo.Vector2D(1, 0))))
+
+    # shoots at an angle in degrees, counter-clockwise from straight ahead
+    def shootAt(self, angle):
+        self.angle = angle
         return self.shoot()
 
     # checks if the copter has a power if none given, or else the given powertype
@@ -237,7 +250,7 @@ class Copter(utilities.DrawSprite):
         self.deactivatePower()  # reset defaults first
         if self.hasPower():
             self.powerActive = True
-            self.lastPowerupTime = time.time()
+            self.lastPowerupTime = self.clock()
             self.power.startTimeLeft = self.power.timeLeft
             if self.hasPower(PowerupType.GUN_BOOST):
                 if lastWeapon != Weapon.MACHINE_GUN\
@@ -273,7 +286,7 @@ class Copter(utilities.DrawSprite):
             return False
         if not self.dead():
             self.lives -= 1
-            self.lastHurtTime = time.time()
+            self.lastHurtTime = self.clock()
             self.controlled = False
         if self.dead():
             self.kill()
@@ -285,13 +298,13 @@ class Copter(utilities.DrawSprite):
         return self.lives == 0
 
     def invincible(self):
-        return time.time() - self.lastHurtTime < self.INVINCIBILITY_TIME
+        return self.clock() - self.lastHurtTime < self.INVINCIBILITY_TIME
 
     def fly(self):
         if not self.flying:
             self.flying = True
             self.controlled = True
-            self.lastFlyTime = time.time()
+            self.lastFlyTime = self.clock()
 
     def drop(self):
         self.flying = False
@@ -302,6 +315,13 @@ class Explosion(utilities.DrawSprite):
     SPRITESHEET = 'explosion.png'
     SIZE = (256, 256)
     COUNT = (8, 7)
+    RECT = (0, 0) + SIZE  # first frame in the spritesheet
+
+    # the explosion's frames, cut out of the spritesheet once and shared
+    @classmethod
+    def clip(cls):
+        return utilities.load_clip(cls.SPRITESHEET, cls.RECT, cls.COUNT,
+                                   colorkey=-1)
 
     def __init__(self, pos):
         # Call the parent class (Sprite) constructor
@@ -312,9 +332,7 @@ class Explosion(utilities.DrawSprite):
         pygame.mixer.Sound.play(self.sound)
 
         self.strips = utilities.SpriteStripAnim(self.SPRITESHEET,
-                                                (0, 0,
-                                                 self.SIZE[0],
-                                                 self.SIZE[1]),
+                                                self.RECT,
                                                 self.COUNT,
                                                 frames=1,
                                                 colorkey=-1)
@@ -323,17 +341,13 @@ class Explosion(utilities.DrawSprite):
         self.rect = self.image.get_rect()
         self.rect.center = pos
 
-    def draw(self, screen):
-        self.image = self.strips.next()
-        screen.blit(self.image, self.rect)
-
+    # the scene culls explosions that scroll off screen
     def update(self):
         if self.strips.i >= len(self.strips.images):
             self.kill()
-        elif self.rect.right < 0:
-            self.kill()
         else:
             self.rect.x -= Wall.SPEED
+            self.image = self.strips.next()
 
 
 class Wall(utilities.DrawSprite):
@@ -344,7 +358,7 @@ class Wall(utilities.DrawSprite):
     # Constructor. Pass in the color of the block,
     # and its four corners as y-coords
     # with the order being NW-NE-SE-SW
-    def __init__(self, yNW, yNE, ySE, ySW):
+    def __init__(self, yNW, yNE, ySE, ySW, viewport):
         # Call the parent class (Sprite) constructor
         utilities.DrawSprite.__init__(self)
 
@@ -358,9 +372,7 @@ class Wall(utilities.DrawSprite):
         self.rect = pygame.draw.polygon(self.image,
                                         Wall.COLOR,
                                         [NW, NE, SE, SW])
-        info = pygame.display.Info()
-        screenWidth = info.current_w
-        self.rect.x, self.rect.y = screenWidth, top
+        self.rect.x, self.rect.y = viewport.width, top
 
     def update(self):
         self.rect.left -= Wall.SPEED
@@ -368,10 +380,11 @@ class Wall(utilities.DrawSprite):
 
 class Projectile(utilities.DrawSprite):
 
-    def __init__(self, pos, velocity):
+    def __init__(self, pos, velocity, clock=time.time):
         # Call the parent class (Sprite) constructor
         utilities.DrawSprite.__init__(self)
 
+        self.clock = clock
         self.v = velocity
         self.initGraphics(pos)
         self.lastPos = pos
@@ -381,9 +394,6 @@ class Projectile(utilities.DrawSprite):
         self.rect = self.image.get_rect()
         self.rect.center = pos
 
-    def draw(self, screen):
-        screen.blit(self.image, self.rect)
-
     def pos(self):
         return self.rect.center
 
@@ -416,11 +426,20 @@ class Projectile(utilities.DrawSprite):
 
 
 class Bullet(Projectile):
+    _image = None  # shared by every bullet
+
+    # the bullet image, scaled once and shared
+    @classmethod
+    def bulletImage(cls):
+        if cls._image is None:
+            image = pygame.transform.scale(utilities.load_image('ball.png'),
+                                           (5, 5))
+            image.set_colorkey(colors.WHITE)
+            cls._image = image
+        return cls._image
 
     def initGraphics(self, pos):
-        self.image = utilities.load_image('ball.png')
-        self.image = pygame.transform.scale(self.image, (5, 5))
-        self.image.set_colorkey(colors.WHITE)
+        self.image = self.bulletImage()
         self.rect = self.image.get_rect()
         self.rect.center = pos
         self.sound = utilities.load_sound('bullet.wav')
@@ -432,15 +451,15 @@ class Laser(Projectile):
     def initGraphics(self, pos):
         self.rect = pygame.Rect(pos, (1, 1))
         self.sound = utilities.load_sound('laser.wav')
-        self.shootTime = time.time()
+        self.shootTime = self.clock()
         self.expire = False
 
     def update(self):
-        if time.time() - self.shootTime > self.LASER_TIME:
+        if self.clock() - self.shootTime > self.LASER_TIME:
             Projectile.kill(self)
 
     def draw(self, screen):
-        t = (time.time() - self.shootTime) / self.LASER_TIME
+        t = (self.clock() - self.shootTime) / self.LASER_TIME
         t = utilities.bound(0, t, 1)
         thickness = round((1 - t) * 3)
         color = colors.RED
@@ -501,31 +520,37 @@ class Enemy(utilities.DrawSprite):
 class Bat(Enemy):
     AWARD = 5  # award in seconds after kill
     CLEARANCE = 5  # space between bat and nearest wall
+    RECT = (0, 128 - 32, 32, 32)  # first frame in the spritesheet
+    COUNT = (4, 1)
+
+    # the bat's frames, cut out of the spritesheet once and shared
+    @classmethod
+    def clip(cls):
+        return utilities.load_clip('bat.png', cls.RECT, cls.COUNT,
+                                   colorkey=-1)
 
     # Constructor. Pass in the color of the block,
     # and its x and y position
-    def __init__(self, y):
+    def __init__(self, y, viewport, rng=None):
         # Call the parent class (Sprite) constructor
         Enemy.__init__(self, y)
+        self.rng = rng if rng is not None else np.random.default_rng()
 
         # Create an image of the block, and fill it with a color.
         # This could also be an image loaded from the disk.
         self.strips = utilities.SpriteStripAnim('bat.png',
-                                                (0, 128 - 32, 32, 32),
-                                                (4, 1),
+                                                self.RECT,
+                                                self.COUNT,
                                                 colorkey=-1,
                                                 frames=3,
                                                 loop=True)
         self.strips.iter()
         self.image = self.strips.next()
 
-        info = pygame.display.Info()
-        screenWidth, screenHeight = info.current_w, info.current_h
-
         # Fetch the rectangle object that has the dimensions of the image
         # Update the position of this object by setting the values of rect.x and rect.y
         self.rect = self.image.get_rect()
-        self.rect.left = screenWidth
+        self.rect.left = viewport.width
         self.rect.top = y
         self.x = float(self.rect.x)
         self.y = float(self.rect.y)
@@ -533,7 +558,7 @@ class Bat(Enemy):
 
     def fly(self, roof, ground):
         self.y = utilities.bound(roof + self.CLEARANCE,
-                                 self.y + np.random.normal(),
+                                 self.y + self.rng.normal(),
                                  ground - self.rect.height - self.CLEARANCE)
         self.rect.y = int(self.y)
 
@@ -546,14 +571,11 @@ class Bat(Enemy):
 class Obstacle(Enemy):
     MIN_HEIGHT = 20
 
-    def __init__(self, top, height):
+    def __init__(self, top, height, viewport):
         # Call the parent class (Sprite) constructor
         Enemy.__init__(self, top)
 
-        info = pygame.display.Info()
-        screenWidth = info.current_w
-
-        self.rect = pygame.Rect(screenWidth, top, 2 * Wall.WIDTH, height)
+        self.rect = pygame.Rect(viewport.width, top, 2 * Wall.WIDTH, height)
 
         self.image = pygame.Surface([2 * Wall.WIDTH, height])
         self.color = np.array(colors.GRAY, dtype=int)
@@ -573,51 +595,55 @@ class Obstacle(Enemy):
 
 class Balloon(Enemy):
     AWARD = 5
-
-    def __init__(self, top):
+    IMAGES = ('green_balloon.png', 'blue_balloon.png', 'red_balloon.png')
+    SIZE = (15, 30)
+    _images = {}  # filename -> scaled image, shared by balloons
+
+    # a balloon image, scaled once and shared
+    @classmethod
+    def balloonImage(cls, filename):
+        image = cls._images.get(filename)
+        if image is None:
+            image = pygame.transform.scale(utilities.load_image(filename),
+                                           cls.SIZE)
+            image.set_colorkey(colors.WHITE)
+            cls._images[filename] = image
+        return image
+
+    def __init__(self, top, viewport, rng=None):
         # Call the parent class (Sprite) constructor
         Enemy.__init__(self, top)
+        self.rng = rng if rng is not None else np.random.default_rng()
         self.pop_sound = utilities.load_sound('balloon_pop.wav')
 
-        info = pygame.display.Info()
-        screenWidth = info.current_w
-
-        choice = np.random.choice([0, 0, 0, 1, 1, 2])
+        choice = self.rng.choice([0, 0, 0, 1, 1, 2])
 
         # Create an image of the block, and fill it with a color.
         # This could also be an image loaded from the disk.
+        self.image = self.balloonImage(self.IMAGES[choice])
         if choice == 0:
-            self.image = utilities.load_image('green_balloon.png')
             self.floatspeed = 1
             self.AWARD = 5
         elif choice == 1:
-            self.image = utilities.load_image('blue_balloon.png')
             self.floatspeed = 1.5
             self.AWARD = 7
         elif choice == 2:
-            self.image = utilities.load_image('red_balloon.png')
             self.floatspeed = 2
             self.AWARD = 10
-        self.image = pygame.transform.scale(self.image, (15, 30))
-        self.image.set_colorkey(colors.WHITE)
 
         # Fetch the rectangle object that has the dimensions of the image
         # Update the position of this object by setting the values of rect.x and rect.y
         self.rect = self.image.get_rect()
         self.rect.y = top
-        self.rect.x = screenWidth
+        self.rect.x = viewport.width
         self.lives = 1
 
     def update(self):
-        self.y += min(-0.1, np.random.normal(-self.floatspeed, 0.5))
-        # move upwards
+        self.y += min(-0.1, self.rng.normal(-self.floatspeed, 0.5))
+        # move upwards, the scene culls balloons that float off screen
         self.rect.y = int(self.y)
         self.rect.x -= Wall.SPEED
 
-        # balloon is off-screen
-        if self.rect.y < -self.rect.h:
-            self.kill()
-
     def hurt(self):
         Enemy.hurt(self)
         if self.dead():
@@ -630,20 +656,18 @@ class Powerup(utilities.DrawSprite):
     DEFAULT_AMMO = np.inf  # default ammo of powerup
     DEFAULT_DURATION = np.inf  # default duration of powerup
 
-    def __init__(self, top, type):
+    def __init__(self, top, type, viewport, clock=time.time):
         # Call the parent class (Sprite) constructor
         utilities.DrawSprite.__init__(self)
+        self.clock = clock
 
-        info = pygame.display.Info()
-        screenWidth = info.current_w
-
-        self.rect = pygame.Rect(screenWidth, top,
+        self.rect = pygame.Rect(viewport.width, top,
                                 self.SIDE_LENGTH, self.SIDE_LENGTH)
 
-        self.image = pygame.Surface([self.SIDE_LENGTH, self.SIDE_LENGTH])
-        self.lastLoop = time.time()
+        self.lastLoop = self.clock()
 
         self.setType(type)
+        self.image = palette.seesawSurfaces(self.color, self.rect.size)[0]
 
     def setType(self, type):
         self.type = type
@@ -667,13 +691,12 @@ class Powerup(utilities.DrawSprite):
         self.startTimeLeft = self.timeLeft
 
     def update(self):
-        T = (time.time() - self.lastLoop)
-        color = np.array(self.color)
+        T = (self.clock() - self.lastLoop)
         if T > self.DEFAULT_LOOP_TIME:
-            self.lastLoop = time.time()
+            self.lastLoop = self.clock()
         t = T / self.DEFAULT_LOOP_TIME
         # find the shade of the color using a linear seesaw
-        color = utilities.seesaw(0.7 * color, color, t)
-        self.image.fill(color)
+        shades = palette.seesawSurfaces(self.color, self.rect.size)
+        self.image = shades[palette.index(t)]
         self.rect.left -= Wall.SPEED
 
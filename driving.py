@@ -1,11 +1,15 @@
 import pygame
 import utilities
+import assets
 import colors
+import palette
 import numpy as np
+import fastmath
 from enum import Enum
 import time
 import geometry as geo
-from collections import deque
+from heading import HeadingFilter
+from trail import Trail
 
 
 class PowerupType(Enum):
@@ -31,26 +35,44 @@ class Car(utilities.DrawSprite):
     MIN_RANDOM_SPEED = 5
     RANDOM_SPREAD = 3
     TRAIL_LENGTH = 10
+    TRAIL_FADE = False  # whether trails fade out, for use with longer trails
     FWD_ACCELERATION = 0.3
     FWD_DECCELERATION = 0.2
     REV_ACCELERATION = 0.5
     REV_DECCELERATION = 0.5
     SPEED_TOLERANCE = 0.001
     ANGLE_AVERAGING_PERIOD = 10
-
-    def __init__(self, pos, angle, color, name, isCPU=False):
+    ANGLE_SMOOTHING = None  # EMA weight for heading, None for a moving mean
+    IMAGE_SIZE = (30, 15)
+    _images = {}  # colour -> tinted car image, shared by cars of that colour
+
+    # the car image in a colour, scaled and tinted once per colour; it is
+    # shared, so cars draw on a copy of it
+    @classmethod
+    def carImage(cls, color):
+        key = tuple(color)
+        image = cls._images.get(key)
+        if image is None:
+            image = pygame.transform.scale(assets.image("car.png"),
+                                           cls.IMAGE_SIZE)
+            pygame.transform.threshold(image, image,
+                                       colors.WHITE, set_color=color,
+                                       threshold=(1, 1, 1, 0),
+                                       inverse_set=True)
+            cls._images[key] = image
+        return image
+
+    def __init__(self, pos, angle, color, name, isCPU=False, clock=time.time,
+                 rng=None):
         utilities.DrawSprite.__init__(self)
 
         # initialize RNG for randomizer
-        self.rng = np.random.default_rng()
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.clock = clock
         self.color = color
         self.name = name
 
-        self.car_img = utilities.load_image("car.png", None)
-        self.car_img = pygame.transform.scale(self.car_img, (30, 15))
-        pygame.transform.threshold(self.car_img, self.car_img,
-                                   colors.WHITE, set_color=self.color,
-                                   threshold=(1, 1, 1, 0), inverse_set=True)
+        self.car_img = self.carImage(color)
         self.image = self.car_img.copy()
 
         self.rect = self.image.get_rect()
@@ -59,8 +81,8 @@ class Car(utilities.DrawSprite):
         self.isCPU = isCPU  # whether the car is computer controlled
 
         self.angle = angle
-        self.angles = deque([geo.Vector2D.create_from_angle(np.radians(-angle),
-                            1)] * self.ANGLE_AVERAGING_PERIOD)
+        self.heading = HeadingFilter(angle, self.ANGLE_AVERAGING_PERIOD,
+                                     self.ANGLE_SMOOTHING)
         self.speed = 0
         self.maxSpeed = self.MAX_FWD_SPEED
         self.acceleration = 0
@@ -70,47 +92,49 @@ class Car(utilities.DrawSprite):
         self.lastPowerupTime = 0
         self.power = None
         self.slowed = False
-        self.trail = []
+        self.trail = Trail(self.TRAIL_LENGTH, self.TRAIL_FADE)
         self.powerActive = False
 
-        self.checkpoint = 0
-        self.laps = 0
-
     def draw(self, screen):
         # draw trail
         if len(self.trail) > 1:
-            pygame.draw.aalines(screen, self.power.color, False, self.trail)
+            self.trail.draw(screen, self.power.color, colors.GRAY)
+
+        image, angle = self.look()
+        # rotate car using angle in degrees and draw car
+        screen.blit(pygame.transform.rotate(image, angle), self.rect)
 
+    # the car's image, with its power-up's shade on it, and the angle in
+    # degrees it is drawn at
+    def look(self):
         if(self.hasPower()):
             # find the shade of the color using a linear ramp
-            color = np.array(self.power.color)
             t = (self.power.duration - self.power.timeLeft)\
                 / self.power.duration
-            color = utilities.ramp(color, 0.7 * color, t)
-            self.power.image.fill(color)
+            shades = palette.rampSurfaces(self.power.color,
+                                          self.power.rect.size)
+            self.power.image = shades[palette.index(t)]
 
             # draw powerup on car
             self.power.rect.center = [self.rect.width / 2,
                                       self.rect.height / 2]
             self.image.blit(self.power.image, self.power.rect)
 
+        return self.image, self.facing()
+
+    # the angle in degrees the car is drawn at, along its velocity
+    def facing(self):
         if self.speed < 0:
-            angle = np.degrees(-self.v.angle()) + 180
+            return fastmath.degrees(-self.v.angle()) + 180
         elif self.speed > 0:
-            angle = np.degrees(-self.v.angle())
-        else:
-            angle = self.angle
-
-        # rotate car using angle in degrees and draw car
-        image = pygame.transform.rotate(self.image,
-                                        angle)
-        screen.blit(image, self.rect)
+            return fastmath.degrees(-self.v.angle())
+        return self.angle
 
     def update(self):
         self.pos()
         # powerup logic
         if self.powerActive:
-            timeSpentActivated = time.time() - self.lastPowerupTime
+            timeSpentActivated = self.clock() - self.lastPowerupTime
             self.power.timeLeft = self.power.startTimeLeft - timeSpentActivated
             if self.power.timeLeft <= 0:
                 self.deactivatePower()
@@ -152,16 +176,14 @@ class Car(utilities.DrawSprite):
                 self.MAX_REV_SPEED = self.DEFAULT_MAX_REV_SPEED
 
         if self.powerActive and self.hasPower():
-            self.trail.append([self.rect.center[0], self.rect.center[1]])
-            while (len(self.trail) > self.TRAIL_LENGTH):
-                self.trail.pop(0)
+            self.trail.append(self.rect.center)
         else:
-            self.trail = []
+            self.trail.clear()
 
         # driving logic
         self.speed = max(-self.MAX_REV_SPEED,
                          min(self.maxSpeed, self.speed + self.acceleration))
-        self.v = geo.Vector2D.create_from_angle(-np.radians((self.angle)),
+        self.v = geo.Vector2D.create_from_angle(-fastmath.radians((self.angle)),
                                                 self.speed)  # angle in radians
         self.rect.move_ip(*self.v)
 
@@ -170,27 +192,33 @@ class Car(utilities.DrawSprite):
 
     def driveTowards(self, dest):
         dr = dest - self.pos()
+        self.steer(fastmath.degrees(-dr.angle()), dr.length() / 5)
 
-        self.updateAngle(np.degrees(-dr.angle()))
+    # drives forward at a heading in degrees, up to maxSpeed
+    def steer(self, angle, maxSpeed):
+        self.updateAngle(angle)
 
         if self.powerActive and self.hasPower(PowerupType.REVERSER):
             self.acceleration = -1
         else:
             self.acceleration = self.FWD_ACCELERATION
 
-        self.maxSpeed = min(self.MAX_FWD_SPEED, dr.length() / 5)
+        self.maxSpeed = min(self.MAX_FWD_SPEED, maxSpeed)
 
     def driveAwayFrom(self, point):
         dr = point - self.pos()
+        self.reverse(fastmath.degrees(-dr.angle()), dr.length() / 5)
 
-        self.updateAngle(np.degrees(-dr.angle()))
+    # backs away from a heading in degrees, up to maxSpeed
+    def reverse(self, angle, maxSpeed):
+        self.updateAngle(angle)
 
         if self.powerActive and self.hasPower(PowerupType.REVERSER):
             self.acceleration = 1
         else:
             self.acceleration = -self.REV_ACCELERATION
 
-        self.maxSpeed = min(self.MAX_REV_SPEED, dr.length() / 5)
+        self.maxSpeed = min(self.MAX_REV_SPEED, maxSpeed)
 
     def idle(self):
         if self.speed > self.SPEED_TOLERANCE:
@@ -204,10 +232,7 @@ class Car(utilities.DrawSprite):
         self.updateAngle(self.angle)
 
     def updateAngle(self, newAngle):
-        self.angles.popleft()
-        v = geo.Vector2D.create_from_angle(np.radians(-newAngle), 1)
-        self.angles.append(v)
-        self.angle = -np.degrees((sum(self.angles, geo.Vector2D.zero()) / len(self.angles)).angle())
+        self.angle = self.heading.update(newAngle)
 
     # checks if the car has a power if none given, or else the given powertype
     def hasPower(self, type=None):
@@ -220,7 +245,7 @@ class Car(utilities.DrawSprite):
     def activatePower(self):
         if self.hasPower():
             self.powerActive = True
-            self.lastPowerupTime = time.time()
+            self.lastPowerupTime = self.clock()
             self.power.startTimeLeft = self.power.timeLeft
 
     # deactivates powerup if the car has one
@@ -230,12 +255,10 @@ class Car(utilities.DrawSprite):
         else:
             return  # don't allow activation externally for now
 
-    # gives power to car
+    # gives power to car, CPU drivers choose when to use the others
     def givePower(self, power):
         self.power = power
-        if self.isCPU:
-            self.activatePower()
-        elif power.type == PowerupType.SLOWDOWN:
+        if power.type == PowerupType.SLOWDOWN:
             self.activatePower()
         elif power.type == PowerupType.REVERSER:
             self.activatePower()
@@ -256,23 +279,24 @@ class Powerup(utilities.DrawSprite):
     MAX_LOOP_TIME = 3.5  # maximum loop time
     DEFAULT_DURATION = 2  # time that the powerup lasts for
 
-    def __init__(self, pos, type, switch=True):
+    def __init__(self, pos, type, switch=True, clock=time.time, rng=None):
         utilities.DrawSprite.__init__(self)
 
         # initialize RNG for randomizer
-        self.rng = np.random.default_rng()
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.clock = clock
 
         self.rect = pygame.Rect(0, 0, 10, 10)
         self.rect.center = pos
 
-        self.image = pygame.Surface([10, 10])
         self.switchTo(type)
+        self.image = palette.seesawSurfaces(self.color, self.rect.size)[0]
         self.switch = switch
-        self.lastLoop = time.time()
+        self.lastLoop = self.clock()
 
     def update(self):
-        T = time.time() - self.lastLoop
-        color = np.array(self.color)
+        T = self.clock() - self.lastLoop
+        shades = palette.seesawSurfaces(self.color, self.rect.size)
         if (T > self.loopTime):
             if self.switch:
                 newType = PowerupType(int(self.rng.random() * PowerupType.NUMBER_POWERUPS.value))
@@ -280,13 +304,12 @@ class Powerup(utilities.DrawSprite):
                 self.loopTime = utilities.bound(self.MIN_LOOP_TIME,
                                                  self.loopTime + self.rng.standard_normal() * self.loopSpread,
                                                  self.MAX_LOOP_TIME)
-            self.lastLoop = time.time()
-
+            self.lastLoop = self.clock()
+            self.image = shades[len(shades) // 2]  # full color
         else:
             t = T / self.loopTime
             # find the shade of the color using a linear seesaw
-            color = utilities.seesaw(0.7 * color, color, t)
-        self.image.fill(color)
+            self.image = shades[palette.index(t)]
 
     # switch powerup type
     def switchTo(self, type):
@@ -319,39 +342,26 @@ class Powerup(utilities.DrawSprite):
         self.timeLeft = self.duration
         self.startTimeLeft = self.timeLeft
 
-    def draw(self, screen):
-        screen.blit(self.image, self.rect)
-
-
-class Grass(utilities.DrawSprite):
-    def __init__(self, pos, width, height):
-        utilities.DrawSprite.__init__(self)
-
-        self.rect = pygame.Rect(0, 0, width, height)
-        self.rect.center = pos
-        self.image = pygame.Surface([width, height])
-        self.image.fill(colors.DARK_GREEN)
-
-
-class Barrier(utilities.DrawSprite):
-    def __init__(self, pos, width, height):
-        utilities.DrawSprite.__init__(self)
-
-        self.rect = pygame.Rect(0, 0, width, height)
-        self.rect.center = pos
-        self.image = pygame.Surface([width, height])
-        self.image.fill(colors.DARK_GRAY)
+    # builds the shades of every power-up up front, before the race
+    # instead of while a frame is being drawn
+    @classmethod
+    def buildShades(cls):
+        for value in range(PowerupType.NUMBER_POWERUPS.value):
+            power = cls((0, 0), PowerupType(value), switch=False)
+            palette.rampSurfaces(power.color, power.rect.size)
 
 
 class Checkpoint(utilities.DrawSprite):
     POWERUP_SPAWN_INTERVAL = 5  # mean time between powerup spawns
     POWERUP_SPAWN_RADIUS = 20  # max radius to spawn powerups over
 
-    def __init__(self, pos, width, height, generatesPowerups=False):
+    def __init__(self, pos, width, height, generatesPowerups=False,
+                 clock=time.time, rng=None):
         utilities.DrawSprite.__init__(self)
 
         # Random Number Generator
-        self.rng = np.random.default_rng()
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.clock = clock
 
         self.rect = pygame.Rect(0, 0, width, height)
         self.rect.center = pos
@@ -360,14 +370,14 @@ class Checkpoint(utilities.DrawSprite):
         self.generatesPowerups = generatesPowerups
         self.powerup = None
         self.timeUntilGeneration = self.rng.exponential(self.POWERUP_SPAWN_INTERVAL)
-        self.lastUpdateTime = time.time()
+        self.lastUpdateTime = self.clock()
 
     def update(self):
         if self.generatesPowerups and self.powerup is None:
             if self.timeUntilGeneration <= 0:
                 self.generatePowerup()
             else:
-                now = time.time()
+                now = self.clock()
                 self.timeUntilGeneration = self.timeUntilGeneration - (now - self.lastUpdateTime)
                 self.lastUpdateTime = now
 
@@ -380,16 +390,18 @@ class Checkpoint(utilities.DrawSprite):
     # generates a powerup
     def generatePowerup(self):
         spawnPoint = geo.Vector2D(*self.rect.center)
-        spawnPoint += geo.Vector2D.create_from_angle(self.rng.random() * 2 * np.pi,
+        spawnPoint += geo.Vector2D.create_from_angle(self.rng.random() * 2 * fastmath.pi,
                                                      self.rng.random() * self.POWERUP_SPAWN_RADIUS)
         self.powerup = Powerup(spawnPoint.tuple(),
-                               PowerupType(int(self.rng.random() * PowerupType.NUMBER_POWERUPS.value)))
+                               PowerupType(int(self.rng.random() * PowerupType.NUMBER_POWERUPS.value)),
+                               clock=self.clock, rng=self.rng)
         self.timeUntilGeneration = self.rng.exponential(self.POWERUP_SPAWN_INTERVAL)
 
 
 class FinishLine(Checkpoint):
-    def __init__(self, pos, width, height, horizontal=True):
-        Checkpoint.__init__(self, pos, width, height)
+    def __init__(self, pos, width, height, horizontal=True, clock=time.time,
+                 rng=None):
+        Checkpoint.__init__(self, pos, width, height, clock=clock, rng=rng)
 
         self.horizontal = horizontal
 
@@ -0,0 +1,822 @@
+"""training environments around the game scenes
+
+Environments follow the Gym conventions: reset(seed) returns the first
+observation and step(action) returns (observation, reward, done, info).
+They run headless on simulated time: every step advances a FrameClock by
+one frame instead of reading the wall clock, so a step takes only as long
+as the simulation does, and a seeded episode always plays out the same.
+Nothing is drawn unless render() is called.
+"""
+import os
+import numpy as np
+import pygame
+import fastmath
+import scenes
+import track
+import copter
+import ai
+
+
+class FrameClock:
+    """simulated time, advanced one frame at a time"""
+
+    def __init__(self, fps=60):
+        self.dt = 1 / fps
+        self.time = 0
+
+    def __call__(self):
+        return self.time
+
+    def tick(self):
+        self.time += self.dt
+
+
+# a hidden display for the pixel format surfaces are converted to, and
+# a silent mixer for the sounds the scenes play
+def headless(size):
+    if pygame.display.get_surface() is None:
+        os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+        pygame.display.init()
+        pygame.display.set_mode((1, 1))
+    if not pygame.mixer.get_init():
+        os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+        pygame.mixer.init()
+    pygame.font.init()
+    return pygame.Surface(size)
+
+
+# drives a car for a step with a DrivingEnv action, see DrivingEnv
+def drive(car, turn, throttle, power, maxTurn):
+    turn = min(1, max(-1, turn))
+    throttle = min(1, max(-1, throttle))
+    angle = car.angle + turn * maxTurn
+    if throttle > 0:
+        car.steer(angle, throttle * car.MAX_FWD_SPEED)
+    elif throttle < 0:
+        car.reverse(angle, -throttle * car.MAX_REV_SPEED)
+    else:
+        car.idle()
+
+    if power > 0.5:
+        if car.hasPower() and not car.powerActive:
+            car.activatePower()
+    else:
+        car.deactivatePower()
+
+
+# observations of the player's car in several races on the same track,
+# one row each, see DrivingEnv; shared by DrivingEnv and DrivingVecEnv
+def drivingObservation(out, races):
+    width, height = DrivingEnv.SIZE
+    x, y, nextX, nextY, angle, speed, laps, power, active = np.array([
+        (car.rect.centerx, car.rect.centery)
+        + scene.tracker.nextCheckpoint(car).rect.center
+        + (car.angle, car.speed / car.MAX_RANDOM_SPEED,
+           scene.tracker.laps(car) / scene.LAP_LIMIT,
+           bool(car.hasPower()), car.powerActive)
+        for scene, car in ((scene, scene.player) for scene in races)],
+        dtype=float).T
+    angle = fastmath.vradians(angle)
+    terrain = track.terrainOf(races[0].track.lookup(x.astype(int),
+                                                    y.astype(int)))
+    out[:, 0] = x / width
+    out[:, 1] = y / height
+    out[:, 2] = speed
+    out[:, 3] = fastmath.vcos(angle)
+    out[:, 4] = -fastmath.vsin(angle)
+    out[:, 5] = (nextX - x) / width
+    out[:, 6] = (nextY - y) / height
+    out[:, 7] = terrain == track.TerrainType.ROAD.value
+    out[:, 8] = terrain == track.TerrainType.GRASS.value
+    out[:, 9] = terrain == track.TerrainType.BARRIER.value
+    out[:, 10] = laps
+    out[:, 11] = power
+    out[:, 12] = active
+    return out
+
+
+class DrivingEnv:
+    """a race against the CPU drivers, driving the player's car
+
+    An action is (turn, throttle, power):
+        turn      -1 to 1, heading change as a fraction of MAX_TURN
+        throttle  -1 to 1, fraction of the top forward (or reverse) speed
+        power     above 0.5 uses the car's power-up
+    An observation is a vector of OBS_SIZE floats:
+        x, y               position, as fractions of the screen size
+        speed              as a fraction of the fastest speed possible
+        cos, sin           heading, as a unit vector in screen coordinates
+        dx, dy             to the next checkpoint, in screen sizes
+        road, grass, barrier   one-hot terrain under the car
+        laps               as a fraction of the lap limit
+        power, active      whether the car has a power-up, and is using it
+    The reward is the progress made towards the next checkpoint, each
+    checkpoint being worth 1, less TIME_PENALTY per step, plus
+    FINISH_REWARD for finishing. An episode is done when the player
+    finishes, or after maxSteps (info['truncated'] tells them apart).
+    """
+    SIZE = (1000, 800)  # screen size the race is simulated at
+    FPS = 60  # simulated frames per second
+    MAX_STEPS = 60 * 180  # steps before an episode is cut off
+    MAX_TURN = 30  # largest heading change per step, in degrees
+    TIME_PENALTY = 0.001  # reward lost every step
+    FINISH_REWARD = 10  # reward for finishing the race
+    OBS_SIZE = 13
+    ACTION_SIZE = 3
+
+    def __init__(self, maxSteps=MAX_STEPS):
+        self.maxSteps = maxSteps
+        self.screen = headless(self.SIZE)
+        self.scene = None
+
+    def reset(self, seed=None):
+        self.clock = FrameClock(self.FPS)
+        scene = scenes.DrivingScene(self.clock, np.random.default_rng(seed),
+                                    saveResults=False)
+        scene.initGraphics(self.screen)
+        scene.controller = self._drive
+        scene.started = True
+        scene.startTime = self.clock()
+        scene.tracker.start()
+        self.scene = scene
+
+        # length of the leg leading to each checkpoint, to measure progress
+        centers = np.array([checkpoint.rect.center
+                            for checkpoint in scene.checkpoints], dtype=float)
+        legs = centers - np.roll(centers, 1, axis=0)
+        self.legs = fastmath.vhypot(legs[:, 0], legs[:, 1])
+
+        self.steps = 0
+        self.action = np.zeros(self.ACTION_SIZE)
+        scene.tracker.update()
+        self.score = self._score()
+        return self.observe()
+
+    def step(self, action):
+        self.action = action
+        self.scene.Update()
+        reward, done, info = self._advance()
+        return self.observe(), reward, done, info
+
+    # the observation vector, written into out if given
+    def observe(self, out=None):
+        if out is None:
+            out = np.empty(self.OBS_SIZE)
+        drivingObservation(out[np.newaxis], [self.scene])
+        return out
+
+    # moves time on after a step of the scene, returns its reward, whether
+    # the episode is done and the info
+    def _advance(self):
+        self.clock.tick()
+        self.steps += 1
+
+        player = self.scene.player
+        finished = player in self.scene.tracker.finished
+        score = self._score()
+        reward = score - self.score - self.TIME_PENALTY
+        if finished:
+            reward += self.FINISH_REWARD
+        self.score = score
+
+        truncated = not finished and self.steps >= self.maxSteps
+        info = {'laps': self.scene.tracker.laps(player),
+                'position': self.scene.tracker.position(player),
+                'time': self.scene.timeElapsed,
+                'truncated': truncated}
+        return reward, finished or truncated, info
+
+    # the scene rendered as an RGB array of shape (height, width, 3)
+    def render(self):
+        self.scene.Render()
+        return pygame.surfarray.array3d(self.screen).swapaxes(0, 1)
+
+    # applies the current action to the player's car
+    def _drive(self, car):
+        drive(car, *self.action, self.MAX_TURN)
+
+    # checkpoints reached, plus the fraction of the way to the next one
+    def _score(self):
+        tracker = self.scene.tracker
+        progress = tracker.progress[self.scene.player]
+        n = len(self.scene.checkpoints)
+        nextIndex = (progress.checkpoint + 1) % n
+        return progress.laps * n + progress.checkpoint \
+            + 1 - progress.distance / self.legs[nextIndex]
+
+
+class DrivingVecEnv:
+    """K races stepped in lockstep
+
+    Every race is a DrivingScene of its own, stepped through the phases of
+    DrivingScene.Update, but the array work of each phase is done once for
+    the cars of all K races: the terrain and checkpoint reads
+    (Track.underCars), the CPU drivers' plan (ai.driveAll), the barrier
+    sweep (scenes.sweepCars) and the observations. The races share the
+    track, and each keeps its own random generator, so a race plays out
+    exactly as in a DrivingEnv with the same seed. Car physics, power-ups
+    and lap tracking still run per car in Python, so K races cost less
+    than K DrivingEnvs, but not K times less (see benchmark.py env).
+
+    Actions are a (K, ACTION_SIZE) array, and observations, rewards and
+    dones come back as (K, ...) arrays with one info dict per race. A race
+    that is done is reset straight away: its row holds the first
+    observation of the next episode, and its info holds the last one of
+    the finished episode as 'final_observation'.
+    """
+
+    def __init__(self, k, maxSteps=DrivingEnv.MAX_STEPS):
+        self.envs = [DrivingEnv(maxSteps) for i in range(k)]
+        self.obs = np.empty((k, DrivingEnv.OBS_SIZE))
+        self.rewards = np.empty(k)
+        self.dones = np.empty(k, dtype=bool)
+
+    def __len__(self):
+        return len(self.envs)
+
+    def reset(self, seed=None):
+        seeds = np.random.SeedSequence(seed).spawn(len(self.envs))
+        self.rngs = [np.random.default_rng(s) for s in seeds]
+        for i, env in enumerate(self.envs):
+            env.reset(self._seed(i))
+        drivingObservation(self.obs, [env.scene for env in self.envs])
+        return self.obs.copy()
+
+    def step(self, actions):
+        for env, action in zip(self.envs, actions):
+            env.action = action
+        self._update([env.scene for env in self.envs])
+
+        infos = []
+        for i, env in enumerate(self.envs):
+            self.rewards[i], self.dones[i], info = env._advance()
+            infos.append(info)
+        done = np.flatnonzero(self.dones)
+        if len(done):
+            final = drivingObservation(
+                np.empty((len(done), DrivingEnv.OBS_SIZE)),
+                [self.envs[i].scene for i in done])
+            for i, obs in zip(done, final):
+                infos[i]['final_observation'] = obs
+                self.envs[i].reset(self._seed(i))
+        drivingObservation(self.obs, [env.scene for env in self.envs])
+        return self.obs.copy(), self.rewards.copy(), self.dones.copy(), infos
+
+    # DrivingScene.Update for every race, each phase for all of them
+    @staticmethod
+    def _update(races):
+        races = [scene for scene in races if scene.startStep()]
+        if not races:
+            return
+        carsOf = [scene.cars.sprites() for scene in races]
+        cars = [car for group in carsOf for car in group]
+        ends = np.cumsum([len(group) for group in carsOf])[:-1]
+        raceTrack = races[0].track
+        terrainUnder, nearCheckpoint = raceTrack.underCars(
+            np.array([car.rect for car in cars]))
+
+        for scene in races:
+            scene.drivePlayerCar()
+        ai.driveAll([scene.driver for scene in races],
+                    [[car for car in group if car.isCPU] for group in carsOf])
+        for scene, group, terrain, near in zip(
+                races, carsOf, np.split(terrainUnder, ends),
+                np.split(nearCheckpoint, ends)):
+            scene.touchCars(group, terrain, near)
+        starts = np.concatenate([scene.moveCars(group)
+                                 for scene, group in zip(races, carsOf)])
+        scenes.sweepCars(cars, starts, races[0].barrierBoxes,
+                         raceTrack.nearBarrier)
+        for scene in races:
+            scene.endStep()
+
+    # the seed of race i's next episode
+    def _seed(self, i):
+        return int(self.rngs[i].integers(2 ** 32))
+
+
+# copter observations, shared by CopterEnv and CopterVecEnv so a policy can
+# move between them; every argument holds one row per world:
+#     top, v, lives     the copter's top edge, vertical speed and lives
+#     invincible, ready whether it was just hurt, and can shoot
+#     roofs, floors     cave profile ahead, (M, PROFILE_POINTS)
+#     obstacles         left, top, width, height of each enemy, (M, K, 4)
+#     projectiles       x, y of each projectile, (M, P, 2)
+#     obstacleAlive, projectileAlive  which slots are in use, (M, K) / (M, P)
+def copterObservation(out, top, v, lives, invincible, ready, roofs, floors,
+                      obstacles, obstacleAlive, projectiles, projectileAlive):
+    width, height = CopterEnv.SIZE
+    left = CopterEnv.COPTER_LEFT
+    copterWidth, copterHeight = copter.Copter.SIZE
+    cx = left + copterWidth / 2
+    cy = top + copterHeight / 2
+    points = CopterEnv.PROFILE_POINTS
+    rows = np.arange(len(out))[:, np.newaxis]
+
+    out[:, 0] = cy / height
+    out[:, 1] = v / CopterEnv.MAX_SPEED
+    out[:, 2] = lives / CopterEnv.LIVES
+    out[:, 3] = invincible
+    out[:, 4] = ready
+    i = 5
+    out[:, i:i + points] = (roofs - cy[:, np.newaxis]) / height
+    i += points
+    out[:, i:i + points] = (floors - cy[:, np.newaxis]) / height
+    i += points
+
+    # the enemies ahead, nearest first
+    slots = CopterEnv.OBSTACLE_SLOTS
+    ahead = obstacles[..., 0] + obstacles[..., 2] - left
+    key = np.where(obstacleAlive & (ahead > 0), ahead, np.inf)
+    nearest = np.argsort(key, axis=1)[:, :slots]
+    found = np.isfinite(key[rows, nearest])
+    chosen = obstacles[rows, nearest]
+    features = np.stack([found,
+                         (chosen[..., 0] + chosen[..., 2] / 2
+                          - cx) / width,
+                         (chosen[..., 1] + chosen[..., 3] / 2
+                          - cy[:, np.newaxis]) / height,
+                         chosen[..., 3] / height], axis=2)
+    out[:, i:i + 4 * slots] = np.where(found[..., np.newaxis], features, 0)\
+        .reshape(len(out), -1)
+    i += 4 * slots
+
+    # the projectiles furthest behind, which are the latest shot
+    slots = CopterEnv.PROJECTILE_SLOTS
+    key = np.where(projectileAlive, projectiles[..., 0], np.inf)
+    nearest = np.argsort(key, axis=1)[:, :slots]
+    found = np.isfinite(key[rows, nearest])
+    chosen = projectiles[rows, nearest]
+    features = np.stack([found,
+                         (chosen[..., 0] - cx) / width,
+                         (chosen[..., 1] - cy[:, np.newaxis]) / height],
+                        axis=2)
+    out[:, i:i + 3 * slots] = np.where(found[..., np.newaxis], features, 0)\
+        .reshape(len(out), -1)
+    return out
+
+
+class CopterEnv:
+    """the copter game, flown through step(fly, shoot, aim)
+
+        fly    whether to fly up (the copter drops otherwise)
+        shoot  whether to shoot, when the gun has reloaded
+        aim    angle to shoot at in degrees, counter-clockwise from ahead
+    An observation is a vector of OBS_SIZE floats, see copterObservation():
+    the copter's height, speed, lives and whether it is invincible or ready
+    to shoot, the roof and floor of the cave at PROFILE_POINTS columns from
+    the copter onwards, the nearest OBSTACLE_SLOTS enemies ahead and the
+    latest PROJECTILE_SLOTS projectiles, all relative to the copter. The
+    reward is the game's score: the time survived plus the award for every
+    enemy shot down. An episode is done when the copter crashes, or after
+    maxSteps (info['truncated'] tells them apart).
+    """
+    SIZE = (1000, 800)
+    FPS = 60
+    MAX_STEPS = 60 * 600
+    COPTER_LEFT = SIZE[0] // 4 - copter.Copter.SIZE[0] // 2
+    LIVES = 3  # lives at the start of a game
+    MAX_SPEED = 20  # copter speed scale in observations
+    PROFILE_POINTS = 16  # cave columns observed
+    PROFILE_STRIDE = 4  # wall widths between observed columns
+    OBSTACLE_SLOTS = 4
+    PROJECTILE_SLOTS = 2
+    OBS_SIZE = 5 + 2 * PROFILE_POINTS + 4 * OBSTACLE_SLOTS \
+        + 3 * PROJECTILE_SLOTS
+
+    def __init__(self, maxSteps=MAX_STEPS):
+        self.maxSteps = maxSteps
+        self.screen = headless(self.SIZE)
+        self.scene = None
+
+    def reset(self, seed=None):
+        self.clock = FrameClock(self.FPS)
+        scene = scenes.CopterScene(self.clock, np.random.default_rng(seed),
+                                   saveResults=False)
+        scene.initGraphics(self.screen)
+        scene.controller = lambda: self.action
+        self.scene = scene
+        self.steps = 0
+        self.action = (False, False, 0)
+        self.score = 0
+        return self.observe()
+
+    def step(self, fly, shoot, aim=0):
+        self.action = (fly, shoot, aim)
+        self.scene.Update()
+        self.clock.tick()
+        self.steps += 1
+
+        score = self.clock() - self.scene.starttime
+        reward = score - self.score
+        self.score = score
+        truncated = not self.scene.over and self.steps >= self.maxSteps
+        info = {'score': score,
+                'kills': self.scene.kills,
+                'lives': self.scene.copter.lives,
+                'truncated': truncated}
+        return self.observe(), reward, self.scene.over or truncated, info
+
+    # the observation vector, written into out if given
+    def observe(self, out=None):
+        if out is None:
+            out = np.empty(self.OBS_SIZE)
+        scene = self.scene
+        heli = scene.copter
+        columns = (scene.copterIndex + self.PROFILE_STRIDE
+                   * np.arange(self.PROFILE_POINTS)) % len(scene.gap_pos)
+        gaps = scene.gap_pos[columns]
+        half = scene.gap_heights[columns] / 2
+        obstacles = np.array([list(ob.rect) for ob in scene.obstacles],
+                             dtype=float).reshape(1, -1, 4)
+        projectiles = np.array([p.rect.center for p in scene.projectiles],
+                               dtype=float).reshape(1, -1, 2)
+        # pad so there are always enough slots to choose from
+        obstacles = np.concatenate(
+            [obstacles, np.zeros((1, self.OBSTACLE_SLOTS, 4))], axis=1)
+        projectiles = np.concatenate(
+            [projectiles, np.zeros((1, self.PROJECTILE_SLOTS, 2))], axis=1)
+        obstacleAlive = np.arange(obstacles.shape[1]) < len(scene.obstacles)
+        projectileAlive = np.arange(projectiles.shape[1]) \
+            < len(scene.projectiles)
+        copterObservation(out[np.newaxis], np.array([heli.rect.top]),
+                          np.array([heli.v.y]), np.array([heli.lives]),
+                          np.array([heli.invincible()]),
+                          np.array([heli.readyToShoot()]),
+                          (gaps - half)[np.newaxis], (gaps + half)[np.newaxis],
+                          obstacles, obstacleAlive[np.newaxis],
+                          projectiles, projectileAlive[np.newaxis])
+        return out
+
+    # the scene rendered as an RGB array of shape (height, width, 3)
+    def render(self):
+        self.scene.Render()
+        return pygame.surfarray.array3d(self.screen).swapaxes(0, 1)
+
+
+class CopterVecEnv:
+    """many copter games in lockstep, simulated with NumPy
+
+    A re-implementation of CopterScene's rules on arrays, with one row per
+    world: the copter, a ring buffer of cave columns, a fixed number of
+    enemy and bullet slots, and the spawn timers. Every step updates all
+    the worlds with array operations, so the cost of a step grows with the
+    number of worlds but not with Python overhead per world. It uses the
+    scene's and sprites' constants, but leaves out power-ups, sounds and
+    the pixel-exact wall masks, so it is a close approximation of the game
+    rather than a replay of it.
+
+    step() takes fly, shoot and aim arrays with one entry per world and
+    returns (observations, rewards, dones, info), where info is a dict of
+    per-world arrays. Finished worlds are reset straight away, and their
+    last observations are in info['final_observation'].
+    """
+    OBSTACLES = 16  # enemy slots per world
+    PROJECTILES = 4  # bullet slots per world
+    BLOCK, BAT, BALLOON = range(3)
+    GENERATORS = ['bats', 'obstacles', 'balloons']
+    BALLOON_FLOAT = np.array([1, 1.5, 2])  # float speed of each colour
+    BALLOON_AWARD = np.array([5, 7, 10])
+    BALLOON_ODDS = np.array([3, 2, 1]) / 6
+
+    def __init__(self, n, maxSteps=CopterEnv.MAX_STEPS):
+        self.n = n
+        self.maxSteps = maxSteps
+        width, height = CopterEnv.SIZE
+        self.columns = int(fastmath.ceil(width / copter.Wall.WIDTH)) + 3
+        self.dt = 1 / CopterEnv.FPS
+        copterWidth, copterHeight = copter.Copter.SIZE
+        left = CopterEnv.COPTER_LEFT
+        # cave columns under the copter, and those it observes
+        self.copterColumns = np.arange(left // copter.Wall.WIDTH,
+                                       (left + copterWidth)
+                                       // copter.Wall.WIDTH + 1)
+        self.copterColumn = (left + copterWidth // 2) // copter.Wall.WIDTH
+        self.profileColumns = self.copterColumn + CopterEnv.PROFILE_STRIDE \
+            * np.arange(CopterEnv.PROFILE_POINTS)
+        self.obs = np.empty((n, CopterEnv.OBS_SIZE))
+
+    def reset(self, seed=None):
+        n = self.n
+        self.rng = np.random.default_rng(seed)
+        self.head = 0  # ring buffer index of the leftmost cave column
+        self.gapPos = np.zeros((n, self.columns))
+        self.gapHeight = np.zeros((n, self.columns))
+        self.lastHeight = np.zeros(n)
+        self.fluctuation = np.zeros(n)
+        self.lastNarrow = np.zeros(n)
+        self.lastFluct = np.zeros(n)
+        self.time = np.zeros(n)
+        self.awards = np.zeros(n)
+        self.kills = np.zeros(n, dtype=int)
+        self.steps = np.zeros(n, dtype=int)
+
+        self.top = np.zeros(n)
+        self.v = np.zeros(n)
+        self.lives = np.zeros(n, dtype=int)
+        self.lastHurt = np.zeros(n)
+        self.lastShot = np.zeros(n)
+        self.flying = np.zeros(n, dtype=bool)
+        self.controlled = np.zeros(n, dtype=bool)
+
+        self.timers = np.zeros((n, len(self.GENERATORS)))
+        self.intervals = np.zeros((n, len(self.GENERATORS)))
+
+        k, p = self.OBSTACLES, self.PROJECTILES
+        self.obstacles = np.zeros((n, k, 4))  # left, top, width, height
+        self.obstacleLives = np.zeros((n, k), dtype=int)
+        self.obstacleKind = np.zeros((n, k), dtype=int)
+        self.obstacleAward = np.zeros((n, k))
+        self.obstacleFloat = np.zeros((n, k))
+        self.projectiles = np.zeros((n, p, 2))
+        self.projectileV = np.zeros((n, p, 2))
+        self.projectileAlive = np.zeros((n, p), dtype=bool)
+
+        self._resetWorlds(np.ones(n, dtype=bool))
+        return self.observe()
+
+    def step(self, fly, shoot, aim=0):
+        n = self.n
+        width, height = CopterEnv.SIZE
+        copterWidth, copterHeight = copter.Copter.SIZE
+        left = CopterEnv.COPTER_LEFT
+        fly = np.broadcast_to(np.asarray(fly, dtype=bool), n)
+        shoot = np.broadcast_to(np.asarray(shoot, dtype=bool), n)
+        aim = fastmath.vradians(np.broadcast_to(np.asarray(aim, dtype=float),
+                                                n))
+        self.time += self.dt
+        self.steps += 1
+        awards = self.awards.copy()
+
+        # flying only takes back control on a fresh press
+        self.controlled |= fly & ~self.flying
+        self.flying = fly.copy()
+
+        # crashing into the cave or an enemy takes a life
+        over = (self.top < 0) | (self.top + copterHeight > height)
+        roofs, floors = self._cave(self.copterColumns)
+        hitCave = (self.top < roofs.max(axis=1)) \
+            | (self.top + copterHeight > floors.min(axis=1))
+        ob = self.obstacles
+        alive = self.obstacleLives > 0
+        hitEnemy = (alive & (ob[..., 0] < left + copterWidth)
+                    & (ob[..., 0] + ob[..., 2] > left)
+                    & (ob[..., 1] < self.top[:, np.newaxis] + copterHeight)
+                    & (ob[..., 1] + ob[..., 3] > self.top[:, np.newaxis]))\
+            .any(axis=1)
+        hurt = (hitCave | hitEnemy) & ~self._invincible()
+        self.lives -= hurt
+        self.lastHurt[hurt] = self.time[hurt]
+        self.controlled &= ~hurt
+        over |= self.lives <= 0
+        # back into the middle of the cave
+        gaps = self.gapPos[:, (self.head + self.copterColumn) % self.columns]
+        self.top = np.where(hurt, gaps, self.top)
+
+        self._scroll()
+        self._spawn()
+        self._moveEnemies()
+        self._shoot(shoot, aim)
+        self._moveProjectiles()
+
+        # flying logic
+        self.controlled |= ~self._invincible()
+        accel = np.where(self.flying, -copter.Copter.WEIGHT,
+                         copter.Copter.WEIGHT)
+        self.v = np.where(self.controlled, self.v + accel, 0)
+        self.top += self.v
+
+        rewards = self.dt + self.awards - awards
+        truncated = ~over & (self.steps >= self.maxSteps)
+        dones = over | truncated
+        info = {'score': self.time + self.awards,
+                'kills': self.kills.copy(),
+                'lives': self.lives.copy(),
+                'truncated': truncated}
+        obs = self.observe()
+        if dones.any():
+            info['final_observation'] = obs[dones]
+            self._resetWorlds(dones)
+            obs = self.observe()
+        return obs, rewards, dones, info
+
+    def observe(self):
+        roofs, floors = self._cave(self.profileColumns)
+        return copterObservation(self.obs.copy(), self.top, self.v,
+                                 self.lives, self._invincible(),
+                                 self._ready(), roofs, floors,
+                                 self.obstacles, self.obstacleLives > 0,
+                                 self.projectiles, self.projectileAlive)
+
+    # roofs and floors of the cave at columns counted from the left edge
+    def _cave(self, columns):
+        ring = (self.head + columns) % self.columns
+        gaps = self.gapPos[:, ring]
+        half = self.gapHeight[:, ring] / 2
+        return gaps - half, gaps + half
+
+    def _invincible(self):
+        return self.time - self.lastHurt < copter.Copter.INVINCIBILITY_TIME
+
+    def _ready(self):
+        return self.time - self.lastShot \
+            > copter.Copter.MACHINE_GUN_RELOAD_TIME
+
+    # starts new games in the worlds in the mask
+    def _resetWorlds(self, mask):
+        count = mask.sum()
+        width, height = CopterEnv.SIZE
+        scene = scenes.CopterScene
+        self.time[mask] = 0
+        self.awards[mask] = 0
+        self.kills[mask] = 0
+        self.steps[mask] = 0
+        self.lastNarrow[mask] = 0
+        self.lastFluct[mask] = 0
+        self.fluctuation[mask] = scene.FLUCTUATION
+
+        # a fresh cave, as a random walk of the gap's centre
+        gapHeight = scene.GAP_FRACTION * height
+        start = self.rng.random(count) \
+            * (height * (1 - 2 * scene.GAP_CLEARANCE - scene.GAP_FRACTION)) \
+            + height * (scene.GAP_CLEARANCE + 0.5 * scene.GAP_FRACTION)
+        steps = scene.FLUCTUATION \
+            * self.rng.standard_normal((count, self.columns - 1))
+        walk = np.concatenate([start[:, np.newaxis],
+                               start[:, np.newaxis]
+                               + np.cumsum(steps, axis=1)], axis=1)
+        walk = np.clip(walk, gapHeight / 2 + scene.GAP_CLEARANCE * height,
+                       (1 - scene.GAP_CLEARANCE) * height - gapHeight / 2)
+        ring = (self.head + np.arange(self.columns)) % self.columns
+        self.gapPos[np.ix_(mask, ring)] = walk
+        self.gapHeight[mask] = gapHeight
+        self.lastHeight[mask] = gapHeight
+
+        self.top[mask] = height / 2 - copter.Copter.SIZE[1] / 2
+        self.v[mask] = 0
+        self.lives[mask] = CopterEnv.LIVES
+        self.lastHurt[mask] = -np.inf
+        self.lastShot[mask] = -np.inf
+        self.flying[mask] = False
+        self.controlled[mask] = True
+
+        self.intervals[mask] = [scene.SPAWN_INTERVAL[generator]
+                                for generator in self.GENERATORS]
+        self.timers[mask] = self.rng.exponential(self.intervals[mask])
+        self.obstacleLives[mask] = 0
+        self.projectileAlive[mask] = False
+
+    # moves the cave one column left and adds a column on the right
+    def _scroll(self):
+        width, height = CopterEnv.SIZE
+        scene = scenes.CopterScene
+        narrow = self.time - self.lastNarrow >= scene.NARROWING_INTERVAL
+        self.lastHeight = np.where(
+            narrow, np.maximum(0.95 * self.lastHeight,
+                               3 * copter.Copter.SIZE[1]), self.lastHeight)
+        self.lastNarrow[narrow] = self.time[narrow]
+        fluct = self.time - self.lastFluct >= scene.FLUCTUATION_INTERVAL
+        self.fluctuation = np.where(
+            fluct, np.minimum(self.fluctuation + 1, scene.MAX_FLUCTUATION),
+            self.fluctuation)
+        self.lastFluct[fluct] = self.time[fluct]
+
+        last = self.gapPos[:, (self.head - 1) % self.columns]
+        gap = last + self.fluctuation * self.rng.standard_normal(self.n)
+        gap = np.clip(gap,
+                      self.lastHeight / 2 + scene.GAP_CLEARANCE * height,
+                      (1 - scene.GAP_CLEARANCE) * height
+                      - self.lastHeight / 2)
+        # the leftmost column's slot becomes the new rightmost column
+        self.gapPos[:, self.head] = gap
+        self.gapHeight[:, self.head] = self.lastHeight
+        self.head = (self.head + 1) % self.columns
+
+    # spawns enemies whose timers ran out, in free slots
+    def _spawn(self):
+        width, height = CopterEnv.SIZE
+        self.timers -= self.dt
+        newest = (self.head - 1) % self.columns
+        gap = self.gapHeight[:, newest]
+        roof = self.gapPos[:, newest] - gap / 2
+        for g, generator in enumerate(self.GENERATORS):
+            due = self.timers[:, g] <= 0
+            free = self.obstacleLives <= 0
+            worlds = np.flatnonzero(due & free.any(axis=1))
+            if len(worlds) == 0:
+                continue
+            slots = np.argmax(free[worlds], axis=1)
+            u = self.rng.random(len(worlds))
+            w, r = gap[worlds], roof[worlds]
+            if generator == 'obstacles':
+                size = copter.Obstacle.MIN_HEIGHT + u * 0.4 * w
+                top = self.rng.random(len(worlds)) * (w - size) + r
+                kind, lives, award, float_ = self.BLOCK, 2, 0, 0
+                shape = (2 * copter.Wall.WIDTH, size)
+            elif generator == 'bats':
+                top = u * 0.8 * (w - 32) + 1.1 * r
+                kind, lives, award, float_ = self.BAT, 1, copter.Bat.AWARD, 0
+                shape = (32, 32)
+            else:
+                top = u * 0.6 * w + 1.4 * r
+                colour = self.rng.choice(3, len(worlds), p=self.BALLOON_ODDS)
+                kind, lives = self.BALLOON, 1
+                award = self.BALLOON_AWARD[colour]
+                float_ = self.BALLOON_FLOAT[colour]
+                shape = (15, 30)
+            self.obstacles[worlds, slots, 0] = width
+            self.obstacles[worlds, slots, 1] = top
+            self.obstacles[worlds, slots, 2] = shape[0]
+            self.obstacles[worlds, slots, 3] = shape[1]
+            self.obstacleKind[worlds, slots] = kind
+            self.obstacleLives[worlds, slots] = lives
+            self.obstacleAward[worlds, slots] = award
+            self.obstacleFloat[worlds, slots] = float_
+
+            self.timers[due, g] = self.rng.exponential(self.intervals[due, g])
+            if generator != 'obstacles':
+                self.intervals[worlds, g] = np.maximum(
+                    5, self.intervals[worlds, g] * 0.95)
+
+    def _moveEnemies(self):
+        ob = self.obstacles
+        kind = self.obstacleKind
+        alive = self.obstacleLives > 0
+        bats = alive & (kind == self.BAT)
+        balloons = alive & (kind == self.BALLOON)
+        ob[..., 0] -= np.where(bats, 1.2 * copter.Wall.SPEED,
+                               copter.Wall.SPEED)
+
+        # bats flutter about inside the cave
+        columns = np.clip(ob[..., 0] // copter.Wall.WIDTH, 0,
+                          self.columns - 1).astype(int)
+        ring = (self.head + columns) % self.columns
+        rows = np.arange(self.n)[:, np.newaxis]
+        gaps = self.gapPos[rows, ring]
+        half = self.gapHeight[rows, ring] / 2
+        flutter = np.clip(ob[..., 1] + self.rng.standard_normal(kind.shape),
+                          gaps - half + copter.Bat.CLEARANCE,
+                          gaps + half - ob[..., 3] - copter.Bat.CLEARANCE)
+        ob[..., 1] = np.where(bats, flutter, ob[..., 1])
+
+        # balloons float up
+        rise = np.minimum(-0.1, self.rng.normal(-self.obstacleFloat, 0.5))
+        ob[..., 1] += np.where(balloons, rise, 0)
+
+        gone = (ob[..., 0] + ob[..., 2] < 0) | (ob[..., 1] + ob[..., 3] < 0)
+        self.obstacleLives[gone] = 0
+
+    def _shoot(self, shoot, aim):
+        free = ~self.projectileAlive
+        worlds = np.flatnonzero(shoot & self._ready() & free.any(axis=1))
+        if len(worlds) == 0:
+            return
+        slots = np.argmax(free[worlds], axis=1)
+        copterWidth, copterHeight = copter.Copter.SIZE
+        speed = 20
+        self.projectiles[worlds, slots, 0] = CopterEnv.COPTER_LEFT \
+            + copterWidth - 10
+        self.projectiles[worlds, slots, 1] = self.top[worlds] + copterHeight
+        self.projectileV[worlds, slots, 0] = speed * fastmath.vcos(aim[worlds])
+        self.projectileV[worlds, slots, 1] = -speed * fastmath.vsin(aim[worlds])
+        self.projectileAlive[worlds, slots] = True
+        self.lastShot[worlds] = self.time[worlds]
+
+    def _moveProjectiles(self):
+        width, height = CopterEnv.SIZE
+        p = self.projectiles
+        last = p.copy()
+        p += self.projectileV
+        alive = self.projectileAlive
+
+        # bullets stop at the cave walls and the screen edges
+        columns = np.clip(p[..., 0] // copter.Wall.WIDTH, 0,
+                          self.columns - 1).astype(int)
+        ring = (self.head + columns) % self.columns
+        rows = np.arange(self.n)[:, np.newaxis]
+        gaps = self.gapPos[rows, ring]
+        half = self.gapHeight[rows, ring] / 2
+        alive &= (p[..., 1] > gaps - half) & (p[..., 1] < gaps + half) \
+            & (p[..., 0] >= 0) & (p[..., 0] <= width)
+
+        # a bullet hits an enemy it passed through since the last step
+        ob = self.obstacles[:, np.newaxis]
+        hits = alive[..., np.newaxis] \
+            & (self.obstacleLives > 0)[:, np.newaxis] \
+            & (np.minimum(last[..., 0], p[..., 0])[..., np.newaxis]
+               <= ob[..., 0] + ob[..., 2]) \
+            & (np.maximum(last[..., 0], p[..., 0])[..., np.newaxis]
+               >= ob[..., 0]) \
+            & (p[..., 1, np.newaxis] >= ob[..., 1]) \
+            & (p[..., 1, np.newaxis] <= ob[..., 1] + ob[..., 3])
+        hit = hits.any(axis=2)
+        if hit.any():
+            worlds, bullets = np.nonzero(hit)
+            targets = np.argmax(hits[worlds, bullets], axis=1)
+            before = self.obstacleLives > 0
+            np.subtract.at(self.obstacleLives, (worlds, targets), 1)
+            killed = before & (self.obstacleLives <= 0)
+            self.awards += (self.obstacleAward * killed).sum(axis=1)
+            self.kills += killed.sum(axis=1)
+            alive &= ~hit
+        self.projectileAlive = alive
@@ -0,0 +1,29 @@
+"""scalar and vectorized math
+
+NumPy ufuncs work on Python floats but pay around a microsecond of
+dispatch per call, which adds up in per-sprite, per-frame code. Use the
+scalar functions (backed by math) for single values and the v-prefixed
+functions (backed by NumPy) for arrays of many sprites at once.
+"""
+import math
+import numpy as np
+
+pi = math.pi
+
+# scalar paths, for plain Python numbers
+radians = math.radians
+degrees = math.degrees
+cos = math.cos
+sin = math.sin
+atan2 = math.atan2
+hypot = math.hypot
+ceil = math.ceil
+
+# vectorized paths, for NumPy arrays
+vradians = np.radians
+vdegrees = np.degrees
+vcos = np.cos
+vsin = np.sin
+vatan2 = np.arctan2
+vhypot = np.hypot
+vceil = np.ceil
@@ -0,0 +1,369 @@
+"""game loops: sequential, or with the simulation on its own thread
+
+runSequential() handles input, Update, Render and presenting in turn, so
+a slow frame delays the simulation as much as the picture. runThreaded()
+steps the scene at a fixed rate on a simulation thread, while the main
+thread handles events, renders and presents:
+
+    - after every step the simulation publishes the scene's Snapshot(), an
+      immutable picture of it (sprite images, positions, angles and HUD
+      values), to a SnapshotBuffer
+    - the renderer draws the latest two snapshots with the scene's
+      RenderSnapshot(), interpolated by how far it is into the next step
+    - scenes without snapshots (Snapshot() returns None) are drawn with
+      Render() while holding the simulation's lock, as before
+
+Pygame's blits and scaling release the GIL, so rendering and presenting
+overlap with the next simulation step. A FrameProfiler records frame and
+step times in either mode.
+"""
+import threading
+import time
+import queue
+from contextlib import contextmanager
+import numpy as np
+import pygame
+
+
+class FrameProfiler:
+    """frame and phase times of a game loop
+
+    Each series is a ring buffer of the last `capacity` times, in seconds.
+    tick() records the interval since its last call, time() the length of
+    a block. Series are written by one thread each.
+    """
+    LATE = 1.5  # frames longer than this many target intervals are late
+
+    def __init__(self, fps=60, capacity=4096):
+        self.interval = 1 / fps
+        self.capacity = capacity
+        self.series = {}
+        self.counts = {}
+        self.last = {}
+        self.lock = threading.Lock()
+
+    def record(self, name, seconds):
+        if name not in self.series:
+            with self.lock:
+                self.series[name] = np.zeros(self.capacity)
+                self.counts[name] = 0
+        self.series[name][self.counts[name] % self.capacity] = seconds
+        self.counts[name] += 1
+
+    # records the time since the last tick of the same name
+    def tick(self, name='frame'):
+        now = time.perf_counter()
+        last = self.last.get(name)
+        self.last[name] = now
+        if last is not None:
+            self.record(name, now - last)
+
+    @contextmanager
+    def time(self, name):
+        start = time.perf_counter()
+        yield
+        self.record(name, time.perf_counter() - start)
+
+    def times(self, name):
+        count = min(self.counts.get(name, 0), self.capacity)
+        return self.series[name][:count] if count else np.zeros(0)
+
+    # summary of a series in milliseconds
+    def stats(self, name):
+        times = self.times(name) * 1000
+        if len(times) == 0:
+            return {'count': 0}
+        p50, p95, p99 = np.percentile(times, [50, 95, 99])
+        return {'count': len(times), 'mean': times.mean(), 'p50': p50,
+                'p95': p95, 'p99': p99, 'max': times.max(),
+                'jitter': times.std(),
+                'late': int((times > self.LATE * self.interval * 1000).sum())}
+
+    def report(self):
+        lines = []
+        for name in sorted(self.series):
+            s = self.stats(name)
+            lines.append("{0:>8}: mean {1:6.2f} p50 {2:6.2f} p95 {3:6.2f} "
+                         "p99 {4:6.2f} max {5:6.2f} jitter {6:5.2f} ms, "
+                         "{7} late of {8}"
+                         .format(name, s['mean'], s['p50'], s['p95'],
+                                 s['p99'], s['max'], s['jitter'], s['late'],
+                                 s['count']))
+        return "\n".join(lines)
+
+
+class SpriteLayer:
+    """images, top-left corners and angles of some sprites at one step
+
+    keys identify the sprites across snapshots, so a layer can be drawn
+    blended with the previous one. The arrays are read-only and the images
+    must not be drawn into after capture: sprites that change their image
+    in place hand over a copy.
+    """
+
+    def __init__(self, keys, images, positions, angles=None):
+        self.keys = np.array(keys, dtype=np.int64)
+        self.images = tuple(images)
+        self.positions = np.array(positions, dtype=float).reshape(-1, 2)
+        self.angles = None if angles is None \
+            else np.array(angles, dtype=float)
+        for array in [self.keys, self.positions, self.angles]:
+            if array is not None:
+                array.flags.writeable = False
+
+    @classmethod
+    def capture(cls, sprites):
+        return cls([id(sprite) for sprite in sprites],
+                   [sprite.image for sprite in sprites],
+                   [sprite.rect.topleft for sprite in sprites])
+
+    # positions and angles, moved back towards the same sprites' in the
+    # previous layer by 1 - alpha; new sprites are drawn where they are
+    def blend(self, previous, alpha):
+        positions = self.positions
+        angles = self.angles
+        if previous is None or alpha >= 1:
+            return positions, angles
+        common, mine, theirs = np.intersect1d(self.keys, previous.keys,
+                                              assume_unique=True,
+                                              return_indices=True)
+        positions = positions.copy()
+        positions[mine] += (1 - alpha) \
+            * (previous.positions[theirs] - positions[mine])
+        if angles is not None and previous.angles is not None:
+            angles = angles.copy()
+            # turn the short way round
+            turn = (previous.angles[theirs] - angles[mine] + 180) % 360 - 180
+            angles[mine] += (1 - alpha) * turn
+        return positions, angles
+
+    def draw(self, screen, previous=None, alpha=1):
+        positions, angles = self.blend(previous, alpha)
+        images = self.images
+        if angles is not None:
+            images = [pygame.transform.rotate(image, angle)
+                      for image, angle in zip(images, angles)]
+        screen.blits([(image, (round(x), round(y)))
+                      for image, (x, y) in zip(images, positions)], False)
+
+
+class Snapshot:
+    """a scene after one simulation step, for drawing on another thread
+
+    layers are SpriteLayers in drawing order and hud holds the values the
+    scene draws on top. A snapshot is never changed after it is published.
+    """
+
+    def __init__(self, time, layers=(), hud=None):
+        self.time = time  # the scene's clock at the step
+        self.layers = tuple(layers)
+        self.hud = dict(hud or {})
+
+    def draw(self, screen, previous=None, alpha=1):
+        for i, layer in enumerate(self.layers):
+            earlier = previous.layers[i] if previous is not None else None
+            layer.draw(screen, earlier, alpha)
+
+
+class SnapshotBuffer:
+    """double-buffered handoff of snapshots between threads
+
+    publish() moves the current snapshot to the previous slot and puts the
+    new one in its place; latest() reads both at once, so the renderer
+    always gets a consistent pair. Only references are swapped under the
+    lock, the snapshots themselves are immutable.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.scene = None
+        self.previous = None
+        self.current = None
+        self.published = 0  # perf_counter() when current was published
+
+    def publish(self, scene, snapshot):
+        with self.lock:
+            if scene is not self.scene:
+                self.scene = scene
+                self.current = None
+            self.previous = self.current
+            self.current = snapshot
+            self.published = time.perf_counter()
+
+    # previous and current snapshots of the scene, and when the current one
+    # was published; (None, None, 0) if there is none for this scene
+    def latest(self, scene):
+        with self.lock:
+            if scene is not self.scene:
+                return None, None, 0
+            return self.previous, self.current, self.published
+
+
+# pumps the window's events, handling resizes, and returns all of them
+def pollEvents(display):
+    events = pygame.event.get()
+    for event in events:
+        if event.type == pygame.VIDEORESIZE:
+            # scenes keep their logical resolution, only the
+            # presentation to the window changes
+            display.resize()
+    return events
+
+
+def initScene(scene, screen):
+    if not scene.initialized:
+        scene.initGraphics(screen)
+        scene.initialized = True
+
+
+# filterEvents(scene, events, pressed_keys) returns the events the scene
+# should see; frames limits how many frames are presented (None for no limit)
+def runSequential(display, fps, scene, filterEvents=None, profiler=None,
+                  frames=None):
+    clock = pygame.time.Clock()
+    profiler = profiler or FrameProfiler(fps)
+    while scene and frames != 0:
+        initScene(scene, display.target)
+
+        pressed_keys = pygame.key.get_pressed()
+        events = pollEvents(display)
+        if filterEvents is not None:
+            events = filterEvents(scene, events, pressed_keys)
+
+        with profiler.time('update'):
+            scene.ProcessInput(events, pressed_keys)
+            scene.Update()
+        profiler.tick('step')
+        with profiler.time('render'):
+            scene.Render()
+
+        scene = scene.next
+
+        with profiler.time('present'):
+            display.present()
+        clock.tick(fps)
+        profiler.tick('frame')
+        if frames is not None:
+            frames -= 1
+    return profiler
+
+
+class Simulation(threading.Thread):
+    """steps a scene at a fixed rate and publishes its snapshots
+
+    Input gathered on the main thread is queued with push() and handed to
+    the scene at its first step after it is initialised. If the simulation
+    falls more than MAX_LAG steps behind it skips ahead instead of running
+    steps back to back.
+    """
+    MAX_LAG = 5
+
+    def __init__(self, scene, screen, fps, filterEvents=None, profiler=None):
+        threading.Thread.__init__(self, name='simulation', daemon=True)
+        self.scene = scene
+        self.screen = screen
+        self.interval = 1 / fps
+        self.filterEvents = filterEvents
+        self.profiler = profiler or FrameProfiler(fps)
+        self.lock = threading.Lock()  # held while the scene is stepped
+        self.snapshots = SnapshotBuffer()
+        self.inputs = queue.SimpleQueue()
+        self.pressed_keys = None
+        self.running = True
+        self.error = None
+
+    def push(self, events, pressed_keys):
+        self.inputs.put((events, pressed_keys))
+
+    def stop(self):
+        self.running = False
+
+    def run(self):
+        due = time.perf_counter()
+        try:
+            while self.running and self.scene:
+                now = time.perf_counter()
+                if now < due:
+                    time.sleep(due - now)
+                    continue
+                if now - due > self.MAX_LAG * self.interval:
+                    due = now
+                self.step()
+                due += self.interval
+        except BaseException as error:
+            self.error = error
+        self.running = False
+
+    def step(self):
+        scene = self.scene
+        if not scene.initialized:
+            # the renderer initialises scenes, in order with drawing; input
+            # stays queued for the first step
+            return
+        events = []
+        while not self.inputs.empty():
+            queued, self.pressed_keys = self.inputs.get()
+            events.extend(queued)
+        # keys are only read on the main thread, which queues them with
+        # every batch of events
+        pressed_keys = self.pressed_keys
+        if pressed_keys is None:
+            return
+        with self.lock:
+            if self.filterEvents is not None:
+                events = self.filterEvents(scene, events, pressed_keys)
+            with self.profiler.time('update'):
+                scene.ProcessInput(events, pressed_keys)
+                scene.Update()
+                snapshot = scene.Snapshot()
+            self.profiler.tick('step')
+            if snapshot is not None:
+                self.snapshots.publish(scene, snapshot)
+            self.scene = scene.next
+
+
+def renderScene(scene, simulation):
+    if not scene.initialized:
+        with simulation.lock:
+            initScene(scene, simulation.screen)
+    previous, current, published = simulation.snapshots.latest(scene)
+    if current is None:
+        with simulation.lock:
+            # the scene may have moved on while waiting
+            if simulation.scene is scene:
+                scene.Render()
+        return
+    alpha = min(1, (time.perf_counter() - published) / simulation.interval)
+    scene.RenderSnapshot(previous, current, alpha)
+
+
+# like runSequential(), with the scene stepped on a Simulation thread
+def runThreaded(display, fps, scene, filterEvents=None, profiler=None,
+                frames=None):
+    clock = pygame.time.Clock()
+    profiler = profiler or FrameProfiler(fps)
+    simulation = Simulation(scene, display.target, fps, filterEvents,
+                            profiler)
+    simulation.start()
+    try:
+        while simulation.running and frames != 0:
+            pressed_keys = pygame.key.get_pressed()
+            simulation.push(pollEvents(display), pressed_keys)
+
+            scene = simulation.scene
+            if scene is not None:
+                with profiler.time('render'):
+                    renderScene(scene, simulation)
+
+            with profiler.time('present'):
+                display.present()
+            clock.tick(fps)
+            profiler.tick('frame')
+            if frames is not None:
+                frames -= 1
+    finally:
+        simulation.stop()
+        simulation.join()
+    if simulation.error is not None:
+        raise simulation.error
+    return profiler
@@ -0,0 +1,100 @@
+"""the player's best race, recorded and raced against as a ghost car
+
+A Recording keeps the player's pose every step of a race: the top-left
+corner of the car as int16 and the angle it is drawn at quantized to a
+byte (ANGLES steps a turn). save() stores the first pose and then the
+change from one step to the next, which is mostly small and repeated, so
+the compressed file of a 3-lap race is a few KB.
+
+load() adds the changes back up once, so a Ghost plays a step back with
+one read of its pose array and one blit of an image rotated in advance.
+"""
+import io
+import numpy as np
+import pygame
+import writer
+
+ANGLES = 256  # steps a turn is quantized to, one byte
+ALPHA = 120  # opacity of the ghost car
+CAPACITY = 4096  # steps recorded before the buffer grows
+
+
+# an angle in degrees as a byte, and back
+def quantize(angle):
+    return int(round(angle * ANGLES / 360)) % ANGLES
+
+
+def dequantize(step):
+    return step * (360 / ANGLES)
+
+
+class Recording:
+    """poses of a car, one per step"""
+
+    def __init__(self, capacity=CAPACITY):
+        self.poses = np.zeros((capacity, 3), dtype=np.int16)
+        self.length = 0
+
+    def __len__(self):
+        return self.length
+
+    def record(self, topleft, angle):
+        if self.length == len(self.poses):
+            self.poses = np.concatenate([self.poses, np.zeros_like(self.poses)])
+        self.poses[self.length] = topleft[0], topleft[1], quantize(angle)
+        self.length += 1
+
+    # saves the recording of a race on track, the screen being size; it
+    # is compressed and written on the writer's thread
+    def save(self, filename, time, track, size):
+        poses = self.poses[:self.length].copy()
+        writer.save(filename, lambda: encode(poses, time, track, size))
+
+
+# the compressed file of recorded poses
+def encode(poses, time, track, size):
+    moves = np.diff(poses[:, :2], axis=0, prepend=np.zeros((1, 2), np.int16))
+    f = io.BytesIO()
+    np.savez_compressed(f, moves=moves, angles=poses[:, 2].astype(np.uint8),
+                        time=time, track=track, size=size)
+    return f.getvalue()
+
+
+class Ghost:
+    """a recorded race, played back step by step"""
+
+    def __init__(self, poses, time, image):
+        self.poses = poses  # x, y and angle step, one row per step
+        self.time = time
+        self.images = []  # image turned by each angle step
+        for step in range(ANGLES):
+            rotated = pygame.transform.rotate(image, dequantize(step))
+            rotated.set_alpha(ALPHA)
+            self.images.append(rotated)
+
+    def __len__(self):
+        return len(self.poses)
+
+    # the image and top-left corner of the car at a step, or None once
+    # the race is over
+    def pose(self, step):
+        if step >= len(self.poses):
+            return None
+        x, y, angle = self.poses[step]
+        return self.images[angle], (x, y)
+
+
+# the ghost saved for track at this screen size, drawn with image, or
+# None if there isn't one
+def load(filename, track, size, image):
+    try:
+        with np.load(filename) as saved:
+            if str(saved['track']) != track \
+                    or tuple(saved['size']) != tuple(size):
+                return None
+            poses = np.empty((len(saved['moves']), 3), dtype=np.int32)
+            np.cumsum(saved['moves'], axis=0, out=poses[:, :2])
+            poses[:, 2] = saved['angles']
+            return Ghost(poses, float(saved['time']), image)
+    except (OSError, KeyError, ValueError):
+        return None
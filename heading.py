@@ -0,0 +1,90 @@
+import numpy as np
+import fastmath
+
+
+class HeadingFilter:
+    """smoothed heading, in degrees
+
+    Headings are averaged as unit vectors so that wrapping around 360
+    degrees doesn't matter. By default this is the mean of the last
+    `window` headings, kept as a running sum over a ring buffer: each
+    update subtracts the outgoing vector and adds the incoming one. If
+    alpha is given, an exponential moving average with that weight on the
+    newest heading is used instead.
+    """
+
+    def __init__(self, angle, window=10, alpha=None):
+        self.window = window
+        self.alpha = alpha
+        x = fastmath.cos(fastmath.radians(angle))
+        y = fastmath.sin(fastmath.radians(angle))
+        self.xs = [x] * window
+        self.ys = [y] * window
+        self.i = 0
+        if alpha is None:
+            self.sumX, self.sumY = x * window, y * window
+        else:
+            self.sumX, self.sumY = x, y
+        self.angle = angle
+
+    # adds a heading and returns the smoothed heading
+    def update(self, angle):
+        x = fastmath.cos(fastmath.radians(angle))
+        y = fastmath.sin(fastmath.radians(angle))
+        if self.alpha is None:
+            i = self.i
+            self.sumX += x - self.xs[i]
+            self.sumY += y - self.ys[i]
+            self.xs[i] = x
+            self.ys[i] = y
+            self.i = (i + 1) % self.window
+            if self.i == 0:
+                # re-sum once per lap of the buffer so rounding can't drift
+                self.sumX, self.sumY = sum(self.xs), sum(self.ys)
+        else:
+            self.sumX += self.alpha * (x - self.sumX)
+            self.sumY += self.alpha * (y - self.sumY)
+        self.angle = fastmath.degrees(fastmath.atan2(self.sumY, self.sumX))
+        return self.angle
+
+
+class HeadingFilterBatch:
+    """HeadingFilter for many cars at once
+
+    angles is an array with one heading per car. All cars are updated
+    together in lockstep, each with the same window (or alpha).
+    """
+
+    def __init__(self, angles, window=10, alpha=None):
+        angles = np.asarray(angles, dtype=float)
+        self.window = window
+        self.alpha = alpha
+        x = fastmath.vcos(fastmath.vradians(angles))
+        y = fastmath.vsin(fastmath.vradians(angles))
+        self.xs = np.tile(x, (window, 1))
+        self.ys = np.tile(y, (window, 1))
+        self.i = 0
+        if alpha is None:
+            self.sumX, self.sumY = x * window, y * window
+        else:
+            self.sumX, self.sumY = x.copy(), y.copy()
+        self.angles = angles.copy()
+
+    # adds a heading per car and returns the smoothed headings
+    def update(self, angles):
+        x = fastmath.vcos(fastmath.vradians(angles))
+        y = fastmath.vsin(fastmath.vradians(angles))
+        if self.alpha is None:
+            i = self.i
+            self.sumX += x - self.xs[i]
+            self.sumY += y - self.ys[i]
+            self.xs[i] = x
+            self.ys[i] = y
+            self.i = (i + 1) % self.window
+            if self.i == 0:
+                self.sumX, self.sumY = self.xs.sum(axis=0), self.ys.sum(axis=0)
+        else:
+            self.sumX += self.alpha * (x - self.sumX)
+            self.sumY += self.alpha * (y - self.sumY)
+        self.angles = fastmath.vdegrees(fastmath.vatan2(self.sumY, self.sumX))
+        return self.angles
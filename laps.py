@@ -0,0 +1,150 @@
+import time
+import json
+import fastmath
+import writer
+
+
+class Progress:
+    """a car's progress through the race"""
+
+    def __init__(self, car, now):
+        self.car = car
+        self.laps = 0
+        self.checkpoint = 0  # index of the last checkpoint passed
+        self.distance = 0  # distance to the next checkpoint
+        self.finished = False
+        self.rank = None  # finishing position, from 0
+        self.lapStart = now
+        self.sectorStart = now
+        self.sectors = [[]]  # sector split times, per lap
+        self.lapTimes = []
+
+    # sort key, greater is further ahead
+    def key(self, ncheckpoints):
+        return (self.laps * ncheckpoints + self.checkpoint, -self.distance)
+
+
+class LapTracker:
+    """laps, split times and race order for every car
+
+    Checkpoints are looked up through a precomputed checkpoint -> index
+    map. The race order is kept sorted incrementally: positions only change
+    a little from one frame to the next, so one insertion-sort pass over the
+    previous order is enough (and costs O(n) when nothing changes).
+    """
+
+    def __init__(self, checkpoints, lapLimit, clock=time.perf_counter):
+        self.checkpoints = checkpoints
+        self.index = {checkpoint: i for i, checkpoint in enumerate(checkpoints)}
+        self.lapLimit = lapLimit
+        self.clock = clock
+        self.progress = {}
+        self.order = []  # progress of every car, leader first
+        self.finished = []  # cars in finishing order
+        self.changed = True  # whether the order changed on the last update
+        self.revision = 0  # bumped whenever the standings change
+
+    def addCar(self, car):
+        progress = Progress(car, self.clock())
+        self.progress[car] = progress
+        self.order.append(progress)
+        self.changed = True
+        self.revision += 1
+
+    # restarts every car's timing, at the start of the race
+    def start(self):
+        now = self.clock()
+        for progress in self.order:
+            progress.lapStart = now
+            progress.sectorStart = now
+
+    def laps(self, car):
+        return self.progress[car].laps
+
+    def nextCheckpoint(self, car):
+        nextIndex = (self.progress[car].checkpoint + 1) % len(self.checkpoints)
+        return self.checkpoints[nextIndex]
+
+    # counts a checkpoint if it's the car's next one,
+    # returns True if this finished the race for the car
+    def passCheckpoint(self, car, checkpoint):
+        progress = self.progress[car]
+        checkpointIndex = self.index[checkpoint]
+        # check that this is the correct checkpoint
+        if progress.checkpoint != (checkpointIndex - 1) % len(self.checkpoints):
+            return False
+
+        now = self.clock()
+        progress.checkpoint = checkpointIndex
+        progress.sectors[-1].append(now - progress.sectorStart)
+        progress.sectorStart = now
+        # if start is reached correctly
+        if checkpointIndex == 0 and progress.laps < self.lapLimit:
+            progress.laps += 1
+            progress.lapTimes.append(now - progress.lapStart)
+            progress.lapStart = now
+            progress.sectors.append([])
+            self.revision += 1
+            if progress.laps == self.lapLimit:
+                progress.finished = True
+                progress.rank = len(self.finished)
+                self.finished.append(car)
+                return True
+        return False
+
+    # updates distances to the next checkpoint and the race order
+    def update(self):
+        for progress in self.order:
+            x, y = progress.car.rect.center
+            nx, ny = self.nextCheckpoint(progress.car).rect.center
+            progress.distance = fastmath.hypot(nx - x, ny - y)
+
+        n = len(self.checkpoints)
+        # finished cars keep their finishing order at the front
+        keys = {progress: (1, -progress.rank)
+                if progress.finished else (0,) + progress.key(n)
+                for progress in self.order}
+        order = self.order
+        self.changed = False
+        for i in range(1, len(order)):
+            progress = order[i]
+            j = i
+            while j > 0 and keys[order[j - 1]] < keys[progress]:
+                order[j] = order[j - 1]
+                j -= 1
+            if j != i:
+                order[j] = progress
+                self.changed = True
+        if self.changed:
+            self.revision += 1
+
+    # cars from first to last
+    def standings(self):
+        return [progress.car for progress in self.order]
+
+    # position of the car in the race, from 1
+    def position(self, car):
+        return self.order.index(self.progress[car]) + 1
+
+    # per-lap and per-sector times of every car; finished cars are
+    # placed by their rank, as the order only catches up on update()
+    def telemetry(self):
+        finished = [self.progress[car] for car in self.finished]
+        racing = [progress for progress in self.order if not progress.finished]
+        cars = []
+        for position, progress in enumerate(finished + racing):
+            cars.append({'name': progress.car.name,
+                         'position': position + 1,
+                         'finished': progress.finished,
+                         'laps': progress.laps,
+                         'lapTimes': progress.lapTimes,
+                         'sectors': [lap for lap in progress.sectors if lap]})
+        return {'checkpoints': len(self.checkpoints),
+                'lapLimit': self.lapLimit,
+                'cars': cars}
+
+    # saved on the writer's thread; the telemetry is serialized here, as
+    # its lists keep changing
+    def saveTelemetry(self, filename):
+        writer.save(filename,
+                    json.dumps(self.telemetry(), indent=2).encode())
@@ -0,0 +1,229 @@
+"""history of every race and copter run, in SQLite
+
+Each finished race is a row of races: the player's time, position, lap
+and sector times, the cars in the race, the CPU difficulty and the seed
+that replays it. Each copter run is a row of runs: score, kills and
+power-ups taken. Lap times, sectors and cars are stored as JSON.
+
+The database is in WAL mode, so the game reads while the writer writes.
+record() only queues a row; a writer thread inserts queued rows in one
+transaction, waiting up to scores.BATCH_DELAY for more after the first.
+Queries run on the caller's thread, on a connection of its own, and use
+the indexes for top-N and personal-best lookups (see benchmark.py
+leaderboard).
+"""
+import os
+import json
+import time
+import queue
+import atexit
+import getpass
+import sqlite3
+import threading
+import assets
+import scores
+
+DATABASE = os.path.join(assets.HERE, 'leaderboard.db')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS races (
+    id INTEGER PRIMARY KEY,
+    played REAL NOT NULL,
+    player TEXT NOT NULL,
+    track TEXT NOT NULL,
+    difficulty TEXT NOT NULL,
+    seed INTEGER,
+    time REAL NOT NULL,
+    position INTEGER NOT NULL,
+    laps INTEGER NOT NULL,
+    lapTimes TEXT NOT NULL,
+    sectors TEXT NOT NULL,
+    cars TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS racesByTime
+    ON races (track, difficulty, time);
+CREATE INDEX IF NOT EXISTS racesByPlayer
+    ON races (player, track, difficulty, time);
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    played REAL NOT NULL,
+    player TEXT NOT NULL,
+    seed INTEGER,
+    score REAL NOT NULL,
+    kills INTEGER NOT NULL,
+    powerups INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runsByScore ON runs (score);
+CREATE INDEX IF NOT EXISTS runsByPlayer ON runs (player, score);
+"""
+
+RACE_COLUMNS = ('played', 'player', 'track', 'difficulty', 'seed', 'time',
+                'position', 'laps', 'lapTimes', 'sectors', 'cars')
+RUN_COLUMNS = ('played', 'player', 'seed', 'score', 'kills', 'powerups')
+JSON_COLUMNS = ('lapTimes', 'sectors', 'cars')
+COLUMNS = {'races': RACE_COLUMNS, 'runs': RUN_COLUMNS}
+
+
+# name the local player's results are recorded under
+def localPlayer():
+    try:
+        return getpass.getuser()
+    except Exception:
+        return 'player'
+
+
+def insert(table, columns):
+    return "INSERT INTO {0} ({1}) VALUES ({2})".format(
+        table, ', '.join(columns), ', '.join('?' * len(columns)))
+
+
+STATEMENTS = {table: insert(table, columns)
+              for table, columns in COLUMNS.items()}
+
+
+class Leaderboard:
+    """races and copter runs, recorded on a background thread"""
+
+    def __init__(self, path=DATABASE, delay=scores.BATCH_DELAY):
+        self.path = path
+        self.delay = delay
+        self.player = localPlayer()
+        self.queue = queue.Queue()
+        self.writer = None
+        self.readers = threading.local()  # a connection per thread
+        self.opened = False
+        self.lock = threading.Lock()
+
+    def connect(self):
+        connection = sqlite3.connect(self.path, timeout=10)
+        connection.row_factory = sqlite3.Row
+        # WAL only needs a sync at checkpoints, not every commit
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    # creates the database on first use, and starts the writer, again
+    # if it ever died
+    def open(self):
+        with self.lock:
+            if not self.opened:
+                connection = self.connect()
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.executescript(SCHEMA)
+                connection.close()
+                atexit.register(self.close)
+                self.opened = True
+            if self.writer is None or not self.writer.is_alive():
+                self.writer = threading.Thread(target=self.run,
+                                               name='leaderboard',
+                                               daemon=True)
+                self.writer.start()
+        return self
+
+    # queues a race; lapTimes, sectors and cars are stored as JSON
+    def recordRace(self, time, position, laps, lapTimes, sectors, cars,
+                   track, difficulty, seed=None, player=None):
+        self.record('races', {
+            'played': self.now(), 'player': player or self.player,
+            'track': track, 'difficulty': difficulty, 'seed': seed,
+            'time': time, 'position': position, 'laps': laps,
+            'lapTimes': lapTimes, 'sectors': sectors, 'cars': cars})
+
+    def recordRun(self, score, kills, powerups, seed=None, player=None):
+        self.record('runs', {
+            'played': self.now(), 'player': player or self.player,
+            'seed': seed, 'score': score, 'kills': kills,
+            'powerups': powerups})
+
+    @staticmethod
+    def now():
+        return time.time()
+
+    def record(self, table, row):
+        self.open()
+        self.queue.put((table, row))
+
+    # waits until every recorded row is committed
+    def flush(self):
+        self.queue.join()
+
+    def close(self):
+        if self.writer is not None and self.writer.is_alive():
+            self.queue.put(None)
+            self.writer.join()
+
+    def run(self):
+        connection = self.connect()
+        running = True
+        while running:
+            items = scores.nextBatch(self.queue, self.delay)
+            running = items[-1] is not None
+            try:
+                self.write(connection, items)
+            finally:
+                for item in items:
+                    self.queue.task_done()
+        connection.close()
+
+    # inserts a batch of rows in one transaction; a row that can't be
+    # stored is left out, without stopping the others or the thread
+    def write(self, connection, items):
+        rows = {'races': [], 'runs': []}
+        for item in items:
+            if item is None:
+                continue
+            table, row = item
+            try:
+                rows[table].append(tuple(
+                    json.dumps(row[column]) if column in JSON_COLUMNS
+                    else row[column] for column in COLUMNS[table]))
+            except Exception as message:
+                print('Cannot record a {0} row: {1}'.format(table, message))
+        try:
+            with connection:  # one transaction for the batch
+                for table, values in rows.items():
+                    if values:
+                        connection.executemany(STATEMENTS[table], values)
+        except Exception as message:
+            print('Cannot record results: {0}'.format(message))
+
+    def query(self, sql, parameters=()):
+        self.open()
+        connection = getattr(self.readers, 'connection', None)
+        if connection is None:
+            connection = self.readers.connection = self.connect()
+        return connection.execute(sql, parameters).fetchall()
+
+    # fastest races on a track at a difficulty
+    def topRaces(self, track, difficulty, n=10):
+        return self.query(
+            "SELECT * FROM races WHERE track = ? AND difficulty = ? "
+            "ORDER BY time LIMIT ?", (track, difficulty, n))
+
+    # the player's fastest race on a track at a difficulty, or None
+    def personalBestRace(self, track, difficulty, player=None):
+        rows = self.query(
+            "SELECT * FROM races WHERE player = ? AND track = ? "
+            "AND difficulty = ? ORDER BY time LIMIT 1",
+            (player or self.player, track, difficulty))
+        return rows[0] if rows else None
+
+    def topRuns(self, n=10):
+        return self.query(
+            "SELECT * FROM runs ORDER BY score DESC LIMIT ?", (n,))
+
+    def personalBestRun(self, player=None):
+        rows = self.query(
+            "SELECT * FROM runs WHERE player = ? "
+            "ORDER BY score DESC LIMIT 1", (player or self.player,))
+        return rows[0] if rows else None
+
+
+board = Leaderboard()
+
+
+def recordRace(*args, **kwargs):
+    board.recordRace(*args, **kwargs)
+
+
+def recordRun(*args, **kwargs):
+    board.recordRun(*args, **kwargs)
@@ -1,28 +1,31 @@
 import pygame
 from scenes import *
+from viewport import Display
+import frameloop
+import scores
+import leaderboard
+import writer
+import argparse
 import os
 
 pygame.init()
 
 
-def run_game(width, height, fps, starting_scene):
-    screen = pygame.display.set_mode((width, height))
-    clock = pygame.time.Clock()
-
-    active_scene = starting_scene
+# renderScale is the fraction of the logical resolution that frames are
+# reduced to before being scaled to the window, e.g. 0.5 on slow machines;
+# threaded steps the scenes on their own thread, see frameloop
+def run_game(width, height, fps, starting_scene, renderScale=1.0,
+             threaded=False, profiler=None):
+    display = Display(width, height, renderScale)
+    scores.load()  # read once, so no scene waits on the disk for it
+    leaderboard.board.open()
     paused = None
 
-    while active_scene:
-
-        if not active_scene.initialized:
-            active_scene.initGraphics(screen)
-            active_scene.initialized = True
-
-        pressed_keys = pygame.key.get_pressed()
-
-        # Event filtering
+    # Event filtering
+    def filterEvents(active_scene, events, pressed_keys):
+        nonlocal paused
         filtered_events = []
-        for event in pygame.event.get():
+        for event in events:
             quit_attempt = False
             if event.type == pygame.QUIT:
                 quit_attempt = True
@@ -47,17 +50,31 @@ def run_game(width, height, fps, starting_scene):
                     active_scene.Terminate()
             else:
                 filtered_events.append(event)
+        return filtered_events
 
-        active_scene.ProcessInput(filtered_events, pressed_keys)
-        active_scene.Update()
-        active_scene.Render()
-
-        active_scene = active_scene.next
-
-        pygame.display.flip()
-        clock.tick(fps)
+    if threaded:
+        return frameloop.runThreaded(display, fps, starting_scene,
+                                     filterEvents, profiler)
+    return frameloop.runSequential(display, fps, starting_scene,
+                                   filterEvents, profiler)
 
 #==============================================================================
 # The rest is code where you implement your game using the Scenes model
 
-run_game(1000, 800, 60, Start())
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Play the game")
+    parser.add_argument('--threaded', action='store_true',
+                        help="run the simulation on its own thread")
+    parser.add_argument('--profile', action='store_true',
+                        help="print frame times on exit")
+    parser.add_argument('--render-scale', type=float, default=1.0,
+                        help="fraction of the resolution frames are shown "
+                             "at, e.g. 0.5 on slow machines (default: 1)")
+    args = parser.parse_args()
+    profiler = run_game(1000, 800, 60, Start(), args.render_scale,
+                        threaded=args.threaded)
+    scores.store.close()  # finish saving before exiting
+    leaderboard.board.close()
+    writer.writer.close()
+    if args.profile:
+        print(profiler.report())
@@ -0,0 +1,67 @@
+import pygame
+import numpy as np
+import utilities
+
+STEPS = 33  # shades per table, odd so a seesaw peaks exactly on its colour
+SHADE = 0.7  # darkest shade as a fraction of the colour
+
+# tables are built the first time a colour is used and then shared
+_tables = {}
+_surfaces = {}
+
+
+# index of the shade at progress frac (between 0 and 1)
+def index(frac, steps=STEPS):
+    return int(utilities.bound(0, frac, 1) * (steps - 1) + 0.5)
+
+
+# colours on a linear ramp from color down to SHADE * color
+def ramp(color, steps=STEPS):
+    return _table('ramp', color, steps)
+
+
+# colours on a linear seesaw from SHADE * color up to color and back
+def seesaw(color, steps=STEPS):
+    return _table('seesaw', color, steps)
+
+
+# surfaces of the given size pre-filled with each shade of ramp(color)
+def rampSurfaces(color, size, steps=STEPS):
+    return _filled('ramp', color, size, steps)
+
+
+# surfaces of the given size pre-filled with each shade of seesaw(color)
+def seesawSurfaces(color, size, steps=STEPS):
+    return _filled('seesaw', color, size, steps)
+
+
+def _table(kind, color, steps):
+    key = (kind, tuple(color), steps)
+    table = _tables.get(key)
+    if table is None:
+        color = np.array(color, dtype=float)
+        frac = np.linspace(0, 1, steps)[:, np.newaxis]
+        # same shapes as utilities.ramp and utilities.seesaw
+        if kind == 'ramp':
+            shades = color * (1 - frac) + SHADE * color * frac
+        else:
+            f = np.abs(frac - 0.5) / 0.5
+            shades = SHADE * color * f + color * (1 - f)
+        table = tuple(tuple(int(c) for c in shade)
+                      for shade in np.rint(shades))
+        _tables[key] = table
+    return table
+
+
+def _filled(kind, color, size, steps):
+    key = (kind, tuple(color), tuple(size), steps)
+    surfaces = _surfaces.get(key)
+    if surfaces is None:
+        surfaces = []
+        for shade in _table(kind, color, steps):
+            surface = pygame.Surface(size)
+            surface.fill(shade)
+            surfaces.append(surface)
+        surfaces = tuple(surfaces)
+        _surfaces[key] = surfaces
+    return surfaces
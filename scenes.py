@@ -3,19 +3,57 @@ import utilities
 import geometry as geo
 import colors
 import numpy as np
+import fastmath
 import time
 import copter
 import driving
+import track
+import collision
+import ai
+import assets
+import scores
+import leaderboard
+import ghost
+import random
+import trail
+import frameloop
+import os
+from laps import LapTracker
+from viewport import Viewport
 from collections import defaultdict
 
+
+# a random generator for a game, and the seed that replays it
+def seededRng():
+    seed = random.getrandbits(63)
+    return np.random.default_rng(seed), seed
+
+
+# sweeps every car's move this frame against the barriers, stopping it
+# where it first touches one and sliding the rest of the move along it;
+# starts are the car rects before the move
+def sweepCars(cars, starts, barrierBoxes, nearBarrier):
+    ends = np.array([car.rect.topleft for car in cars])
+    positions, hit = collision.resolve(starts, ends - starts[:, :2],
+                                       barrierBoxes, near=nearBarrier)
+    for car, (x, y), collided in zip(cars, positions, hit):
+        if collided:
+            car.rect.topleft = (round(x), round(y))
+
+
 class SceneBase:
+    ASSETS = ()  # files the scene loads, see assets
+
     def __init__(self):
         self.next = self
         self.initialized = False
+        # start decoding anything Start hasn't preloaded already
+        assets.preload(self.ASSETS)
 
     # only needs to be called once throughout main loop
     def initGraphics(self, screen):
         self.screen = screen
+        self.viewport = Viewport(screen)
         self.initialized = True
 
     def ProcessInput(self, events, pressed_keys):
@@ -27,6 +65,12 @@ class SceneBase:
     def Render(self):
         print("uh-oh, you didn't override this in the child class")
 
+    # an immutable frameloop.Snapshot of the scene, for scenes that can be
+    # drawn by RenderSnapshot(previous, current, alpha) on another thread;
+    # None means the scene is drawn by Render() while it isn't updating
+    def Snapshot(self):
+        return None
+
     def SwitchToScene(self, next_scene):
         self.next = next_scene
 
@@ -36,6 +80,7 @@ class SceneBase:
 
 class Start(SceneBase):
     BUTTON_DELAY = 0.15
+    PROGRESS_HEIGHT = 4  # height of the loading bar
 
     def __init__(self):
         SceneBase.__init__(self)
@@ -47,8 +92,7 @@ class Start(SceneBase):
     def initGraphics(self, screen):
         SceneBase.initGraphics(self, screen)
 
-        info = pygame.display.Info()
-        screenWidth, screenHeight = info.current_w, info.current_h
+        screenWidth, screenHeight = self.viewport.size()
 
         font = pygame.font.Font('freesansbold.ttf', 20)
 
@@ -76,17 +120,34 @@ class Start(SceneBase):
 
             self.buttons.add(button)
 
+        # every game's assets decode in the background while the menu shows
+        self.preloading = DrivingScene.ASSETS + CopterScene.ASSETS \
+            + TestScene.ASSETS
+        assets.preload(self.preloading)
+
     def ProcessInput(self, events, pressed_keys):
         pass
 
     def Update(self):
         if time.time() - self.startTime > self.BUTTON_DELAY:
-            self.buttons.update()
+            self.buttons.update(self.viewport.mousePos())
 
     def Render(self):
         self.screen.fill(colors.WHITE)
         self.buttons.draw(self.screen)
-        pygame.display.flip()
+
+        # converting needs the display, so it happens on the render side
+        assets.loader.convertReady()
+        progress = assets.loader.progress(self.preloading)
+        if progress < 1:
+            screenWidth, screenHeight = self.viewport.size()
+            pygame.draw.rect(self.screen, colors.GRAY,
+                             (0, screenHeight - self.PROGRESS_HEIGHT,
+                              screenWidth, self.PROGRESS_HEIGHT))
+            pygame.draw.rect(self.screen, colors.BLACK,
+                             (0, screenHeight - self.PROGRESS_HEIGHT,
+                              round(progress * screenWidth),
+                              self.PROGRESS_HEIGHT))
 
 
 class Button(pygame.sprite.Sprite):
@@ -109,8 +170,8 @@ class Button(pygame.sprite.Sprite):
         self.passive_text = passive_text
         self.passive_textcolor = passive_textcolor
 
-    def update(self):
-        mouseX, mouseY = pygame.mouse.get_pos()
+    def update(self, mouse):
+        mouseX, mouseY = mouse
         pressed = pygame.mouse.get_pressed()[0]
 
         if self.rect.x <= mouseX <= self.rect.x + self.rect.w \
@@ -133,6 +194,52 @@ class Button(pygame.sprite.Sprite):
         self.image.blit(textsurf, textrect)
 
 
+class StandingsPanel:
+    """live race standings from a LapTracker
+
+    The panel is rendered to a surface only when the tracker's standings
+    change and is otherwise blitted as is.
+    """
+    PADDING = 5
+
+    def __init__(self, tracker, font, pos):
+        self.tracker = tracker
+        self.font = font
+        self.pos = pos
+        self.revision = None
+        self.image = None
+
+    def draw(self, screen):
+        screen.blit(self.refresh(), self.pos)
+
+    # the panel's surface, re-rendered if the standings changed; a new
+    # surface is made each time, so old ones can still be drawn elsewhere
+    def refresh(self):
+        if self.revision != self.tracker.revision:
+            self.render()
+            self.revision = self.tracker.revision
+        return self.image
+
+    def render(self):
+        lines = []
+        for i, progress in enumerate(self.tracker.order):
+            line = "{0}. {1}  Lap {2}/{3}".format(i + 1, progress.car.name,
+                                                 progress.laps,
+                                                 self.tracker.lapLimit)
+            if progress.lapTimes:
+                line += "  ({0:.3f})".format(progress.lapTimes[-1])
+            lines.append(self.font.render(line, True, colors.WHITE))
+
+        width = max(line.get_width() for line in lines) + 2 * self.PADDING
+        height = sum(line.get_height() for line in lines) + 2 * self.PADDING
+        self.image = pygame.Surface([width, height], flags=pygame.SRCALPHA)
+        self.image.fill([0, 0, 0, 120])  # translucent black bg
+        y = self.PADDING
+        for line in lines:
+            self.image.blit(line, (self.PADDING, y))
+            y += line.get_height()
+
+
 class CheckExit(SceneBase):
     def __init__(self, paused):
         SceneBase.__init__(self)
@@ -153,8 +260,7 @@ class CheckExit(SceneBase):
         self.warningText = pygame.font.SysFont('Arial', 25)
         font = pygame.font.Font('freesansbold.ttf', 20)
 
-        info = pygame.display.Info()
-        screenWidth, screenHeight = info.current_w, info.current_h
+        screenWidth, screenHeight = self.viewport.size()
 
         for i, option in enumerate(self.options):
             rect = pygame.Rect(int(screenWidth / 2) - 50,
@@ -179,11 +285,10 @@ class CheckExit(SceneBase):
         pass
 
     def Update(self):
-        self.buttons.update()
+        self.buttons.update(self.viewport.mousePos())
 
     def Render(self):
-        info = pygame.display.Info()
-        screenWidth, screenHeight = info.current_w, info.current_h
+        screenWidth, screenHeight = self.viewport.size()
         promptSurf = self.warningText.render("Quit without saving?",
                                              True, (0, 0, 0))
         promptRect = promptSurf.get_rect()
@@ -191,7 +296,6 @@ class CheckExit(SceneBase):
         self.screen.blit(promptSurf, promptRect)
 
         self.buttons.draw(self.screen)
-        pygame.display.flip()
 
     def SwitchToScene(self, next_scene):
         super().SwitchToScene(next_scene)
@@ -219,8 +323,7 @@ class Pause(SceneBase):
         self.pauseText = pygame.font.SysFont('Arial', 25)
         font = pygame.font.Font('freesansbold.ttf', 20)
 
-        info = pygame.display.Info()
-        screenWidth, screenHeight = info.current_w, info.current_h
+        screenWidth, screenHeight = self.viewport.size()
 
         for i, option in enumerate(self.options):
             rect = pygame.Rect(int(screenWidth / 2) - 50,
@@ -251,18 +354,16 @@ class Pause(SceneBase):
 
 
     def Update(self):
-        self.buttons.update()
+        self.buttons.update(self.viewport.mousePos())
 
     def Render(self):
-        info = pygame.display.Info()
-        screenWidth, screenHeight = info.current_w, info.current_h
+        screenWidth, screenHeight = self.viewport.size()
         promptSurf = self.pauseText.render("PAUSED", True, (0, 0, 0))
         promptRect = promptSurf.get_rect()
         promptRect.center = screenWidth/2, 50
         self.screen.blit(promptSurf, promptRect)
 
         self.buttons.draw(self.screen)
-        pygame.display.flip()
 
     def SwitchToScene(self, next_scene):
         super().SwitchToScene(next_scene)
@@ -271,83 +372,84 @@ class Pause(SceneBase):
 
 
 class DrivingScene(SceneBase):
+    ASSETS = ('car.png',)
     LAP_LIMIT = 3  # number of laps to complete game
-    SAVE_FILE = "racing-time.save"  # save location
-    CPU_COLLISION_RADIUS = 20  # CPU collision radius
-    CPU_TARGET_RADIUS = 10  # CPU target radius to randomize over
+    SCORE = 'racing-time'  # name of the best time in the score store
+    TELEMETRY_FILE = os.path.join(assets.HERE, 'racing-telemetry.json')  # lap and sector times
+    GHOST_FILE = os.path.join(assets.HERE, 'racing-ghost.npz')  # the player's best race, see ghost.py
+    TRACK_FILE = os.path.join(assets.HERE, 'tracks', 'oval.json')  # track description
+    DIFFICULTY = ai.Difficulty.MEDIUM  # skill of the CPU drivers
     START_COUNTDOWN = 3  # countdown before starting
 
-    def __init__(self):
+    # clock and rng drive every timer and random choice in the race, so
+    # a race can run on simulated time and be replayed from a seed
+    def __init__(self, clock=time.perf_counter, rng=None, saveResults=True):
         SceneBase.__init__(self)
-        # initialize RNG
-        self.rng = np.random.default_rng()
+        # initialize RNG, seeded so the leaderboard can replay the race
+        self.seed = None  # unknown for a generator passed in
+        if rng is None:
+            rng, self.seed = seededRng()
+        self.rng = rng
+        self.clock = clock
+        self.saveResults = saveResults  # whether to write scores to disk
 
         self.started = False  # whether race has begun
-        self.bestTime = self.loadScore(self.SAVE_FILE)
-        self.finished = []  # cars that finished by rank
-        self.startTime = time.time()
+        self.bestTime = scores.get(self.SCORE, np.inf) if saveResults \
+            else np.inf
+        self.startTime = self.clock()
+        self.timeElapsed = 0
+        self.controller = None  # drives the player instead of the mouse
+        self.steps = 0  # steps since the start, the ghost's clock
+        self.recording = ghost.Recording() if saveResults else None
 
     # only needs to be called once throughout main loop
     def initGraphics(self, screen):
         SceneBase.initGraphics(self, screen)
 
-        info = pygame.display.Info()
-        screenWidth, screenHeight = info.current_w, info.current_h
+        screenWidth, screenHeight = self.viewport.size()
+
+        self.track = track.load(self.TRACK_FILE, self.viewport.size())
+
+        # checkpoints in race order, the finish line first
+        self.checkpoints = self.track.buildCheckpoints(self.clock, self.rng)
+        self.terrain = utilities.DrawGroup(*self.checkpoints)
+        self.barrierBoxes = self.track.boxes(track.TerrainType.BARRIER)
+
+        self.tracker = LapTracker(self.checkpoints, self.LAP_LIMIT, self.clock)
+        self.driver = ai.CPUDriver(self.track.line, self.DIFFICULTY, self.rng)
 
         self.cars = utilities.DrawGroup()
-        self.player = driving.Car((10, screenHeight / 2), 90, colors.RED, 'Red (You)')
-        self.cars.add(self.player)
-        cpu = driving.Car((50, screenHeight / 2), 90, colors.BLUE, 'Blue', isCPU=True)
-        self.cars.add(cpu)
-        cpu = driving.Car((50, screenHeight / 2), 90, colors.GREEN, 'Green', isCPU=True)
-        self.cars.add(cpu)
-        cpu = driving.Car((50, screenHeight / 2), 90, colors.YELLOW, 'Yellow', isCPU=True)
-        self.cars.add(cpu)
-        self.spaceoutCars(0, 0.2 * screenWidth / 2, True)
+        cars = [(colors.RED, 'Red (You)', False),
+                (colors.BLUE, 'Blue', True),
+                (colors.GREEN, 'Green', True),
+                (colors.YELLOW, 'Yellow', True)]
+        positions = self.track.startPositions(len(cars))
+        for (color, name, isCPU), pos in zip(cars, positions):
+            self.addCar(driving.Car(pos, self.track.startAngle(), color, name,
+                                    isCPU=isCPU, clock=self.clock,
+                                    rng=self.rng))
+        self.player = self.cars.sprites()[0]
+        self.ghost = ghost.load(self.GHOST_FILE,
+                                os.path.basename(self.TRACK_FILE),
+                                self.viewport.size(),
+                                self.player.car_img) \
+            if self.saveResults else None
 
         self.powerups = utilities.DrawGroup()
+        driving.Powerup.buildShades()
 
-        self.terrain = utilities.DrawGroup()
-        mid_grass = driving.Grass((screenWidth / 2, screenHeight / 2),
-                          0.8 * screenWidth, 0.8 * screenHeight)
-        self.terrain.add(mid_grass)
-        mid_barrier = driving.Barrier((screenWidth / 2, screenHeight / 2),
-                              0.75 * screenWidth, 0.75 * screenHeight)
-        self.terrain.add(mid_barrier)
-
-        checkpointTopLeft = driving.Checkpoint((0.125 * screenWidth / 2,
-                                        0.125 * screenHeight / 2),
-                                       0.125 * screenWidth,
-                                       0.125 * screenHeight, True)
-        self.terrain.add(checkpointTopLeft)
-        checkpointTopRight = driving.Checkpoint((screenWidth - 0.125 * screenWidth / 2,
-                                        0.125 * screenHeight / 2),
-                                        0.125 * screenWidth,
-                                        0.125 * screenHeight, False)
-        self.terrain.add(checkpointTopRight)
-        checkpointBottomRight = driving.Checkpoint((screenWidth - 0.125 * screenWidth / 2,
-                                           screenHeight - 0.125 * screenHeight / 2),
-                                           0.125 * screenWidth,
-                                           0.125 * screenHeight, True)
-        self.terrain.add(checkpointBottomRight)
-        checkpointBottomLeft = driving.Checkpoint((0.125 * screenWidth / 2,
-                                          screenHeight - 0.125 * screenHeight / 2),
-                                          0.125 * screenWidth,
-                                          0.125 * screenHeight, False)
-        self.terrain.add(checkpointBottomLeft)
-        finishline = driving.FinishLine((0.125 * screenWidth / 2,
-                                screenHeight / 2),
-                                0.125 * screenWidth,
-                                10)
-        self.terrain.add(finishline)
-
-        self.checkpoints = [finishline, checkpointTopLeft, checkpointTopRight,
-                            checkpointBottomRight, checkpointBottomLeft]
+        # the track never changes appearance, its background is pre-baked
+        self.background = self.track.background()
 
         self.lapText = pygame.font.Font('freesansbold.ttf', 20)
         self.timeText = pygame.font.Font('freesansbold.ttf', 20)
         self.rankText = pygame.font.Font('freesansbold.ttf', 20)
         self.startText = pygame.font.Font('freesansbold.ttf', 20)
+        self.rankCount = 0
+
+        self.standings = StandingsPanel(self.tracker,
+                                        pygame.font.Font('freesansbold.ttf', 14),
+                                        (0.15 * screenWidth, 0.15 * screenHeight))
 
         buttonRect = pygame.Rect(int(screenWidth / 2) - 50,
                                  int(screenHeight / 2) + 100, 100, 30)
@@ -360,6 +462,12 @@ class DrivingScene(SceneBase):
                                  colors.RED, "Quit", colors.WHITE,
                                  colors.BLACK, "Quit", colors.WHITE)
 
+    # adds a car to the race, every car can be driven by the CPU
+    def addCar(self, car):
+        self.cars.add(car)
+        self.tracker.addCar(car)
+        self.driver.addCar(car)
+
     def spaceoutCars(self, lb, ub, horizontal=True):
         ncars = len(self.cars)
         for i, car in enumerate(self.cars):
@@ -382,28 +490,50 @@ class DrivingScene(SceneBase):
                 if event.key == pygame.K_SPACE:
                     self.player.deactivatePower()
 
+    # a step of the race, in phases that DrivingVecEnv also runs across
+    # several races at once
     def Update(self):
-        info = pygame.display.Info()
-        screenWidth, screenHeight = info.current_w, info.current_h
-
+        if not self.startStep():
+            return
+        cars = self.cars.sprites()
+        terrainUnder, nearCheckpoint = self.track.underCars(
+            np.array([car.rect for car in cars]))
+        self.drivePlayerCar()
+        self.driver.drive([car for car in cars if car.isCPU])
+        self.touchCars(cars, terrainUnder, nearCheckpoint)
+        starts = self.moveCars(cars)
+        self.resolveBarrierCollisions(cars, starts)
+        self.endStep()
+
+    # counts down to the start, returns whether the race is on
+    def startStep(self):
         if not self.started:
-            if time.time() - self.startTime > self.START_COUNTDOWN:
+            if self.clock() - self.startTime > self.START_COUNTDOWN:
                 self.started = True
-                self.startTime = time.time()
-            return
+                self.startTime = self.clock()
+                self.tracker.start()
+            return False
 
-        self.getPowerupsFromCheckpoints()
-
-        # check is car is within radius of checkpoint's center
-        def collideCPU(car, checkpoint):
-            carPos = geo.Vector2D(*car.rect.center)
-            checkpointPos = geo.Vector2D(*checkpoint.rect.center)
-            dr = checkpointPos - carPos
-            return dr.length() <= self.CPU_COLLISION_RADIUS
+        if self.player not in self.tracker.finished:
+            self.timeElapsed = self.clock() - self.startTime
 
-        for car in self.cars:
-            self.drive(car)
+        self.getPowerupsFromCheckpoints()
+        return True
 
+    # the player drives until they finish, then the CPU takes over
+    def drivePlayerCar(self):
+        if not self.player.isCPU:
+            if self.controller is not None:
+                self.controller(self.player)
+            else:
+                self.drivePlayer()
+        self.quitButton.update(self.viewport.mousePos())
+
+    # power-ups, bounds, checkpoints and terrain for each car, given what
+    # is under it (see Track.underCars)
+    def touchCars(self, cars, terrainUnder, nearCheckpoint):
+        screenWidth, screenHeight = self.viewport.size()
+        for i, car in enumerate(cars):
             # Powerups collision
             powerupsHit = pygame.sprite.spritecollide(car,
                                                       self.powerups, True,
@@ -414,60 +544,98 @@ class DrivingScene(SceneBase):
 
             self.checkOutOfBounds(car, screenWidth, screenHeight)
 
-            # Terrain collision
-            if car.isCPU:
-                # Check for smaller collision if CPU controlled
-                terrainHit = pygame.sprite.spritecollide(car, self.terrain,
-                                                         False,
-                                                         collided=collideCPU)
-            else:
-                terrainHit = pygame.sprite.spritecollide(car, self.terrain,
-                                                         False,
-                                                         collided=pygame
-                                                         .sprite.collide_rect)
+            # the whole car, as a fast car's corners can skip a thin line
+            if nearCheckpoint[i]:
+                for index in self.track.checkpointsIn(car.rect):
+                    self.checkCheckpoints(car, self.checkpoints[index])
 
             car.slowed = False  # by default, Car isn't slowed
-            for terrain in terrainHit:
-                if issubclass(type(terrain), driving.Checkpoint):
-                    self.checkCheckpoints(car, terrain)
-                elif type(terrain) is driving.Grass:
-                    car.slowed = True
-                elif type(terrain) is driving.Barrier:
-                    self.checkBarrierCollision(car, terrain)
-
-            if car not in self.finished and car.laps == self.LAP_LIMIT:
-                if car == self.player:
-                    self.Finish()
-
-                self.finished.append(car)
+            # CPU cars aren't affected by terrain
+            if not car.isCPU:
+                terrain = terrainUnder[i]
+                car.slowed = (terrain == track.TerrainType.GRASS.value).any()
 
+    # moves the cars and power-ups, returns the car rects before the move
+    def moveCars(self, cars):
         self.powerups.update()
+        starts = np.array([car.rect for car in cars])
         self.cars.update()
-        self.terrain.update()
+        return starts
 
-    def Render(self):
-        info = pygame.display.Info()
-        screenWidth, screenHeight = info.current_w, info.current_h
+    def endStep(self):
+        self.terrain.update()
+        self.tracker.update()
 
-        self.screen.fill(colors.GRAY)
-        self.terrain.draw(self.screen)
-        self.powerups.draw(self.screen)
-        self.cars.draw(self.screen)
+        self.steps += 1
+        if self.recording is not None and not self.player.isCPU:
+            self.recording.record(self.player.rect.topleft,
+                                  self.player.facing())
 
+    def Render(self):
+        self.RenderSnapshot(None, self.Snapshot(), 1)
+
+    # cars, powerups and HUD values after this step, see frameloop
+    def Snapshot(self):
+        cars = self.cars.sprites()
+        looks = [car.look() for car in cars]
+        carLayer = frameloop.SpriteLayer(
+            [id(car) for car in cars],
+            # power-up shades are drawn onto the car images in place
+            [image.copy() for image, angle in looks],
+            [car.rect.topleft for car in cars],
+            [angle for image, angle in looks])
+        trails = tuple((car.trail.points().copy(), car.power.color)
+                       for car in cars if len(car.trail) > 1)
+        layers = [frameloop.SpriteLayer.capture(self.powerups.sprites())]
+        pose = self.ghost.pose(self.steps - 1) if self.ghost is not None \
+            and self.steps > 0 else None
+        if pose is not None:
+            # turned in advance, so drawn under the cars as it is
+            image, position = pose
+            layers.append(frameloop.SpriteLayer([id(self.ghost)], [image],
+                                                [position]))
+        layers.append(carLayer)
+
+        hud = {'started': self.started,
+               'timeElapsed': self.timeElapsed,
+               'bestTime': self.bestTime,
+               'trails': trails,
+               'standings': self.standings.refresh(),
+               'finished': tuple(car.name for car in self.tracker.finished),
+               'names': tuple(car.name for car in cars)}
         if not self.started:
-            timeElapsed = time.time() - self.startTime
-            timeLeft = self.START_COUNTDOWN - timeElapsed
+            hud['timeLeft'] = self.START_COUNTDOWN \
+                - (self.clock() - self.startTime)
+        elif self.player not in self.tracker.finished:
+            hud['laps'] = self.tracker.laps(self.player)
+        else:
+            hud['quitButton'] = self.quitButton.image.copy()
+        return frameloop.Snapshot(self.clock(), layers, hud)
+
+    # draws a snapshot, blended with the previous one by 1 - alpha; only
+    # reads the snapshots and render-side state, so it can run on the
+    # render thread while the next step is simulated
+    def RenderSnapshot(self, previous, current, alpha):
+        screenWidth, screenHeight = self.viewport.size()
+        hud = current.hud
+
+        self.screen.blit(self.background, (0, 0))
+        for points, color in hud['trails']:
+            trail.drawPoints(self.screen, points, color, colors.GRAY,
+                             driving.Car.TRAIL_FADE)
+        current.draw(self.screen, previous, alpha)
+
+        if not hud['started']:
             timeSurf = self.startText.render("Countdown: {0:.0f}"
-                                             .format(np.ceil(timeLeft)),
+                                             .format(fastmath.ceil(hud['timeLeft'])),
                                              True, colors.WHITE)
             timeRect = timeSurf.get_rect()
             timeRect.center = screenWidth / 2, screenHeight / 2
             self.screen.blit(timeSurf, timeRect)
         else:
-            if self.player not in self.finished:
-                self.timeElapsed = time.time() - self.startTime
+            if 'laps' in hud:
                 lapSurf = self.lapText.render("Lap: {0}/{1}"
-                                              .format(self.player.laps,
+                                              .format(hud['laps'],
                                                       self.LAP_LIMIT),
                                               True, colors.WHITE)
                 lapRect = lapSurf.get_rect()
@@ -477,42 +645,48 @@ class DrivingScene(SceneBase):
                 self.drawCrossHairs()
             else:
                 timeSurf = self.timeText.render("Best-time: {0:.3f} seconds"
-                                                .format(self.bestTime),
+                                                .format(hud['bestTime']),
                                                 True, colors.WHITE)
                 timeRect = timeSurf.get_rect()
                 timeRect.center = screenWidth / 2, screenHeight / 2
                 self.screen.blit(timeSurf, timeRect)
 
-                self.screen.blit(self.quitButton.image, self.quitButton.rect)
+                self.screen.blit(hud['quitButton'], self.quitButton.rect)
 
             timeSurf = self.timeText.render("Time: {0:.3f} seconds"
-                                            .format(self.timeElapsed),
+                                            .format(hud['timeElapsed']),
                                             True, colors.WHITE)
             timeRect = timeSurf.get_rect()
             timeRect.center = screenWidth / 2, screenHeight / 2 - 50
             self.screen.blit(timeSurf, timeRect)
 
-            if len(self.finished) > 0:
-                ranks = ["{0}: {1}".format(i + 1, car.name)
-                         for (i, car) in enumerate(self.finished)]
-                rankStr = ", ".join(ranks)
-                rankSurf = self.rankText.render(rankStr,
-                                                True, colors.WHITE)
-                fullRanks = ["{0}, {1}".format(i, car.name)
-                             for (i, car) in enumerate(self.cars.sprites())]
-                fullRankStr = ", ".join(fullRanks)
-                fullRankSurf = self.rankText.render(fullRankStr,
-                                                    True, colors.WHITE)
-                fullRankRect = fullRankSurf.get_rect()
-                rankRect = rankSurf.get_rect()
-                rankRect.center = screenWidth / 2, screenHeight / 2 + 50
-                rankRect.left = screenWidth / 2 - fullRankRect.width / 2
-                self.screen.blit(rankSurf, rankRect)
-
-        pygame.display.flip()
+            if len(hud['finished']) > 0:
+                # only re-render the ranks when another car finishes
+                if len(hud['finished']) != self.rankCount:
+                    self.renderRanks(hud['finished'], hud['names'])
+                self.screen.blit(self.rankSurf, self.rankRect)
+
+            self.screen.blit(hud['standings'], self.standings.pos)
+
+    def renderRanks(self, finished, names):
+        screenWidth, screenHeight = self.viewport.size()
+        ranks = ["{0}: {1}".format(i + 1, name)
+                 for (i, name) in enumerate(finished)]
+        rankStr = ", ".join(ranks)
+        self.rankSurf = self.rankText.render(rankStr, True, colors.WHITE)
+        # line up the left edge as if every car had finished
+        fullRanks = ["{0}, {1}".format(i, name)
+                     for (i, name) in enumerate(names)]
+        fullRankStr = ", ".join(fullRanks)
+        fullRankWidth, fullRankHeight = self.rankText.size(fullRankStr)
+        self.rankRect = self.rankSurf.get_rect()
+        self.rankRect.center = screenWidth / 2, screenHeight / 2 + 50
+        self.rankRect.left = screenWidth / 2 - fullRankWidth / 2
+        self.rankCount = len(finished)
+
 
     def drawCrossHairs(self):
-        mouse = pygame.mouse.get_pos()
+        mouse = self.viewport.mousePos()
         pressed = pygame.mouse.get_pressed()
 
         offset = 5
@@ -569,19 +743,8 @@ class DrivingScene(SceneBase):
                              (mouse[0] + offset, mouse[1]),
                              (mouse[0] + length, mouse[1]))
 
-    def checkBarrierCollision(self, car, barrier):
-        if car.rect.bottom > barrier.rect.top and car.rect.top < barrier.rect.bottom \
-            and (car.rect.right <= barrier.rect.left + car.v.x or car.rect.left >= barrier.rect.right + car.v.x):
-            if car.v.x > 0:
-                car.rect.right = barrier.rect.left
-            if car.v.x < 0:
-                car.rect.left = barrier.rect.right
-        if car.rect.right > barrier.rect.left and car.rect.left < barrier.rect.right \
-            and (car.rect.bottom <= barrier.rect.top + car.v.y or car.rect.top >= barrier.rect.bottom + car.v.y):
-            if car.v.y > 0:
-                car.rect.bottom = barrier.rect.top
-            if car.v.y < 0:
-                car.rect.top = barrier.rect.bottom
+    def resolveBarrierCollisions(self, cars, starts):
+        sweepCars(cars, starts, self.barrierBoxes, self.track.nearBarrier)
 
     def checkOutOfBounds(self, car, screenWidth, screenHeight):
         if car.rect.top < 0:
@@ -594,17 +757,12 @@ class DrivingScene(SceneBase):
             car.rect.right = screenWidth
 
     def checkCheckpoints(self, car, checkpoint):
-        # current checkpoint
-        checkpointIndex = self.checkpoints.index(checkpoint)
-        # correct previous checkpoint
-        lastCheckpointIndex = (checkpointIndex - 1) \
-            % len(self.checkpoints)
-        # check that this terrain checkpoint is the correct checkpoint
-        if car.checkpoint == lastCheckpointIndex:
-            # if start is reached correctly
-            if(car.laps < self.LAP_LIMIT and checkpointIndex == 0):
-                car.laps += 1
-            car.checkpoint = checkpointIndex
+        finished = self.tracker.passCheckpoint(car, checkpoint)
+        if finished and car == self.player:
+            self.Finish()
+        if finished and len(self.tracker.finished) == len(self.cars) \
+                and self.saveResults:
+            self.tracker.saveTelemetry(self.TELEMETRY_FILE)
 
     def getPowerupsFromCheckpoints(self):
         for checkpoint in self.checkpoints:
@@ -619,14 +777,8 @@ class DrivingScene(SceneBase):
                 if powerup:
                     self.powerups.add(powerup)
 
-    def drive(self, car):
-        if self.player not in self.finished and car == self.player:
-            self.drivePlayer()
-        else:
-            self.driveCPU(car)
-
     def drivePlayer(self):
-        mouse = pygame.mouse.get_pos()
+        mouse = self.viewport.mousePos()
         click = pygame.mouse.get_pressed()
         mousePos = geo.Vector2D(*mouse)
         # follow mouse drag
@@ -637,39 +789,47 @@ class DrivingScene(SceneBase):
         else:
             self.player.idle()
 
-    def driveCPU(self, car):
-        nextCheckpointIndex = (car.checkpoint + 1)\
-            % len(self.checkpoints)
-        nextCheckpoint = self.checkpoints[nextCheckpointIndex]
-        # randomize target around a circle
-        target = geo.Vector2D(*nextCheckpoint.rect.center)
-        target += geo.Vector2D.create_from_angle(self.rng.random() * 2 * np.pi,
-                                                 self.rng.random() * self.CPU_TARGET_RADIUS)
-        car.driveTowards(target)
-        self.quitButton.update()
-
-    def saveScore(self, filename):
-        with open(filename, 'w') as f:
-            f.write("Best-time,{0:.3f}".format(self.bestTime))
-
-    def loadScore(self, filename):
-        try:
-            with open(filename, 'r') as f:
-                scoreline = f.readline()
-                score = scoreline.split(',')[1]
-        except (OSError, IndexError):
-            score = np.inf
-
-        return float(score)
-
     def Finish(self):
+        if self.saveResults:
+            self.recordRace()
         self.player.isCPU = True
+        # the ghost only replays races the player drove from the start
+        if self.saveResults and len(self.recording) == self.steps \
+                and (self.timeElapsed < self.bestTime or self.ghost is None):
+            # race the best race next time, or this one until there's one
+            self.recording.save(self.GHOST_FILE, self.timeElapsed,
+                                os.path.basename(self.TRACK_FILE),
+                                self.viewport.size())
         if self.timeElapsed < self.bestTime:
             self.bestTime = self.timeElapsed
-            self.saveScore(self.SAVE_FILE)
+            if self.saveResults:
+                # saved on the score store's thread, not in this frame
+                scores.submit(self.SCORE, self.bestTime, lower=True)
+        if self.saveResults:
+            self.tracker.saveTelemetry(self.TELEMETRY_FILE)
+
+
+    # adds the player's race to the leaderboard, written on its thread
+    def recordRace(self):
+        telemetry = self.tracker.telemetry()
+        mine = next(car for car in telemetry['cars']
+                    if car['name'] == self.player.name)
+        cars = [{'name': car.name, 'color': list(car.color),
+                 'cpu': car is not self.player} for car in self.cars]
+        # Finish runs before the tracker's update, so the order is stale
+        position = self.tracker.progress[self.player].rank + 1
+        leaderboard.recordRace(self.timeElapsed, position,
+                               mine['laps'], mine['lapTimes'],
+                               mine['sectors'], cars,
+                               os.path.basename(self.TRACK_FILE),
+                               self.DIFFICULTY.name, self.seed)
 
 
 class CopterScene(SceneBase):
+    ASSETS = (copter.Copter.SPRITESHEET, copter.Explosion.SPRITESHEET,
+              copter.Explosion.SOUNDFILE, 'ball.png', 'bullet.wav',
+              'laser.wav', 'bat.png', 'balloon_pop.wav', 'green_balloon.png',
+              'blue_balloon.png', 'red_balloon.png')
     GAP_FRACTION = 0.7  # the starting fraction of gap space
     GAP_CLEARANCE = 0.05  # how much clearance gap has between screen borders
     FLUCTUATION = 3  # how much the gap position fluctuates
@@ -682,16 +842,30 @@ class CopterScene(SceneBase):
     SPAWN_INTERVAL['obstacles'] = 10
     SPAWN_INTERVAL['powerups'] = 12
     SPAWN_INTERVAL['balloons'] = 8
-    SAVE_FILE = 'copter-score.save'  # save file name
+    SCORE = 'copter-score'  # name of the high score in the score store
 
-    def __init__(self):
+    # clock and rng drive every timer and random choice in the game, so
+    # a game can run on simulated time and be replayed from a seed
+    def __init__(self, clock=time.time, rng=None, saveResults=True):
         SceneBase.__init__(self)
         self.fly = False
-        self.rng = np.random.default_rng()
-        self.starttime = time.time()
+        self.seed = None  # unknown for a generator passed in
+        if rng is None:
+            rng, self.seed = seededRng()
+        self.rng = rng
+        self.clock = clock
+        self.saveResults = saveResults  # whether to write scores to disk
+        self.controller = None  # returns (fly, shoot, aim) instead of input
+        # spawning speeds up as the game goes on, so each game needs its own
+        self.SPAWN_INTERVAL = dict(CopterScene.SPAWN_INTERVAL)
+        self.starttime = self.clock()
         self.lastnarrow = self.starttime
         self.lastfluct = self.starttime
-        self.highscore = self.loadScore(self.SAVE_FILE)
+        self.highscore = scores.get(self.SCORE, 0) if saveResults else 0
+        self.kills = 0  # enemies shot down
+        self.powerupsTaken = 0
+        self.culled = 0  # sprites culled off screen in the last step
+        self.over = False  # whether the copter crashed
         self.projectiles = utilities.DrawGroup()
         self.obstacles = utilities.DrawGroup()
         self.powerups = utilities.DrawGroup()
@@ -704,14 +878,21 @@ class CopterScene(SceneBase):
     def initGraphics(self, screen):
         SceneBase.initGraphics(self, screen)
 
-        info = pygame.display.Info()
-        screenWidth, screenHeight = info.current_w, info.current_h
+        screenWidth, screenHeight = self.viewport.size()
 
-        self.copter = copter.Copter([screenWidth / 4, screenHeight / 2])
+        self.copter = copter.Copter([screenWidth / 4, screenHeight / 2],
+                                   self.viewport, self.clock)
 
         self.walls = utilities.DrawGroup()
         self.generateWalls()
 
+        # cut out and scale the sprites' images now instead of mid-game
+        copter.Explosion.clip()
+        copter.Bat.clip()
+        copter.Bullet.bulletImage()
+        for filename in copter.Balloon.IMAGES:
+            copter.Balloon.balloonImage(filename)
+
         self.scoreText = pygame.font.Font('freesansbold.ttf', 20)
         self.highscoreText = pygame.font.Font('freesansbold.ttf', 12)
 
@@ -724,42 +905,43 @@ class CopterScene(SceneBase):
                     self.SwitchToScene(Pause(self))
 
     def Update(self):
-        mouse = pygame.mouse.get_pos()
-        click = pygame.mouse.get_pressed()
-        spacebar = pygame.key.get_pressed()[pygame.K_SPACE]
-        self.score = time.time() - self.starttime
+        if self.controller is not None:
+            fly, shoot, aim = self.controller()
+        else:
+            fly = pygame.key.get_pressed()[pygame.K_SPACE]
+            shoot = pygame.mouse.get_pressed()[0]
+            aim = None  # towards the mouse
+        self.score = self.clock() - self.starttime
 
         if self.score > self.highscore:
             self.highscore = self.score
 
         # fly if spacebar
-        if spacebar:
+        if fly:
             self.copter.fly()
         else:
             self.copter.drop()
 
-        info = pygame.display.Info()
-        screenWidth, screenHeight = info.current_w, info.current_h
-
         self.checkOutOfBounds()
 
         self.checkCollisions()
 
-        for wall in self.walls:
-            # if wall goes out of bounds
-            if wall.rect.right < 0:
-                wall.kill()
-
-                # create upper wall if the dead wall is upper
-                new = self.generateWall(wall.rect.top == 0)
-                self.walls.add(new)
+        view = self.viewport.rect
+        # walls are laid out a little past the right edge, only cull them
+        # once they leave on the left
+        ahead = pygame.Rect(view.topleft,
+                            (view.width + 2 * copter.Wall.WIDTH, view.height))
+        for wall in self.walls.cull(ahead):
+            # create upper wall if the dead wall is upper
+            new = self.generateWall(wall.rect.top == 0)
+            self.walls.add(new)
 
         for generator in self.EXPONENTIAL_GENERATORS:
             # if time to generate is reached
             if self.timeUntilGeneration[generator] <= 0:
                 self.spawn(generator)
             else:  # remove time from generator
-                now = time.time()
+                now = self.clock()
                 self.timeUntilGeneration[generator] -= now\
                     - self.lastUpdateTime[generator]
                 self.lastUpdateTime[generator] = now
@@ -780,27 +962,25 @@ class CopterScene(SceneBase):
                                          key=lambda wall: wall.rect.y)
                     roof, ground = top.rect.bottom, bottom.rect.top
                     ob.fly(roof, ground)
-            # if obstacle flies off-screen, delete it
-            if self.isOutOfBounds(ob.rect):
-                ob.kill()
-
-        for pup in self.powerups:
-            # if powerup flies off-screen, delete it
-            if self.isOutOfBounds(pup.rect):
-                pup.kill()
+        # delete obstacles and powerups that flew off-screen
+        self.obstacles.cull(view)
+        self.powerups.cull(view)
 
         # Powerups collision
         self.checkPowerupsHit()
 
-        if click[0]:
+        if shoot:
             if self.copter.readyToShoot():
-                bullet = self.copter.shootTowards(mouse)
+                if aim is None:
+                    bullet = self.copter.shootTowards(self.viewport.mousePos())
+                else:
+                    bullet = self.copter.shootAt(aim)
                 self.projectiles.add(bullet)
 
-        for p in self.projectiles:
-            # if projectile flies off-screen
-            if self.isOutOfBounds(p.rect):
-                p.kill()
+        # projectiles that flew off-screen can still hit on their way out
+        projectiles = self.projectiles.sprites()
+        self.projectiles.cull(view)
+        for p in projectiles:
             self.checkProjectileHit(p)
 
         self.copter.update()
@@ -809,15 +989,21 @@ class CopterScene(SceneBase):
         self.powerups.update()
         self.projectiles.update()
         self.explosions.update()
+        self.explosions.cull(view)
+        self.culled = sum(group.culled for group in
+                          [self.walls, self.obstacles, self.powerups,
+                           self.projectiles, self.explosions])
 
     def Render(self):
         self.screen.fill((255, 255, 255))
         self.copter.draw(self.screen)
-        self.obstacles.draw(self.screen)
-        self.powerups.draw(self.screen)
-        self.walls.draw(self.screen)
-        self.explosions.draw(self.screen)
-        self.projectiles.draw(self.screen)
+        # sprites spawn just off screen, they are culled until they show
+        view = self.viewport.rect
+        self.obstacles.draw(self.screen, view)
+        self.powerups.draw(self.screen, view)
+        self.walls.draw(self.screen, view)
+        self.explosions.draw(self.screen, view)
+        self.projectiles.draw(self.screen, view)
 
         scoreSurf = self.scoreText.render("Time: {0:.2f}".format(self.score), True, (0, 0, 0))
         scoreRect = scoreSurf.get_rect()
@@ -831,10 +1017,9 @@ class CopterScene(SceneBase):
 
         self.drawCrossHairs()
 
-        pygame.display.flip()
 
     def drawCrossHairs(self):
-        mouse = pygame.mouse.get_pos()
+        mouse = self.viewport.mousePos()
         pressed = pygame.mouse.get_pressed()
 
         offset = 5
@@ -875,30 +1060,20 @@ class CopterScene(SceneBase):
                              (mouse[0] + length, mouse[1]))
 
     def EndGame(self):
-        self.saveScore(self.SAVE_FILE)
+        self.over = True
+        if self.saveResults:
+            scores.submit(self.SCORE, self.highscore)
+            leaderboard.recordRun(self.score, self.kills, self.powerupsTaken,
+                                  self.seed)
         self.SwitchToScene(Start())
 
-    def saveScore(self, filename):
-        with open(filename, 'w') as f:
-            f.write("High-score,{0:.2f}".format(self.highscore))
-
-    def loadScore(self, filename):
-        try:
-            with open(filename, 'r') as f:
-                scoreline = f.readline()
-                score = scoreline.split(',')[1]
-        except (OSError, IndexError):
-            score = 0
-            print("No save data found.")
-
-        return float(score)
-
     def checkPowerupsHit(self):
         powerupsHit = pygame.sprite.spritecollide(self.copter,
                                                   self.powerups, True,
                                                   collided=pygame.sprite.collide_rect)
         for power in powerupsHit:
             self.copter.givePower(power)
+            self.powerupsTaken += 1
 
     def checkProjectileHit(self, projectile):
         if type(projectile) is not copter.Laser:
@@ -912,6 +1087,7 @@ class CopterScene(SceneBase):
             projectile.kill()
             if dead:
                 self.starttime -= obj.AWARD
+                self.kills += 1
 
     def spawn(self, generator):
         if generator == 'obstacles':
@@ -932,7 +1108,7 @@ class CopterScene(SceneBase):
             gap_pos + gap_height / 2
         height = copter.Obstacle.MIN_HEIGHT + self.rng.random() * 0.4 * gap_height
         top = self.rng.random() * (gap_height - height) + roof
-        obstacle = copter.Obstacle(top, height)
+        obstacle = copter.Obstacle(top, height, self.viewport)
         self.obstacles.add(obstacle)
 
     def spawnBat(self):
@@ -941,7 +1117,7 @@ class CopterScene(SceneBase):
         roof, ground = gap_pos - gap_height / 2,\
             gap_pos + gap_height / 2
         y = self.rng.random() * 0.8 * (gap_height - 32) + 1.1 * roof
-        bat = copter.Bat(y)
+        bat = copter.Bat(y, self.viewport, self.rng)
         self.obstacles.add(bat)
         self.SPAWN_INTERVAL['bats'] = max(5,
                                           self.SPAWN_INTERVAL['bats'] * 0.95)
@@ -952,7 +1128,7 @@ class CopterScene(SceneBase):
         roof, ground = gap_pos - gap_height / 2,\
             gap_pos + gap_height / 2
         y = self.rng.random() * 0.6 * gap_height + 1.4 * roof
-        balloon = copter.Balloon(y)
+        balloon = copter.Balloon(y, self.viewport, self.rng)
         self.obstacles.add(balloon)
         self.SPAWN_INTERVAL['balloons'] = max(5,
                                               self.SPAWN_INTERVAL['balloons'] * 0.95)
@@ -966,14 +1142,13 @@ class CopterScene(SceneBase):
             * (gap_height - copter.Powerup.SIDE_LENGTH)\
             + roof + 0.2 * gap_height
         powerupType = copter.PowerupType(int(self.rng.random() * copter.PowerupType.NUMBER_POWERUPS.value))
-        powerup = copter.Powerup(top, powerupType)
+        powerup = copter.Powerup(top, powerupType, self.viewport, self.clock)
         self.powerups.add(powerup)
 
     def generateWalls(self):
-        info = pygame.display.Info()
-        screenWidth, screenHeight = info.current_w, info.current_h
+        screenWidth, screenHeight = self.viewport.size()
         # number of walls
-        N = int(np.ceil(screenWidth / copter.Wall.WIDTH)) + 3
+        N = int(fastmath.ceil(screenWidth / copter.Wall.WIDTH)) + 3
 
         # generate walls
         gap_height = self.GAP_FRACTION * screenHeight
@@ -1008,11 +1183,11 @@ class CopterScene(SceneBase):
 
             NW, NE, SW, SE = 0, 0,\
                 round((last_gap_roof + gap_roof) / 2), round((gap_roof + next_gap_roof) / 2)
-            top = copter.Wall(NW, NE, SE, SW)
+            top = copter.Wall(NW, NE, SE, SW, self.viewport)
             NW, NE, SW, SE = round((last_gap_floor + gap_floor) / 2),\
                 round((gap_floor + next_gap_floor) / 2),\
                 screenHeight, screenHeight
-            bottom = copter.Wall(NW, NE, SE, SW)
+            bottom = copter.Wall(NW, NE, SE, SW, self.viewport)
             x = i * copter.Wall.WIDTH
             top.rect.x = x
             bottom.rect.x = x
@@ -1022,17 +1197,16 @@ class CopterScene(SceneBase):
             self.walls.add(bottom)
 
     def generateWall(self, top=True):
-        info = pygame.display.Info()
-        screenWidth, screenHeight = info.current_w, info.current_h
+        screenWidth, screenHeight = self.viewport.size()
 
         if top:
-            if (time.time() - self.lastnarrow) >= self.NARROWING_INTERVAL:
+            if (self.clock() - self.lastnarrow) >= self.NARROWING_INTERVAL:
                 self.gap_lastheight = max(0.95 * self.gap_lastheight, 3 * self.copter.rect.height)
                 self.gap_heights[0] = self.gap_lastheight
-                self.lastnarrow = time.time()
-            if (time.time() - self.lastfluct) >= self.FLUCTUATION_INTERVAL:
+                self.lastnarrow = self.clock()
+            if (self.clock() - self.lastfluct) >= self.FLUCTUATION_INTERVAL:
                 self.FLUCTUATION = min(self.FLUCTUATION + 1, self.MAX_FLUCTUATION)
-                self.lastfluct = time.time()
+                self.lastfluct = self.clock()
             self.gap_pos[0] = self.gap_pos[-1] + self.FLUCTUATION * self.rng.standard_normal()
             self.gap_pos[0] = utilities.bound(self.gap_lastheight / 2 + self.GAP_CLEARANCE * screenHeight,
                                  self.gap_pos[0],
@@ -1062,13 +1236,12 @@ class CopterScene(SceneBase):
             NW, NE, SW, SE = round((last_gap_floor + gap_floor) / 2),\
                 round((gap_floor + next_gap_floor) / 2),\
                 screenHeight, screenHeight
-        new = copter.Wall(NW, NE, SE, SW)
+        new = copter.Wall(NW, NE, SE, SW, self.viewport)
 
         return new
 
     def checkOutOfBounds(self):
-        info = pygame.display.Info()
-        screenWidth, screenHeight = info.current_w, info.current_h
+        screenWidth, screenHeight = self.viewport.size()
         # if ceiling is hit
         if self.copter.rect.top < 0:
             self.EndGame()
@@ -1078,11 +1251,13 @@ class CopterScene(SceneBase):
             self.EndGame()
 
     def checkCollisions(self):
+        # masks are only built for the walls the copter's rect touches
         for wall in pygame.sprite.spritecollide(self.copter, self.walls,
-                                                False, collided=pygame.sprite.collide_mask):
-            if not self.copter.invincible():
-                self.takeCopterLife()
-            break
+                                                False):
+            if pygame.sprite.collide_mask(self.copter, wall):
+                if not self.copter.invincible():
+                    self.takeCopterLife()
+                break
 
         for ob in pygame.sprite.spritecollide(self.copter, self.obstacles,
                                               False, collided=pygame.sprite.collide_rect):
@@ -1102,23 +1277,13 @@ class CopterScene(SceneBase):
         else:
             self.copter.rect.top = self.gap_pos[self.copterIndex]
 
-    def isOutOfBounds(self, rect):
-        info = pygame.display.Info()
-        screenWidth, screenHeight = info.current_w, info.current_h
-
-        return rect.left > screenWidth \
-            or rect.right < 0 \
-            or rect.top > screenHeight \
-            or rect.bottom < 0
-
 
 class TestScene(SceneBase):
+    ASSETS = ('ball.png',)
     DELAY = 0.1
 
     def __init__(self):
         SceneBase.__init__(self)
-        info = pygame.display.Info()
-        screenWidth, screenHeight = info.current_w, info.current_h
 
         self.ball = utilities.load_image('ball.png')
         self.ball.set_colorkey(colors.WHITE)
@@ -1128,12 +1293,6 @@ class TestScene(SceneBase):
         self.elasticity = 0.8
         self.friction = 0.1
 
-        size = 20
-        self.obj = pygame.Surface([size, size])
-        self.obj.fill(colors.RED)
-        self.objrect = pygame.Rect(screenWidth / 2,
-                                   screenHeight / 2,
-                                   size, size)
         self.hitLast = False
 
         self.starttime = time.time()
@@ -1141,6 +1300,15 @@ class TestScene(SceneBase):
     def initGraphics(self, screen):
         SceneBase.initGraphics(self, screen)
 
+        screenWidth, screenHeight = self.viewport.size()
+
+        size = 20
+        self.obj = pygame.Surface([size, size])
+        self.obj.fill(colors.RED)
+        self.objrect = pygame.Rect(screenWidth / 2,
+                                   screenHeight / 2,
+                                   size, size)
+
     def ProcessInput(self, events, pressed_keys):
         for event in events:
             if event.type == pygame.KEYDOWN:
@@ -1153,11 +1321,10 @@ class TestScene(SceneBase):
         if time.time() - self.starttime < self.DELAY:
             return
 
-        mouse = pygame.mouse.get_pos()
+        mouse = self.viewport.mousePos()
         click = pygame.mouse.get_pressed()
 
-        info = pygame.display.Info()
-        screenWidth, screenHeight = info.current_w, info.current_h
+        screenWidth, screenHeight = self.viewport.size()
 
         ballmask = pygame.mask.from_surface(self.ball)
         objmask = pygame.mask.from_surface(self.obj)
@@ -1219,4 +1386,3 @@ class TestScene(SceneBase):
 
         self.screen.blit(self.ball, self.ballrect)
         self.screen.blit(self.obj, self.objrect)
-        pygame.display.flip()
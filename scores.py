@@ -0,0 +1,212 @@
+"""best times and high scores, saved off the game loop
+
+The store is a JSON file of score name -> value, read once by load() (or
+the first get()) and kept in memory. submit() only updates memory and
+queues the score: a writer thread saves queued scores together, waiting
+up to BATCH_DELAY for more after the first so a burst costs one fsync.
+
+Writes are safe with several games sharing the store. The writer takes
+an exclusive lock on a lock file next to it, reads the file again,
+keeps the better of its own and the file's value for each score it
+submitted, writes a temporary file, fsyncs it and renames it over the
+store, so readers only ever see a whole file.
+
+Scores saved by older versions in <name>.save files are read the first
+time a name is missing from the store.
+"""
+import os
+import json
+import time
+import queue
+import atexit
+import threading
+from contextlib import contextmanager
+import assets
+
+STORE = os.path.join(assets.HERE, 'scores.json')
+BATCH_DELAY = 0.5  # seconds the writer waits for more scores to save
+
+
+# holds an exclusive lock on path for the duration, across processes
+@contextmanager
+def locked(path):
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        try:
+            import fcntl
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        except ImportError:
+            import msvcrt
+            msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+        yield
+    finally:
+        os.close(fd)  # releases the lock
+
+
+# the next burst of items on a queue: the first one, and any that arrive
+# within delay of it; None, put to stop a writer, ends the burst
+def nextBatch(items, delay):
+    batch = [items.get()]
+    deadline = time.monotonic() + delay
+    while batch[-1] is not None:
+        timeout = deadline - time.monotonic()
+        try:
+            batch.append(items.get(timeout=max(timeout, 0)))
+        except queue.Empty:
+            break
+    return batch
+
+
+# whether value beats best, lower or higher being better
+def beats(value, best, lower):
+    return best is None or (value < best if lower else value > best)
+
+
+class ScoreStore:
+    """scores in memory, written to disk on a background thread"""
+
+    def __init__(self, path=STORE, delay=BATCH_DELAY):
+        self.path = path
+        self.delay = delay
+        self.scores = None  # name -> value, once loaded
+        self.lower = {}  # name -> whether lower is better, once submitted
+        self.queue = queue.Queue()
+        self.writer = None
+        self.writes = 0  # files written, for benchmarks
+        self.lock = threading.Lock()
+
+    def load(self):
+        with self.lock:
+            if self.scores is None:
+                self.scores = self.read()
+        return self
+
+    def read(self):
+        try:
+            with open(self.path, 'r') as f:
+                scores = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return scores if isinstance(scores, dict) else {}
+
+    # the score saved by an older version as "<label>,<value>" in
+    # <name>.save, next to the store
+    def readLegacy(self, name):
+        legacy = os.path.join(os.path.dirname(self.path),
+                              '{0}.save'.format(name))
+        try:
+            with open(legacy, 'r') as f:
+                return float(f.readline().split(',')[1])
+        except (OSError, IndexError, ValueError):
+            return None
+
+    def get(self, name, default=None):
+        self.load()
+        with self.lock:
+            if name not in self.scores:
+                legacy = self.readLegacy(name)
+                if legacy is not None:
+                    self.scores[name] = legacy
+            return self.scores.get(name, default)
+
+    # records value if it beats the saved one, and queues it to be saved
+    def submit(self, name, value, lower=False):
+        self.get(name)
+        with self.lock:
+            self.lower[name] = lower
+            if not beats(value, self.scores.get(name), lower):
+                return False
+            self.scores[name] = value
+            if self.writer is None:
+                atexit.register(self.close)
+            # started on first use, and again if it ever died
+            if self.writer is None or not self.writer.is_alive():
+                self.writer = threading.Thread(target=self.run,
+                                               name='scores', daemon=True)
+                self.writer.start()
+        self.queue.put((name, value, lower))
+        return True
+
+    # waits until every submitted score is on disk
+    def flush(self):
+        self.queue.join()
+
+    def close(self):
+        if self.writer is not None and self.writer.is_alive():
+            self.queue.put(None)
+            self.writer.join()
+
+    def run(self):
+        running = True
+        while running:
+            items = nextBatch(self.queue, self.delay)
+            running = items[-1] is not None
+            try:
+                pending = {}  # name -> (best value, whether lower is better)
+                for item in items:
+                    if item is None:
+                        continue
+                    name, value, lower = item
+                    best = pending[name][0] if name in pending else None
+                    if beats(value, best, lower):
+                        pending[name] = (value, lower)
+                if pending:
+                    self.write(pending)
+            except Exception as message:
+                print('Cannot save scores: {0}'.format(message))
+            finally:
+                for item in items:
+                    self.queue.task_done()
+
+    # merges pending scores into the file on disk, under the lock
+    def write(self, pending):
+        with locked(self.path + '.lock'):
+            scores = self.read()
+            for name, (value, lower) in pending.items():
+                if beats(value, scores.get(name), lower):
+                    scores[name] = value
+            partial = '{0}.{1}.partial'.format(self.path, os.getpid())
+            with open(partial, 'w') as f:
+                json.dump(scores, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(partial, self.path)
+            self.syncDirectory()
+            self.writes += 1
+        # other games may have saved better scores meanwhile; the file
+        # has the last word on scores this game never submitted
+        with self.lock:
+            for name, value in scores.items():
+                if name not in self.lower \
+                        or beats(value, self.scores.get(name),
+                                 self.lower[name]):
+                    self.scores[name] = value
+
+    # makes the rename itself durable, where directories can be synced
+    def syncDirectory(self):
+        try:
+            fd = os.open(os.path.dirname(os.path.abspath(self.path)),
+                         os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+
+store = ScoreStore()
+
+
+def load():
+    return store.load()
+
+
+def get(name, default=None):
+    return store.get(name, default)
+
+
+def submit(name, value, lower=False):
+    return store.submit(name, value, lower)
@@ -0,0 +1,437 @@
+"""a race hosted for several players over TCP
+
+A Server runs the DrivingScene headless, on simulated time, and is the
+only authority on the race: clients send it their controls and draw the
+snapshots it sends back. It steps the race FPS times a second, like the
+game, and sends a snapshot every FPS / rate steps.
+
+Every client takes over a CPU car, in order, or adds a car if all are
+taken; when it leaves (or finishes) the CPU drives the car again. Once
+every car has finished, a new race starts.
+
+Messages are prefixed with their length (LENGTH). A client sends CONTROLS:
+turn and throttle from -127 to 127 and whether to use its power-up (see
+env.DrivingEnv). The server sends a client SEAT and the index of its car
+when it's seated, and snapshots: a HEADER (step and number of cars) then
+an int16 column per field of COLUMNS, quantized: the cars' top-left
+corners in pixels, their angles as a byte (see ghost.quantize), laps and
+FLAGS. A DELTA snapshot holds the change from the previous one, so a car
+moving steadily repeats the same few bytes, which deflate squeezes out.
+
+Every client is sent the same snapshots, so they're compressed once, as
+one deflate stream shared by all clients. TCP delivers them in order, so
+the previous snapshot is always the base. A KEYFRAME, a whole snapshot
+starting a new stream, is sent when a client joins, a race starts, the
+cars change or a client falls more than BACKLOG bytes behind (it's sent
+nothing until then).
+
+A Client keeps the last few snapshots and interpolates between them with
+view(), INTERPOLATION snapshot intervals behind the latest, so cars move
+smoothly between snapshots.
+
+    python server.py [--host HOST] [--port PORT] [--rate RATE]
+
+benchmark.py server measures the server's step cost and bandwidth per
+client with many clients over loopback.
+"""
+import time
+import zlib
+import socket
+import struct
+import argparse
+import selectors
+import collections
+import numpy as np
+import colors
+import driving
+import scenes
+import env
+import ghost
+from frameloop import FrameProfiler
+
+PORT = 5475
+FPS = 60  # race steps per second
+RATE = 20  # snapshots per second
+INTERPOLATION = 2  # snapshot intervals clients are drawn behind
+
+BACKLOG = 65536  # bytes a client can fall behind before it's resent a keyframe
+
+LENGTH = struct.Struct('<H')
+CONTROLS = struct.Struct('<bbB')
+SEAT, KEYFRAME, DELTA = b'S', b'K', b'D'  # kinds of message from the server
+CAR = struct.Struct('<h')
+HEADER = struct.Struct('<IH')
+COLUMNS = ('x', 'y', 'angle', 'laps', 'flags')
+FINISHED, POWER, ACTIVE, CPU = 1, 2, 4, 8  # flags
+COLORS = [colors.RED, colors.BLUE, colors.GREEN, colors.YELLOW,
+          colors.PURPLE, colors.ORANGE]  # of cars added for clients
+
+
+# messages framed with their length
+def frame(message):
+    return LENGTH.pack(len(message)) + message
+
+
+# the whole messages at the front of a buffer, removed from it
+def unframe(buffer):
+    messages = []
+    offset = 0
+    while len(buffer) - offset >= LENGTH.size:
+        length, = LENGTH.unpack_from(buffer, offset)
+        end = offset + LENGTH.size + length
+        if end > len(buffer):
+            break
+        messages.append(bytes(buffer[offset + LENGTH.size:end]))
+        offset = end
+    del buffer[:offset]
+    return messages
+
+
+# a snapshot of rows of states, or of their change since the last one
+def encode(step, rows):
+    return HEADER.pack(step, len(rows)) \
+        + np.ascontiguousarray(rows.T).tobytes()
+
+
+# step and states of a snapshot, added to base if it's a delta
+def decode(snapshot, base=None):
+    step, cars = HEADER.unpack_from(snapshot)
+    rows = np.frombuffer(snapshot, np.int16, offset=HEADER.size) \
+        .reshape(len(COLUMNS), cars).T
+    return step, rows.copy() if base is None else base + rows
+
+
+# a deflate stream without a header, as shared by the clients
+def compressor():
+    return zlib.compressobj(wbits=-zlib.MAX_WBITS)
+
+
+def decompressor():
+    return zlib.decompressobj(wbits=-zlib.MAX_WBITS)
+
+
+class Connection:
+    """a client of the server, and the car it drives"""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.inbox = bytearray()
+        self.outbox = bytearray()
+        self.writing = False  # whether waiting to send the rest of outbox
+        self.synced = False  # whether it's been sent the stream so far
+        self.controls = (0, 0, 0)
+        self.car = None
+        self.sent = 0  # bytes sent
+
+
+class Server:
+    """the authoritative race, stepped and sent to every client"""
+
+    def __init__(self, host='', port=PORT, rate=RATE, fps=FPS, seed=None):
+        self.address = (host, port)
+        self.fps = fps
+        self.every = max(1, round(fps / rate))  # steps per snapshot
+        self.rng = np.random.default_rng(seed)
+        self.screen = env.headless(env.DrivingEnv.SIZE)
+        self.selector = selectors.DefaultSelector()
+        self.listener = None
+        self.connections = []
+        self.compressor = None  # of the snapshot stream
+        self.base = None  # states in the last snapshot sent
+        self.profiler = FrameProfiler(fps)
+        self.newRace()
+
+    def listen(self, backlog=128):
+        self.listener = socket.create_server(self.address, backlog=backlog)
+        self.listener.setblocking(False)
+        self.selector.register(self.listener, selectors.EVENT_READ)
+        self.address = self.listener.getsockname()
+        return self.address
+
+    def close(self):
+        for connection in list(self.connections):
+            self.drop(connection)
+        if self.listener is not None:
+            self.selector.unregister(self.listener)
+            self.listener.close()
+            self.listener = None
+
+    def newRace(self):
+        self.clock = env.FrameClock(self.fps)
+        self.steps = 0
+        scene = scenes.DrivingScene(self.clock, self.rng, saveResults=False)
+        scene.initGraphics(self.screen)
+        scene.controller = lambda car: None  # clients drive before Update
+        for car in scene.cars:
+            car.isCPU = True
+        scene.started = True
+        scene.startTime = self.clock()
+        scene.tracker.start()
+        self.scene = scene
+        self.base = None
+        for connection in self.connections:
+            connection.car = None
+            self.seat(connection)
+
+    # gives a connection the first CPU car, or a new one
+    def seat(self, connection):
+        taken = {other.car for other in self.connections}
+        finished = set(self.scene.tracker.finished)
+        for car in self.scene.cars:
+            if car not in taken and car not in finished:
+                break
+        else:
+            count = len(self.scene.cars)
+            position = self.scene.track.startPositions(count + 1)[-1]
+            car = driving.Car(position, self.scene.track.startAngle(),
+                              COLORS[count % len(COLORS)],
+                              'Player {0}'.format(count + 1),
+                              clock=self.clock, rng=self.rng)
+            self.scene.addCar(car)
+        car.isCPU = False
+        connection.car = car
+        connection.outbox += frame(
+            SEAT + CAR.pack(self.scene.cars.sprites().index(car)))
+
+    # seats every client waiting to join
+    def accept(self):
+        while True:
+            try:
+                sock, address = self.listener.accept()
+            except (BlockingIOError, InterruptedError):
+                return
+            sock.setblocking(False)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            connection = Connection(sock)
+            self.connections.append(connection)
+            self.selector.register(sock, selectors.EVENT_READ, connection)
+            self.seat(connection)
+
+    def drop(self, connection):
+        if connection.car is not None:
+            connection.car.isCPU = True
+        self.connections.remove(connection)
+        self.selector.unregister(connection.sock)
+        connection.sock.close()
+
+    # accepts clients and reads their controls, waiting up to timeout
+    def poll(self, timeout=0):
+        for key, events in self.selector.select(timeout):
+            if key.data is None:
+                self.accept()
+            elif events & selectors.EVENT_READ:
+                self.receive(key.data)
+            if events & selectors.EVENT_WRITE and key.data in \
+                    self.connections:
+                self.flush(key.data)
+
+    def receive(self, connection):
+        try:
+            data = connection.sock.recv(65536)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            data = b''
+        if not data:
+            self.drop(connection)
+            return
+        connection.inbox += data
+        for message in unframe(connection.inbox):
+            if len(message) == CONTROLS.size:
+                connection.controls = CONTROLS.unpack(message)
+
+    # steps the race, and sends a snapshot every few steps
+    def step(self):
+        with self.profiler.time('step'):
+            for connection in self.connections:
+                car = connection.car
+                if car is not None and not car.isCPU:
+                    turn, throttle, power = connection.controls
+                    env.drive(car, turn / 127, throttle / 127, power,
+                              env.DrivingEnv.MAX_TURN)
+            self.scene.Update()
+            self.clock.tick()
+            self.steps += 1
+            tracker = self.scene.tracker
+            for car in tracker.finished:
+                car.isCPU = True  # the CPU takes over, as in the game
+        if self.steps % self.every == 0:
+            with self.profiler.time('send'):
+                self.broadcast()
+        if len(tracker.finished) == len(self.scene.cars):
+            self.newRace()
+
+    # the race's cars as rows of COLUMNS
+    def states(self):
+        finished = set(self.scene.tracker.finished)
+        tracker = self.scene.tracker
+        return np.array([
+            (car.rect.x, car.rect.y, ghost.quantize(car.facing()),
+             tracker.laps(car),
+             FINISHED * (car in finished) | POWER * bool(car.hasPower())
+             | ACTIVE * car.powerActive | CPU * car.isCPU)
+            for car in self.scene.cars], dtype=np.int16).reshape(
+                -1, len(COLUMNS))
+
+    # compresses a snapshot once, and queues it for every synced client
+    def broadcast(self):
+        states = self.states()
+        for connection in self.connections:
+            if len(connection.outbox) > BACKLOG:
+                connection.synced = False  # resent a keyframe once caught up
+        waiting = [connection for connection in self.connections
+                   if not connection.synced
+                   and len(connection.outbox) <= BACKLOG]
+        if waiting or self.base is None or self.base.shape != states.shape:
+            kind, rows = KEYFRAME, states
+            self.compressor = compressor()
+            for connection in waiting:
+                connection.synced = True
+        else:
+            kind, rows = DELTA, states - self.base
+        self.base = states
+        message = frame(kind + self.compressor.compress(
+            encode(self.steps, rows))
+            + self.compressor.flush(zlib.Z_SYNC_FLUSH))
+        for connection in list(self.connections):
+            if connection.synced:
+                connection.outbox += message
+                self.flush(connection)
+
+    def flush(self, connection):
+        try:
+            sent = connection.sock.send(connection.outbox)
+        except (BlockingIOError, InterruptedError):
+            sent = 0
+        except OSError:
+            self.drop(connection)
+            return
+        connection.sent += sent
+        del connection.outbox[:sent]
+        # only wait to write while there's something left to send
+        if bool(connection.outbox) != connection.writing:
+            connection.writing = bool(connection.outbox)
+            events = selectors.EVENT_READ
+            if connection.writing:
+                events |= selectors.EVENT_WRITE
+            self.selector.modify(connection.sock, events, connection)
+
+    # runs the race in real time, until interrupted
+    def serve(self):
+        interval = 1 / self.fps
+        due = time.perf_counter()
+        while True:
+            self.poll(max(0, due - time.perf_counter()))
+            if time.perf_counter() >= due:
+                self.step()
+                self.profiler.tick('tick')
+                due += interval
+
+
+class Client:
+    """a player connected to a server, and the snapshots it was sent"""
+
+    def __init__(self, address, rate=RATE, fps=FPS,
+                 interpolation=INTERPOLATION, clock=time.perf_counter):
+        self.sock = socket.create_connection(address)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock.setblocking(False)
+        self.fps = fps
+        self.delay = interpolation / rate  # seconds drawn behind
+        self.clock = clock
+        self.inbox = bytearray()
+        self.decompressor = None  # until the first keyframe
+        self.snapshots = collections.deque(maxlen=interpolation + 2)
+        self.offset = None  # local time less the server's, at its lowest
+        self.you = -1
+        self.received = 0  # bytes received
+
+    def close(self):
+        self.sock.close()
+
+    # sends controls, see CONTROLS
+    def send(self, turn, throttle, power=False):
+        message = CONTROLS.pack(int(round(127 * min(1, max(-1, turn)))),
+                                int(round(127 * min(1, max(-1, throttle)))),
+                                bool(power))
+        try:
+            self.sock.send(frame(message))
+        except (BlockingIOError, InterruptedError):
+            pass  # the server is behind; the next controls replace these
+
+    # reads the snapshots that have arrived, returns whether it's connected
+    def poll(self):
+        while True:
+            try:
+                data = self.sock.recv(65536)
+            except (BlockingIOError, InterruptedError):
+                return True
+            except OSError:
+                return False
+            if not data:
+                return False
+            self.received += len(data)
+            self.inbox += data
+            now = self.clock()
+            for message in unframe(self.inbox):
+                kind, body = message[:1], message[1:]
+                if kind == SEAT:
+                    self.you, = CAR.unpack(body)
+                    continue
+                if kind == KEYFRAME:
+                    self.decompressor = decompressor()
+                    base = None
+                elif self.decompressor is None:
+                    continue
+                else:
+                    base = self.snapshots[-1][1]
+                step, states = decode(self.decompressor.decompress(body),
+                                      base)
+                sent = step / self.fps
+                self.snapshots.append((sent, states))
+                if self.offset is None or now - sent < self.offset:
+                    self.offset = now - sent
+
+    # positions, angles in degrees, laps and flags of the cars, delay
+    # behind the latest snapshot, or None before the first one
+    def view(self, now=None):
+        if not self.snapshots:
+            return None
+        now = self.clock() if now is None else now
+        at = now - self.offset - self.delay  # in server time
+        before = after = self.snapshots[0]
+        for snapshot in self.snapshots:
+            if snapshot[0] <= at:
+                before = after = snapshot
+            else:
+                after = snapshot
+                break
+        (start, old), (end, new) = before, after
+        if old.shape != new.shape or end <= start:
+            old, alpha = new, 1
+        else:
+            alpha = min(1, max(0, (at - start) / (end - start)))
+        positions = old[:, :2] + alpha * (new[:, :2] - old[:, :2])
+        # turn the short way round
+        turn = (new[:, 2] - old[:, 2] + ghost.ANGLES // 2) % ghost.ANGLES \
+            - ghost.ANGLES // 2
+        angles = ghost.dequantize(old[:, 2] + alpha * turn) % 360
+        return positions, angles, new[:, 3], new[:, 4]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Host a race")
+    parser.add_argument('--host', default='',
+                        help="address to listen on (default: all)")
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--rate', type=int, default=RATE,
+                        help="snapshots per second")
+    args = parser.parse_args()
+    server = Server(args.host, args.port, args.rate)
+    print("Racing on {0}:{1}".format(*server.listen()[:2]))
+    try:
+        server.serve()
+    except KeyboardInterrupt:
+        print(server.profiler.report())
+    finally:
+        server.close()
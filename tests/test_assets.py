@@ -0,0 +1,39 @@
+import threading
+import pygame
+import assets
+
+NAMES = ['ball.png', 'bat.png']
+
+
+# building the archive on a cold start keeps the caller free: preload(),
+# ready() and progress() return while it is still being built
+def test_archive_built_off_the_caller(tmp_path, monkeypatch):
+    building, built = threading.Event(), threading.Event()
+    load = assets.load
+
+    def slowLoad(archive):
+        building.set()
+        built.wait(10)
+        return load(archive)
+    monkeypatch.setattr(assets, 'load', slowLoad)
+
+    loader = assets.Loader(archive=str(tmp_path / 'resources.pack'))
+    loader.preload(NAMES)
+    assert building.wait(10)
+    assert loader.progress(NAMES) == 0
+    assert not loader.ready('ball.png')
+    built.set()
+    ball = loader.image('ball.png')
+    assert loader.progress(NAMES) == 1
+    assert (tmp_path / 'resources.pack').exists()
+    assert ball.get_size() == pygame.image.load(assets.path('ball.png')) \
+        .get_size()
+
+
+def test_decodes_without_archive():
+    loader = assets.Loader(archive=None)
+    loader.preload(NAMES)
+    bat = loader.image('bat.png')
+    assert loader.image('bat.png') is bat
+    assert bat.get_size() == pygame.image.load(assets.path('bat.png')) \
+        .get_size()
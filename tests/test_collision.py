@@ -0,0 +1,45 @@
+import numpy as np
+import collision
+
+WALL = [30, -100, 10, 200]  # from x 30 to 40, taller than any move
+
+
+# a box moving into a wall stops against its face
+def test_stops_at_wall():
+    positions, hit = collision.resolve([[0, 0, 10, 10]], [[50, 0]], [WALL])
+    assert positions.tolist() == [[20, 0]]
+    assert hit.tolist() == [True]
+
+
+# the part of the move along the face is kept
+def test_slides_along_wall():
+    positions, hit = collision.resolve([[0, 0, 10, 10]], [[50, 20]], [WALL])
+    assert np.allclose(positions, [[20, 20]])
+    assert hit.tolist() == [True]
+
+
+# a move much longer than the obstacle is thick still hits it
+def test_fast_box_does_not_tunnel():
+    thin = [100, -100, 1, 200]
+    positions, hit = collision.resolve([[0, 0, 10, 10]], [[500, 0]], [thin])
+    assert positions.tolist() == [[90, 0]]
+    assert hit.tolist() == [True]
+
+
+# boxes that miss move the whole way, alongside ones that hit
+def test_misses_are_untouched():
+    boxes = [[0, 0, 10, 10], [0, 200, 10, 10], [50, 0, 10, 10]]
+    moves = [[50, 0], [50, 0], [20, 5]]
+    positions, hit = collision.resolve(boxes, moves, [WALL])
+    assert positions.tolist() == [[20, 0], [50, 200], [70, 5]]
+    assert hit.tolist() == [True, False, False]
+
+
+# only the boxes picked by near() are swept
+def test_near_picks_boxes():
+    def near(topLeft, bottomRight):
+        return np.zeros(len(topLeft), dtype=bool)
+    positions, hit = collision.resolve([[0, 0, 10, 10]], [[50, 0]], [WALL],
+                                       near=near)
+    assert positions.tolist() == [[50, 0]]
+    assert hit.tolist() == [False]
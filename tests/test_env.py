@@ -0,0 +1,37 @@
+import numpy as np
+import env
+
+
+# the races of a DrivingVecEnv play out as DrivingEnvs with their seeds
+def test_driving_vec_env_matches_single_envs():
+    k, steps = 3, 150
+    vec = env.DrivingVecEnv(k, maxSteps=100)
+    obs = vec.reset(seed=7)
+    seeds = [np.random.default_rng(s)
+             for s in np.random.SeedSequence(7).spawn(k)]
+    singles = [env.DrivingEnv(maxSteps=100) for i in range(k)]
+    for single, rng, row in zip(singles, seeds, obs):
+        assert np.array_equal(single.reset(int(rng.integers(2 ** 32))), row)
+
+    actions = np.random.default_rng(0).uniform(-1, 1, (steps, k, 3))
+    for step in range(steps):
+        obs, rewards, dones, infos = vec.step(actions[step])
+        for i, (single, rng) in enumerate(zip(singles, seeds)):
+            expected, reward, done, info = single.step(actions[step, i])
+            assert reward == rewards[i] and done == dones[i]
+            if done:
+                assert info['truncated'] and infos[i]['truncated']
+                assert np.array_equal(infos[i]['final_observation'],
+                                      expected)
+                expected = single.reset(int(rng.integers(2 ** 32)))
+            assert np.array_equal(obs[i], expected), (step, i)
+
+
+def test_driving_env_observation():
+    single = env.DrivingEnv()
+    obs = single.reset(seed=1)
+    assert obs.shape == (env.DrivingEnv.OBS_SIZE,)
+    car = single.scene.player
+    assert obs[0] == car.rect.centerx / env.DrivingEnv.SIZE[0]
+    assert obs[7:10].sum() == 1  # one terrain type
+    assert obs[10] == 0  # no laps yet
@@ -0,0 +1,54 @@
+import pygame
+import frameloop
+
+
+class Scene:
+    def __init__(self):
+        self.initialized = False
+        self.next = self
+        self.inputs = []
+
+    def ProcessInput(self, events, pressed_keys):
+        self.inputs.append((events, pressed_keys))
+
+    def Update(self):
+        pass
+
+    def Snapshot(self):
+        return None
+
+
+def event(key):
+    return pygame.event.Event(pygame.KEYDOWN, key=key)
+
+
+# events queued before the renderer initialises the scene reach its first step
+def test_input_waits_for_initialised_scene():
+    scene = Scene()
+    simulation = frameloop.Simulation(scene, None, 60)
+    simulation.push([event(pygame.K_UP)], 'first keys')
+    simulation.step()
+    assert scene.inputs == []
+    scene.initialized = True
+    simulation.push([event(pygame.K_DOWN)], 'second keys')
+    simulation.step()
+    [(events, pressed_keys)] = scene.inputs
+    assert [e.key for e in events] == [pygame.K_UP, pygame.K_DOWN]
+    assert pressed_keys == 'second keys'
+
+
+# the simulation never reads the keyboard itself: it waits for the main
+# thread's keys, then keeps the last ones when no input is queued
+def test_pressed_keys_come_from_main_thread(monkeypatch):
+    def get_pressed():
+        raise AssertionError('read the keyboard off the main thread')
+    monkeypatch.setattr(pygame.key, 'get_pressed', get_pressed)
+    scene = Scene()
+    scene.initialized = True
+    simulation = frameloop.Simulation(scene, None, 60)
+    simulation.step()
+    assert scene.inputs == []
+    simulation.push([], 'keys')
+    simulation.step()
+    simulation.step()
+    assert scene.inputs == [([], 'keys'), ([], 'keys')]
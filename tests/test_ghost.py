@@ -0,0 +1,49 @@
+import numpy as np
+import pygame
+import ghost
+import writer
+
+
+def test_quantize():
+    assert ghost.quantize(0) == 0
+    assert ghost.quantize(90) == ghost.ANGLES // 4
+    assert ghost.quantize(-90) == 3 * ghost.ANGLES // 4
+    assert ghost.quantize(360) == 0
+    assert ghost.dequantize(ghost.quantize(45)) == 45
+
+
+# poses come back exactly as recorded, past the buffer growing
+def test_save_load_round_trip(tmp_path):
+    path = str(tmp_path / 'ghost.npz')
+    rng = np.random.default_rng(0)
+    recording = ghost.Recording(capacity=16)
+    xs = np.cumsum(rng.integers(-15, 16, 100)) + 500
+    ys = np.cumsum(rng.integers(-15, 16, 100)) + 400
+    angles = rng.uniform(0, 360, 100)
+    for x, y, angle in zip(xs, ys, angles):
+        recording.record((x, y), angle)
+    recording.save(path, 42.5, 'oval.json', (1000, 800))
+    writer.writer.flush()
+
+    replay = ghost.load(path, 'oval.json', (1000, 800),
+                        pygame.Surface((30, 15)))
+    assert len(replay) == 100 and replay.time == 42.5
+    for step in range(100):
+        image, topleft = replay.pose(step)
+        assert topleft == (xs[step], ys[step])
+        assert image is replay.images[ghost.quantize(angles[step])]
+    assert replay.pose(100) is None
+
+
+# a ghost of another track or screen size is not raced against
+def test_load_other_track(tmp_path):
+    path = str(tmp_path / 'ghost.npz')
+    recording = ghost.Recording()
+    recording.record((10, 20), 0)
+    recording.save(path, 1.0, 'oval.json', (1000, 800))
+    writer.writer.flush()
+    image = pygame.Surface((30, 15))
+    assert ghost.load(path, 'other.json', (1000, 800), image) is None
+    assert ghost.load(path, 'oval.json', (800, 600), image) is None
+    assert ghost.load(str(tmp_path / 'missing.npz'), 'oval.json',
+                      (1000, 800), image) is None
@@ -0,0 +1,106 @@
+import pygame
+import laps
+
+
+class Thing:
+    """a car or checkpoint, as far as the tracker can tell"""
+
+    def __init__(self, name, rect):
+        self.name = name
+        self.rect = pygame.Rect(rect)
+
+
+def race(ncars=2, lapLimit=1):
+    checkpoints = [Thing('checkpoint {0}'.format(i), (100 * i, 0, 10, 10))
+                   for i in range(3)]
+    now = [0.0]
+    tracker = laps.LapTracker(checkpoints, lapLimit, clock=lambda: now[0])
+    cars = [Thing('car {0}'.format(i), (0, 0, 10, 10)) for i in range(ncars)]
+    for car in cars:
+        tracker.addCar(car)
+    tracker.start()
+    return tracker, checkpoints, cars, now
+
+
+# passes the checkpoints of a whole lap, returns whether it finished
+def lap(tracker, checkpoints, car):
+    finished = False
+    for checkpoint in checkpoints[1:] + checkpoints[:1]:
+        finished = tracker.passCheckpoint(car, checkpoint)
+    return finished
+
+
+# a car finishing on the frame it passes another is placed by its rank
+# even before update() reorders the race
+def test_telemetry_ranks_finished_cars_before_update():
+    tracker, checkpoints, (first, second), now = race()
+    tracker.update()
+    assert tracker.standings() == [first, second]
+    assert lap(tracker, checkpoints, second)
+    cars = tracker.telemetry()['cars']
+    assert [car['name'] for car in cars] == ['car 1', 'car 0']
+    assert [car['position'] for car in cars] == [1, 2]
+    assert tracker.progress[second].rank == 0
+
+
+# checkpoints only count in order: skipping one, or passing the last
+# again, changes nothing
+def test_pass_checkpoint_order():
+    tracker, checkpoints, (car, other), now = race()
+    assert tracker.nextCheckpoint(car) is checkpoints[1]
+    assert not tracker.passCheckpoint(car, checkpoints[2])
+    assert not tracker.passCheckpoint(car, checkpoints[0])
+    assert tracker.progress[car].checkpoint == 0
+    assert tracker.progress[car].sectors == [[]]
+    now[0] = 1.5
+    assert not tracker.passCheckpoint(car, checkpoints[1])
+    assert not tracker.passCheckpoint(car, checkpoints[1])
+    assert tracker.progress[car].checkpoint == 1
+    assert tracker.progress[car].sectors == [[1.5]]
+    assert tracker.nextCheckpoint(car) is checkpoints[2]
+    assert tracker.progress[other].checkpoint == 0
+
+
+# a lap counts on reaching the start again, and the race finishes on the
+# last one, with cars ranked in the order they finish
+def test_lap_counting_and_finishing_rank():
+    tracker, checkpoints, (first, second), now = race(lapLimit=2)
+    now[0] = 10.0
+    assert not lap(tracker, checkpoints, second)
+    assert tracker.laps(second) == 1
+    assert tracker.progress[second].lapTimes == [10.0]
+    assert len(tracker.progress[second].sectors) == 2
+    now[0] = 12.0
+    assert not lap(tracker, checkpoints, first)
+    now[0] = 15.0
+    assert lap(tracker, checkpoints, second)
+    assert tracker.progress[second].lapTimes == [10.0, 5.0]
+    now[0] = 30.0
+    assert lap(tracker, checkpoints, first)
+    assert tracker.progress[first].lapTimes == [12.0, 18.0]
+    assert tracker.finished == [second, first]
+    assert [tracker.progress[car].rank for car in (second, first)] == [0, 1]
+    # passing the start once more doesn't add a lap
+    lap(tracker, checkpoints, second)
+    assert tracker.laps(second) == 2
+    tracker.update()
+    assert tracker.standings() == [second, first]
+
+
+# update() orders cars by checkpoints passed, then by distance to the
+# next checkpoint, and only bumps the revision when the order changes
+def test_update_orders_by_progress_and_distance():
+    tracker, checkpoints, cars, now = race(ncars=3)
+    first, second, third = cars
+    third.rect.x = 50  # nearest to checkpoint 1
+    tracker.update()
+    assert tracker.standings() == [third, first, second]
+    assert tracker.changed
+    revision = tracker.revision
+    tracker.update()
+    assert not tracker.changed
+    assert tracker.revision == revision
+    tracker.passCheckpoint(second, checkpoints[1])
+    tracker.update()
+    assert tracker.standings() == [second, third, first]
+    assert tracker.position(first) == 3
@@ -0,0 +1,48 @@
+import json
+import leaderboard
+
+
+def board(tmp_path):
+    return leaderboard.Leaderboard(str(tmp_path / 'leaderboard.db'), delay=0)
+
+
+def race(results, time, cars=(), player='tester'):
+    results.recordRace(time, 1, 3, [time / 3] * 3, [[1.0], [1.0], [1.0]],
+                       list(cars), 'oval.json', 'MEDIUM', player=player)
+
+
+def test_races_by_time(tmp_path):
+    results = board(tmp_path)
+    for time in [31.0, 29.5, 30.2]:
+        race(results, time)
+    results.flush()
+    assert [row['time'] for row in
+            results.topRaces('oval.json', 'MEDIUM')] == [29.5, 30.2, 31.0]
+    best = results.personalBestRace('oval.json', 'MEDIUM', player='tester')
+    assert best['time'] == 29.5
+    assert json.loads(best['lapTimes']) == [29.5 / 3] * 3
+    results.close()
+
+
+# a row that can't be stored is reported, and the thread keeps recording
+def test_bad_row_keeps_recording(tmp_path, capsys):
+    results = board(tmp_path)
+    race(results, 30.0, cars=[object()])
+    race(results, 31.0)
+    results.flush()  # returns though a row failed
+    assert 'Cannot record' in capsys.readouterr().out
+    race(results, 32.0)
+    results.flush()
+    assert [row['time'] for row in
+            results.topRaces('oval.json', 'MEDIUM')] == [31.0, 32.0]
+    results.close()
+
+
+def test_record_after_close(tmp_path):
+    results = board(tmp_path)
+    race(results, 30.0)
+    results.close()
+    race(results, 31.0)
+    results.flush()
+    assert len(results.topRaces('oval.json', 'MEDIUM')) == 2
+    results.close()
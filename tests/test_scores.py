@@ -0,0 +1,64 @@
+import json
+import scores
+
+
+def store(path):
+    return scores.ScoreStore(str(path), delay=0)
+
+
+def test_keeps_best_score(tmp_path):
+    path = tmp_path / 'scores.json'
+    mine = store(path)
+    assert mine.submit('racing-best-time', 31.0, lower=True)
+    assert not mine.submit('racing-best-time', 32.0, lower=True)
+    assert mine.submit('racing-best-time', 30.0, lower=True)
+    assert mine.submit('copter-score', 120)
+    mine.flush()
+    assert json.loads(path.read_text()) == {'racing-best-time': 30.0,
+                                            'copter-score': 120}
+    assert sorted(p.name for p in tmp_path.iterdir()) == \
+        ['scores.json', 'scores.json.lock']
+    mine.close()
+
+
+# two games sharing the store keep the better of each score
+def test_merges_with_file_on_write(tmp_path):
+    path = tmp_path / 'scores.json'
+    first, second = store(path).load(), store(path).load()
+    first.submit('racing-best-time', 30.0, lower=True)
+    first.submit('copter-score', 100)
+    first.flush()
+    second.submit('racing-best-time', 35.0, lower=True)
+    second.submit('copter-score', 150)
+    second.flush()
+    assert json.loads(path.read_text()) == {'racing-best-time': 30.0,
+                                            'copter-score': 150}
+    # the file's better time wins in the second game's memory too
+    assert second.get('racing-best-time') == 30.0
+    first.close()
+    second.close()
+
+
+def test_reads_legacy_save(tmp_path):
+    (tmp_path / 'copter-score.save').write_text('Score,42\n')
+    assert store(tmp_path / 'scores.json').get('copter-score') == 42.0
+
+
+# a score that can't be saved is reported, and the thread keeps saving
+def test_failed_write_keeps_saving(tmp_path, capsys):
+    path = tmp_path / 'scores.json'
+    mine = store(path)
+    mine.submit('copter-score', object.__new__(Unserializable))
+    mine.flush()  # returns though the write failed
+    assert 'Cannot save scores' in capsys.readouterr().out
+    mine.submit('racing-best-time', 30.0, lower=True)
+    mine.flush()
+    assert json.loads(path.read_text())['racing-best-time'] == 30.0
+    mine.close()
+
+
+class Unserializable:
+    """beats anything, but can't be written as JSON"""
+
+    def __gt__(self, other):
+        return True
@@ -0,0 +1,60 @@
+import os
+import shutil
+import numpy as np
+import pygame
+import pytest
+import assets
+import track
+
+SIZE = (1000, 800)
+
+
+@pytest.fixture(scope='module')
+def oval(tmp_path_factory):
+    # compiled from a copy, so the cache stays out of tracks/
+    path = tmp_path_factory.mktemp('tracks') / 'oval.json'
+    shutil.copy(os.path.join(assets.HERE, 'tracks', 'oval.json'), path)
+    return track.load(str(path), SIZE)
+
+
+def test_checkpoints_in_rect(oval):
+    assert list(oval.checkpointsIn(pygame.Rect(40, 390, 30, 15))) == [0]
+    assert list(oval.checkpointsIn(pygame.Rect(500, 20, 30, 15))) == []
+    # clipped to the track
+    assert list(oval.checkpointsIn(pygame.Rect(-20, -10, 30, 15))) == [1]
+    # wholly off the track
+    assert list(oval.checkpointsIn(pygame.Rect(-38, -4, 3, 12))) == []
+
+
+# a fast car driving down the left of the oval crosses the 10 px finish
+# line whatever its position on the frame it gets there
+@pytest.mark.parametrize('speed', [14, 15])
+def test_fast_car_crosses_finish(oval, speed):
+    for phase in range(speed):
+        rect = pygame.Rect(50, 300 + phase, 15, 30)
+        hit = False
+        while rect.top < 500:
+            hit = hit or 0 in oval.checkpointsIn(rect)
+            rect.move_ip(0, speed)
+        assert hit, phase
+
+
+# the cell broad phase may flag rects near a checkpoint, but never misses
+# one with a checkpoint under it, and neither does underCars()
+def test_checkpoint_broad_phase(oval):
+    rng = np.random.default_rng(0)
+    rects = np.column_stack([rng.integers(-40, 1040, 2000),
+                             rng.integers(-40, 840, 2000),
+                             rng.integers(1, 40, 2000),
+                             rng.integers(1, 40, 2000)])
+    near = oval.nearCheckpoint(rects[:, :2], rects[:, :2] + rects[:, 2:])
+    terrain, nearKept = oval.underCars(rects)
+    assert terrain.shape == (2000, 5)
+    for rect, isNear, isNearKept in zip(rects, near, nearKept):
+        rect = pygame.Rect(*rect)
+        if len(oval.checkpointsIn(rect)):
+            assert isNear
+        kept = rect.clamp(pygame.Rect((0, 0), SIZE))
+        if len(oval.checkpointsIn(kept)):
+            assert isNearKept
+    assert near.sum() < len(rects)
@@ -0,0 +1,42 @@
+import writer
+
+
+def fail():
+    raise ValueError('cannot serialize')
+
+
+def test_save_replaces_file(tmp_path):
+    files = writer.Writer(delay=0)
+    path = tmp_path / 'saved.json'
+    files.save(str(path), b'first')
+    files.save(str(path), lambda: b'second')
+    files.flush()
+    assert path.read_bytes() == b'second'
+    assert [p.name for p in tmp_path.iterdir()] == ['saved.json']
+    files.close()
+
+
+# a save that raises is reported, and the thread keeps writing the rest
+def test_failed_save_keeps_writing(tmp_path, capsys):
+    files = writer.Writer(delay=0)
+    files.save(str(tmp_path / 'bad'), fail)
+    files.save(str(tmp_path / 'good'), b'good')
+    files.flush()  # returns though a save failed
+    assert 'cannot serialize' in capsys.readouterr().out
+    assert (tmp_path / 'good').read_bytes() == b'good'
+    assert not (tmp_path / 'bad').exists()
+    files.save(str(tmp_path / 'later'), b'later')
+    files.flush()
+    assert (tmp_path / 'later').read_bytes() == b'later'
+    files.close()
+
+
+# saves after the thread stopped start a new one instead of being lost
+def test_save_after_close(tmp_path):
+    files = writer.Writer(delay=0)
+    files.save(str(tmp_path / 'one'), b'1')
+    files.close()
+    files.save(str(tmp_path / 'two'), b'2')
+    files.flush()
+    assert (tmp_path / 'two').read_bytes() == b'2'
+    files.close()
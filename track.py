@@ -0,0 +1,417 @@
+"""data-driven race tracks
+
+A track is described by a JSON file in tracks/ (terrain shapes, checkpoint
+order, power-up spawners and the start grid) in the pixel coordinates of
+its design size. compile() bakes it for a given screen size into a binary
+cache next to it:
+
+    header    magic, then a JSON header of metadata and offsets
+    raster    uint8 per pixel, (height, width): the terrain type in the low
+              TERRAIN_BITS bits and the index of the checkpoint + 1 (or 0)
+              in the bits above
+    cells     uint8 bit mask of terrain types in each CELL x CELL cell,
+              and CHECKPOINT_CELL if a checkpoint is in it: the broad
+              phase of barrier collisions and checkpoint tests
+    image     the static background as RGB bytes
+    line      float32 racing line for CPU drivers, (samples, 2)
+
+load() memory-maps the cache (compiling it first if it is missing or
+stale) and views the arrays and the background image straight out of the
+mapping. Run `python track.py tracks/oval.json 1000x800` to bake a cache
+ahead of time.
+"""
+import os
+import sys
+import time
+import json
+import mmap
+import hashlib
+import pygame
+import numpy as np
+from enum import Enum
+import colors
+import driving
+import ai
+import geometry as geo
+
+MAGIC = b'BRTRACK1'
+VERSION = 5
+CELL = 16  # side of a collision grid cell, in pixels
+ALIGN = 64  # alignment of the arrays in the cache file
+TERRAIN_BITS = 3  # low bits of a raster value holding the terrain type
+TERRAIN_MASK = (1 << TERRAIN_BITS) - 1
+CHECKPOINT_CELL = 7  # bit of a cell's mask set if a checkpoint is in it
+
+
+class TerrainType(Enum):
+    ROAD = 0
+    GRASS = 1
+    BARRIER = 2
+
+
+TERRAIN_COLORS = {
+    TerrainType.ROAD: colors.GRAY,
+    TerrainType.GRASS: colors.DARK_GREEN,
+    TerrainType.BARRIER: colors.DARK_GRAY,
+}
+
+
+class Track:
+    """a compiled track, memory-mapped from its cache"""
+
+    def __init__(self, header, buffer):
+        self.buffer = buffer  # keeps the mapping alive
+        self.name = header['name']
+        self.size = tuple(header['size'])
+        self.shapes = header['shapes']
+        self.checkpointSpecs = header['checkpoints']
+        self.grid = header['grid']
+
+        raster = header['raster']
+        self.raster = np.frombuffer(buffer, dtype=np.uint8,
+                                    count=int(np.prod(raster['shape'])),
+                                    offset=raster['offset'])\
+            .reshape(raster['shape'])
+        cells = header['cells']
+        self.cell = cells['cell']
+        self.cells = np.frombuffer(buffer, dtype=np.uint8,
+                                   count=int(np.prod(cells['shape'])),
+                                   offset=cells['offset'])\
+            .reshape(cells['shape'])
+        self.barrierSums = self._sums(TerrainType.BARRIER.value)
+        self.checkpointSums = self._sums(CHECKPOINT_CELL)
+        image = header['image']
+        view = memoryview(buffer)[image['offset']:
+                                  image['offset'] + image['length']]
+        self.image = pygame.image.frombuffer(view, self.size, 'RGB')
+        line = header['line']
+        self.line = np.frombuffer(buffer, dtype=np.float32,
+                                  count=int(np.prod(line['shape'])),
+                                  offset=line['offset'])\
+            .reshape(line['shape'])
+
+    # background surface in the display's pixel format
+    def background(self):
+        return self.image.convert()
+
+    # bounding rects of the terrain shapes of a type
+    def rects(self, terrainType):
+        return [pygame.Rect(shape['bounds']) for shape in self.shapes
+                if shape['type'] == terrainType.name.lower()]
+
+    # boxes covering the terrain shapes of a type, as an (n, 4) array of
+    # left, top, width and height: a rect shape is one box, a polygon is
+    # broken into boxes of up to CELL x CELL pixels
+    def boxes(self, terrainType):
+        return np.array([box for shape in self.shapes
+                         if shape['type'] == terrainType.name.lower()
+                         for box in shape['boxes']]).reshape(-1, 4)
+
+    # checkpoint sprites in race order, the finish line first
+    def buildCheckpoints(self, clock=time.time, rng=None):
+        return buildCheckpoints(self.checkpointSpecs, clock, rng)
+
+    # n starting positions spread evenly along the start grid
+    def startPositions(self, n):
+        start = geo.Vector2D(*self.grid['from'])
+        end = geo.Vector2D(*self.grid['to'])
+        return [(start + (end - start) * ((i + 1) / (n + 1))).tuple()
+                for i in range(n)]
+
+    def startAngle(self):
+        return self.grid['angle']
+
+    # raster values at pixel coordinates, x and y can be arrays to read
+    # many points with one fancy-indexed read
+    def lookup(self, x, y):
+        height, width = self.raster.shape
+        return self.raster[np.minimum(np.maximum(y, 0), height - 1),
+                           np.minimum(np.maximum(x, 0), width - 1)]
+
+    def terrainAt(self, x, y):
+        return TerrainType(int(terrainOf(self.lookup(x, y))))
+
+    # for car rects, (n, 4): the terrain under the centre and corners of
+    # each, (n, 5), and whether a checkpoint may be under it once it is
+    # kept on the track, to be told by checkpointsIn()
+    def underCars(self, rects):
+        left, top, width, height = np.asarray(rects).T
+        right, bottom = left + width - 1, top + height - 1
+        centerX, centerY = left + width // 2, top + height // 2
+        terrain = terrainOf(self.lookup(
+            np.stack([centerX, left, right, left, right], axis=1),
+            np.stack([centerY, top, top, bottom, bottom], axis=1)))
+        trackHeight, trackWidth = self.raster.shape
+        left = np.minimum(np.maximum(left, 0), trackWidth - width)
+        top = np.minimum(np.maximum(top, 0), trackHeight - height)
+        return terrain, self._anyIn(self.checkpointSums, left, top,
+                                    left + width, top + height)
+
+    # indices of the checkpoints anywhere under a rect
+    def checkpointsIn(self, rect):
+        height, width = self.raster.shape
+        area = self.raster[max(rect.top, 0):max(min(rect.bottom, height), 0),
+                           max(rect.left, 0):max(min(rect.right, width), 0)]
+        return np.unique(checkpointOf(area[area >> TERRAIN_BITS > 0]))
+
+    # whether each box, given by (n, 2) arrays of its top-left and
+    # bottom-right corners, covers a grid cell with a barrier in it; a
+    # broad phase for collision.resolve()
+    def nearBarrier(self, topLeft, bottomRight):
+        return self._anyIn(self.barrierSums, *np.asarray(topLeft).T,
+                           *np.asarray(bottomRight).T)
+
+    # the same for cells with a checkpoint in them, before checkpointsIn()
+    def nearCheckpoint(self, topLeft, bottomRight):
+        return self._anyIn(self.checkpointSums, *np.asarray(topLeft).T,
+                           *np.asarray(bottomRight).T)
+
+    # cells with a bit of their mask set, summed over every top-left block
+    # of cells, so the cells under any rect are counted in four reads
+    def _sums(self, bit):
+        present = (self.cells >> bit) & 1
+        sums = np.zeros((present.shape[0] + 1, present.shape[1] + 1),
+                        dtype=np.int32)
+        sums[1:, 1:] = present.cumsum(0).cumsum(1)
+        return sums
+
+    # whether any cell counted in sums is under each box, from the
+    # coordinates of its edges
+    def _anyIn(self, sums, left, top, right, bottom):
+        rows, cols = self.cells.shape
+        cell = self.cell
+        left = np.minimum(np.maximum(left // cell, 0), cols).astype(int)
+        top = np.minimum(np.maximum(top // cell, 0), rows).astype(int)
+        right = np.minimum(np.maximum(-(-right // cell), 0), cols).astype(int)
+        bottom = np.minimum(np.maximum(-(-bottom // cell), 0), rows)\
+            .astype(int)
+        return sums[bottom, right] - sums[top, right] \
+            - sums[bottom, left] + sums[top, left] > 0
+
+
+# terrain type values from raster values
+def terrainOf(values):
+    return values & TERRAIN_MASK
+
+
+# checkpoint indices from raster values, -1 where there is no checkpoint
+def checkpointOf(values):
+    return (values >> TERRAIN_BITS).astype(int) - 1
+
+
+# checkpoint sprites from their (compiled) specs
+def buildCheckpoints(specs, clock=time.time, rng=None):
+    checkpoints = []
+    for spec in specs:
+        rect = pygame.Rect(spec['rect'])
+        if spec.get('finish', False):
+            checkpoint = driving.FinishLine(rect.center, rect.width,
+                                            rect.height,
+                                            rect.width >= rect.height,
+                                            clock=clock, rng=rng)
+        else:
+            checkpoint = driving.Checkpoint(rect.center, rect.width,
+                                            rect.height,
+                                            spec.get('powerups', False),
+                                            clock=clock, rng=rng)
+        checkpoints.append(checkpoint)
+    return checkpoints
+
+
+# path of the cache of a track compiled for a screen size
+def cachePath(path, size):
+    base, ext = os.path.splitext(path)
+    return '{0}.{1}x{2}.cache'.format(base, size[0], size[1])
+
+
+def load(path, size):
+    cache = cachePath(path, size)
+    with open(path, 'rb') as f:
+        digest = hashlib.sha1(f.read()).hexdigest()
+    header = _readHeader(cache)
+    if header is None or header['source'] != digest:
+        compile(path, size)
+        header = _readHeader(cache)
+
+    with open(cache, 'rb') as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return Track(header, buffer)
+
+
+def compile(path, size):
+    with open(path, 'rb') as f:
+        source = f.read()
+    spec = json.loads(source)
+    width, height = size
+    sx = width / spec['size'][0]
+    sy = height / spec['size'][1]
+
+    def scaleRect(rect):
+        return [round(rect[0] * sx), round(rect[1] * sy),
+                round(rect[2] * sx), round(rect[3] * sy)]
+
+    def scalePoint(point):
+        return [point[0] * sx, point[1] * sy]
+
+    # terrain type of each pixel, and the background drawn alongside it
+    raster = pygame.Surface(size, depth=8)
+    image = pygame.Surface(size)
+    backgroundType = TerrainType[spec.get('background', 'road').upper()]
+    raster.fill(backgroundType.value)
+    image.fill(TERRAIN_COLORS[backgroundType])
+
+    shapes = []
+    for shape in spec['terrain']:
+        terrainType = TerrainType[shape['type'].upper()]
+        if 'rect' in shape:
+            rect = pygame.Rect(scaleRect(shape['rect']))
+            pygame.draw.rect(raster, terrainType.value, rect)
+            bounds = pygame.draw.rect(image, TERRAIN_COLORS[terrainType], rect)
+            boxes = [[bounds.x, bounds.y, bounds.w, bounds.h]]
+        else:
+            points = [scalePoint(point) for point in shape['polygon']]
+            pygame.draw.polygon(raster, terrainType.value, points)
+            bounds = pygame.draw.polygon(image, TERRAIN_COLORS[terrainType],
+                                         points)
+            boxes = _boxes(points, bounds)
+        shapes.append({'type': shape['type'].lower(),
+                       'bounds': [bounds.x, bounds.y, bounds.w, bounds.h],
+                       'boxes': boxes})
+
+    checkpoints = [dict(checkpoint, rect=scaleRect(checkpoint['rect']))
+                   for checkpoint in spec['checkpoints']]
+    grid = dict(spec['grid'], **{'from': scalePoint(spec['grid']['from']),
+                                 'to': scalePoint(spec['grid']['to'])})
+
+    header = {'version': VERSION,
+              'source': hashlib.sha1(source).hexdigest(),
+              'name': spec.get('name', os.path.basename(path)),
+              'size': [width, height],
+              'shapes': shapes,
+              'checkpoints': checkpoints,
+              'grid': grid}
+
+    # checkpoints are part of the static background too
+    # and are marked in the raster above the terrain type
+    checkpointRaster = pygame.Surface(size, depth=8)
+    checkpointRaster.fill(0)
+    for i, checkpoint in enumerate(buildCheckpoints(checkpoints)):
+        image.blit(checkpoint.image, checkpoint.rect)
+        pygame.draw.rect(checkpointRaster, i + 1, checkpoint.rect)
+    if len(checkpoints) >= 1 << (8 - TERRAIN_BITS):
+        raise ValueError("Too many checkpoints in {0}".format(path))
+
+    terrain = np.ascontiguousarray(pygame.surfarray.array2d(raster).T,
+                                   dtype=np.uint8)
+    terrain |= np.ascontiguousarray(
+        pygame.surfarray.array2d(checkpointRaster).T,
+        dtype=np.uint8) << TERRAIN_BITS
+    cells = _cells(terrain)
+    pixels = pygame.image.tostring(image, 'RGB')
+    line = ai.racingLine([pygame.Rect(checkpoint['rect']).center
+                          for checkpoint in checkpoints]).astype(np.float32)
+
+    # lay out the arrays, then write the header in front of them
+    blobs = [('raster', terrain.tobytes(), {'shape': list(terrain.shape)}),
+             ('cells', cells.tobytes(), {'shape': list(cells.shape),
+                                         'cell': CELL}),
+             ('image', pixels, {'length': len(pixels)}),
+             ('line', line.tobytes(), {'shape': list(line.shape)})]
+    headerLength = 4096
+    while True:
+        offset = _align(len(MAGIC) + 4 + headerLength)
+        for name, blob, meta in blobs:
+            header[name] = dict(meta, offset=offset)
+            offset = _align(offset + len(blob))
+        encoded = json.dumps(header).encode('utf-8')
+        if len(encoded) <= headerLength:
+            break
+        headerLength = 2 * len(encoded)
+
+    # written aside and renamed into place, so load() never maps a
+    # half-written cache, even with another game compiling it too
+    cache = cachePath(path, size)
+    partial = '{0}.{1}.partial'.format(cache, os.getpid())
+    with open(partial, 'wb') as f:
+        f.write(MAGIC)
+        f.write(len(encoded).to_bytes(4, 'little'))
+        f.write(encoded)
+        for name, blob, meta in blobs:
+            f.seek(header[name]['offset'])
+            f.write(blob)
+    os.replace(partial, cache)
+
+
+# bit mask of the terrain types present in each collision grid cell,
+# and of whether a checkpoint is, from the raster
+def _cells(raster):
+    height, width = raster.shape
+    rows, cols = -(-height // CELL), -(-width // CELL)
+    padded = np.zeros((rows * CELL, cols * CELL), dtype=np.uint8)
+    padded[:height, :width] = raster
+    blocks = padded.reshape(rows, CELL, cols, CELL)
+    terrain = terrainOf(blocks)
+    cells = np.zeros((rows, cols), dtype=np.uint8)
+    for terrainType in TerrainType:
+        present = (terrain == terrainType.value).any(axis=(1, 3))
+        cells |= present.astype(np.uint8) << terrainType.value
+    checkpoint = (blocks >> TERRAIN_BITS).any(axis=(1, 3))
+    cells |= checkpoint.astype(np.uint8) << CHECKPOINT_CELL
+    return cells
+
+
+# boxes covering a polygon: the pixels it fills in each grid cell,
+# bounded tightly, with boxes of whole rows of cells joined up
+def _boxes(points, bounds):
+    mask = pygame.Surface(bounds.size, depth=8)
+    mask.fill(0)
+    pygame.draw.polygon(mask, 1, [(x - bounds.x, y - bounds.y)
+                                  for x, y in points])
+    filled = pygame.surfarray.array2d(mask).T.astype(bool)
+    boxes = []
+    for top in range(bounds.y - bounds.y % CELL, bounds.bottom, CELL):
+        row = filled[max(0, top - bounds.y):top + CELL - bounds.y]
+        run = None  # box being joined up along the row
+        for left in range(bounds.x - bounds.x % CELL, bounds.right, CELL):
+            block = row[:, max(0, left - bounds.x):left + CELL - bounds.x]
+            ys, xs = np.nonzero(block)
+            if len(ys) == 0:
+                run = None
+                continue
+            box = [max(left, bounds.x) + int(xs.min()),
+                   max(top, bounds.y) + int(ys.min()),
+                   int(xs.max() - xs.min()) + 1,
+                   int(ys.max() - ys.min()) + 1]
+            if run is not None and run[1] == box[1] and run[3] == box[3] \
+                    and run[0] + run[2] == box[0]:
+                run[2] += box[2]
+            else:
+                run = box
+                boxes.append(run)
+    return boxes
+
+
+def _align(offset):
+    return -(-offset // ALIGN) * ALIGN
+
+
+def _readHeader(cache):
+    try:
+        with open(cache, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                return None
+            length = int.from_bytes(f.read(4), 'little')
+            header = json.loads(f.read(length).decode('utf-8'))
+    except (OSError, ValueError):
+        return None
+    if header.get('version') != VERSION:
+        return None
+    return header
+
+
+if __name__ == '__main__':
+    pygame.init()
+    path, size = sys.argv[1], sys.argv[2]
+    size = tuple(int(x) for x in size.split('x'))
+    compile(path, size)
+    print("Compiled {0} to {1}".format(path, cachePath(path, size)))
@@ -0,0 +1,64 @@
+import pygame
+import numpy as np
+
+
+class Trail:
+    """fixed-capacity trail of points
+
+    Points live in a preallocated NumPy ring buffer that is written twice,
+    at i and i + capacity, so the points from oldest to newest are always
+    one contiguous slice. Appending is O(1) and points() is a view that can
+    be handed straight to pygame.draw without copying or shifting a list.
+    """
+    FADE_STEPS = 8  # number of shades a fading trail is drawn with
+
+    def __init__(self, capacity, fade=False):
+        self.capacity = capacity
+        self.fade = fade
+        self.buffer = np.zeros((2 * capacity, 2))
+        self.start = 0  # slot of the oldest point
+        self.length = 0
+
+    def __len__(self):
+        return self.length
+
+    def append(self, point):
+        slot = (self.start + self.length) % self.capacity
+        self.buffer[slot] = point
+        self.buffer[slot + self.capacity] = point
+        if self.length < self.capacity:
+            self.length += 1
+        else:
+            self.start = (self.start + 1) % self.capacity
+
+    def clear(self):
+        self.start = 0
+        self.length = 0
+
+    # view of the points, oldest first
+    def points(self):
+        return self.buffer[self.start:self.start + self.length]
+
+    # draws the trail as a polyline, fading older segments into fadeColor
+    def draw(self, screen, color, fadeColor=(0, 0, 0)):
+        drawPoints(screen, self.points(), color, fadeColor, self.fade)
+
+
+# draws trail points, oldest first, as a polyline
+def drawPoints(screen, points, color, fadeColor=(0, 0, 0), fade=False):
+    if len(points) < 2:
+        return
+    if not fade:
+        pygame.draw.aalines(screen, color, False, points)
+        return
+
+    # one polyline per shade, sharing their end points
+    steps = min(Trail.FADE_STEPS, len(points) - 1)
+    bounds = np.linspace(0, len(points) - 1, steps + 1).astype(int)
+    color = np.array(color, dtype=float)
+    fadeColor = np.array(fadeColor, dtype=float)
+    for i in range(steps):
+        t = (i + 1) / steps
+        shade = fadeColor * (1 - t) + color * t
+        pygame.draw.aalines(screen, shade, False,
+                            points[bounds[i]:bounds[i + 1] + 1])
@@ -1,5 +1,5 @@
 import pygame
-import os
+import assets
 from pygame.locals import *
 
 
@@ -24,14 +24,9 @@ def seesaw(lb, ub, frac):
     return lb * f + ub * (1 - f)
 
 
+# a copy of the shared image, so it can be changed freely
 def load_image(name, colorkey=None):
-    fullname = os.path.join('resources', name)
-    try:
-        image = pygame.image.load(fullname)
-    except pygame.error as message:
-        print('Cannot load image: {0}'.format(name))
-        raise SystemExit(message)
-    image = image.convert()
+    image = assets.image(name).convert()
     if colorkey is not None:
         if colorkey is -1:
             colorkey = image.get_at((0, 0))
@@ -44,22 +39,14 @@ def load_sound(name):
         def play(self): pass
     if not pygame.mixer:
         return NoneSound()
-    fullname = os.path.join('resources', name)
-    try:
-        sound = pygame.mixer.Sound(fullname)
-    except pygame.error as message:
-        print('Cannot load sound: {0}'.format(name))
-        raise SystemExit(message)
-    return sound
+    # sounds are shared, playing one again uses another channel
+    return assets.sound(name)
 
 
 class spritesheet(object):
+    # filename is relative to the resources directory, see assets
     def __init__(self, filename):
-        try:
-            self.sheet = pygame.image.load(filename).convert()
-        except pygame.error as message:
-            print('Unable to load spritesheet image: {0}'.format(filename))
-            raise SystemExit(message)
+        self.sheet = assets.image(filename)
 
     # Load a specific image from a specific rectangle
     def image_at(self, rectangle, colorkey = None):
@@ -86,15 +73,50 @@ class spritesheet(object):
         return self.images_at(tups, colorkey)
 
 
+# decoded animation clips, shared by every SpriteStripAnim over the same strip
+_clips = {}
+
+
+def load_clip(filename, rect, count, colorkey=None, size=None):
+    """Loads a strip of images once and returns it as an immutable tuple
+
+    filename, rect, count, and colorkey are the same arguments used
+    by spritesheet.load_strip. If size is given, every frame is
+    downscaled to that (width, height) once, at load time.
+
+    Clips are cached by their arguments, so callers must treat the
+    returned frames as read-only: copy a frame before drawing on it or
+    changing its alpha.
+    """
+    key = (filename, tuple(rect), tuple(count), colorkey,
+           None if size is None else tuple(size))
+    clip = _clips.get(key)
+    if clip is None:
+        ss = spritesheet(filename)
+        images = ss.load_strip(rect, count, colorkey)
+        if size is not None:
+            images = [pygame.transform.scale(image, size) for image in images]
+            if colorkey is not None:
+                for image in images:
+                    image.set_colorkey(image.get_colorkey(), RLEACCEL)
+        clip = tuple(images)
+        _clips[key] = clip
+    return clip
+
+
 class SpriteStripAnim(object):
     """sprite strip animator
 
     This class provides an iterator (iter() and next() methods), and a
     __add__() method for joining strips which comes in handy when a
     strip wraps to the next row.
+
+    The frames themselves live in a shared clip (see load_clip), so an
+    animator is only a cursor: a frame index and a tick counter.
     """
 
-    def __init__(self, filename, rect, count, colorkey=None, loop=False, frames=1):
+    def __init__(self, filename, rect, count, colorkey=None, loop=False,
+                 frames=1, size=None):
         """construct a SpriteStripAnim
 
         filename, rect, count, and colorkey are the same arguments used
@@ -105,10 +127,12 @@ class SpriteStripAnim(object):
 
         frames is the number of ticks to return the same image before
         the iterator advances to the next image.
+
+        size, if given, is the (width, height) to downscale the frames
+        to when the clip is first loaded.
         """
-        self.filename = os.path.join('resources', filename)
-        ss = spritesheet(self.filename)
-        self.images = ss.load_strip(rect, count, colorkey)
+        self.filename = assets.path(filename)
+        self.images = load_clip(filename, rect, count, colorkey, size)
         self.i = 0
         self.loop = loop
         self.frames = frames
@@ -133,18 +157,87 @@ class SpriteStripAnim(object):
         return image
 
     def __add__(self, ss):
-        self.images.extend(ss.images)
+        self.images = self.images + ss.images
         return self
 
 
 # Sprite class with a draw function
 class DrawSprite(pygame.sprite.Sprite):
+    layer = 0  # DrawGroups draw lower layers first
+
     def draw(self, screen):
         screen.blit(self.image, self.rect)
 
 
-# Group class that relies on the DrawSprite draw function
+# whether a sprite draws itself some other way than DrawSprite.draw
+def drawsItself(sprite):
+    return type(sprite).draw is not DrawSprite.draw
+
+
 class DrawGroup(pygame.sprite.Group):
-    def draw(self, screen):
-        for sprite in self.sprites():
-            sprite.draw(screen)
+    """Group class that relies on the DrawSprite draw function
+
+    Sprites are drawn by layer, then in the order they were added; the
+    order is kept until sprites are added or removed. Sprites that draw
+    the default way are gathered into one Surface.blits() call, and are
+    skipped if they lie outside the view rect, if one is given. Sprites
+    with their own draw() are called in turn, after the batch so far is
+    drawn, and never skipped, since they may draw outside their rect.
+
+    cull() kills the sprites that have left the view for good.
+    """
+
+    def __init__(self, *sprites):
+        self.order = None  # sprites in drawing order
+        self.culled = 0  # sprites killed by the last cull()
+        pygame.sprite.Group.__init__(self, *sprites)
+
+    def add_internal(self, sprite, layer=None):
+        pygame.sprite.Group.add_internal(self, sprite, layer)
+        self.order = None
+
+    def remove_internal(self, sprite):
+        pygame.sprite.Group.remove_internal(self, sprite)
+        self.order = None
+
+    # kills the sprites lying completely outside view, found with one rect
+    # test over the whole group, and returns them
+    def cull(self, view):
+        sprites = list(self.spritedict)
+        # rects touching the view are kept, like Viewport.isOutOfBounds()
+        visible = view.inflate(2, 2).collidelistall(
+            [sprite.rect for sprite in sprites])
+        culled = []
+        if len(visible) < len(sprites):
+            visible = set(visible)
+            culled = [sprite for i, sprite in enumerate(sprites)
+                      if i not in visible]
+            for sprite in culled:
+                sprite.kill()  # sprites may refuse, like lasers do
+        self.culled = len(culled)
+        return culled
+
+    # (sprite, whether it draws itself) by layer, then in insertion order
+    def ordered(self):
+        if self.order is None:
+            # sorting is stable, and sprites are kept in insertion order
+            sprites = sorted(self.spritedict,
+                             key=lambda sprite: sprite.layer)
+            self.order = [(sprite, drawsItself(sprite)) for sprite in sprites]
+        return self.order
+
+    def draw(self, screen, view=None):
+        batch = []
+        for sprite, custom in self.ordered():
+            if custom:
+                if batch:
+                    screen.blits(batch, False)
+                    batch = []
+                sprite.draw(screen)
+                continue
+            rect = sprite.rect
+            if view is not None and not view.colliderect(rect):
+                continue
+            batch.append((sprite.image, rect))
+        if batch:
+            screen.blits(batch, False)
@@ -0,0 +1,107 @@
+import pygame
+
+
+class Viewport:
+    """cached screen metrics
+
+    A scene owns one Viewport. It is filled once from the screen surface
+    in initGraphics and only changes when the window is resized, so
+    per-frame code and sprite constructors read the screen size from here
+    instead of querying the video driver with pygame.display.Info().
+
+    The screen a scene draws on is the render target of the Display, so
+    window coordinates (like the mouse position) have to be mapped into
+    it with toScene() or mousePos().
+    """
+
+    def __init__(self, screen):
+        self.resize(*screen.get_size())
+
+    # called whenever the scene's surface changes size
+    def resize(self, width, height):
+        self.width = width
+        self.height = height
+        self.rect = pygame.Rect(0, 0, width, height)
+
+    def size(self):
+        return self.width, self.height
+
+    # whether a rect lies completely outside the viewport
+    def isOutOfBounds(self, rect):
+        return rect.left > self.width \
+            or rect.right < 0 \
+            or rect.top > self.height \
+            or rect.bottom < 0
+
+    # maps a point in window coordinates to scene coordinates
+    def toScene(self, pos):
+        display = Display.current
+        if display is None:
+            return pos
+        return (int((pos[0] - display.dest.x) / display.scale),
+                int((pos[1] - display.dest.y) / display.scale))
+
+    # mouse position in scene coordinates
+    def mousePos(self):
+        return self.toScene(pygame.mouse.get_pos())
+
+
+class Display:
+    """resizable window presenting a fixed logical-resolution render target
+
+    Scenes draw on target, which is always the logical size, so gameplay
+    doesn't depend on the window or renderScale. present() scales it into
+    the window, letterboxed to keep the aspect ratio. Below a renderScale
+    of 1 it first shrinks the frame to reduced, renderScale times the
+    logical size, and scales that up: the window gets a quarter of the
+    pixels' detail at 0.5, and the upscale reads a quarter of the pixels.
+    The window-side layers are only rebuilt when the window is resized.
+    """
+    LETTERBOX_COLOR = (0, 0, 0)
+
+    # the display that is presenting, used to map window coordinates
+    current = None
+
+    def __init__(self, width, height, renderScale=1.0,
+                 flags=pygame.RESIZABLE):
+        self.logicalSize = (width, height)
+        self.renderScale = renderScale
+        self.window = pygame.display.set_mode((width, height), flags)
+        self.target = pygame.Surface((width, height)).convert()
+        self.reduced = None
+        if renderScale < 1:
+            self.reduced = pygame.Surface(
+                (max(1, round(width * renderScale)),
+                 max(1, round(height * renderScale)))).convert()
+        self.layout()
+        Display.current = self
+
+    # rebuilds the window-side layers, only needed after a resize
+    def layout(self):
+        windowWidth, windowHeight = self.window.get_size()
+        targetWidth, targetHeight = self.target.get_size()
+        self.scale = min(windowWidth / targetWidth,
+                         windowHeight / targetHeight)
+        self.dest = pygame.Rect(0, 0, max(1, round(targetWidth * self.scale)),
+                                max(1, round(targetHeight * self.scale)))
+        self.dest.center = windowWidth // 2, windowHeight // 2
+        self.window.fill(self.LETTERBOX_COLOR)
+        # region of the window the target gets scaled straight into
+        self.area = self.window.subsurface(self.dest)
+
+    # called on VIDEORESIZE
+    def resize(self):
+        self.window = pygame.display.get_surface()
+        self.layout()
+
+    def present(self):
+        frame = self.target
+        if self.reduced is not None:
+            pygame.transform.scale(frame, self.reduced.get_size(),
+                                   self.reduced)
+            frame = self.reduced
+        if self.dest.size == frame.get_size():
+            self.area.blit(frame, (0, 0))
+        else:
+            pygame.transform.scale(frame, self.dest.size, self.area)
+        pygame.display.flip()
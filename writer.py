@@ -0,0 +1,90 @@
+"""files saved off the game loop
+
+save() only queues a file's contents, or a function that makes them
+from data the caller won't change again: a writer thread writes queued
+files together, waiting up to scores.BATCH_DELAY for more after the
+first, and a file saved twice in a burst is written once, with the
+latest contents. Every file is written to a temporary file, fsynced and
+renamed over the old one, so a crash never leaves a half-written file.
+"""
+import os
+import queue
+import atexit
+import threading
+import scores
+
+
+# writes data to path all at once, as far as readers can tell
+def replace(path, data):
+    partial = '{0}.{1}.partial'.format(path, os.getpid())
+    with open(partial, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(partial, path)
+
+
+class Writer:
+    """files written on a background thread"""
+
+    def __init__(self, delay=scores.BATCH_DELAY):
+        self.delay = delay
+        self.queue = queue.Queue()
+        self.thread = None
+        self.writes = 0  # files written, for benchmarks
+        self.lock = threading.Lock()
+
+    # queues data to be written to path, as bytes or a function
+    # returning them, called on the writer's thread
+    def save(self, path, data):
+        with self.lock:
+            if self.thread is None:
+                atexit.register(self.close)
+            # started on first use, and again if it ever died
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run,
+                                               name='writer', daemon=True)
+                self.thread.start()
+        self.queue.put((path, data))
+
+    # waits until every saved file is written
+    def flush(self):
+        self.queue.join()
+
+    def close(self):
+        if self.thread is not None and self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+
+    def run(self):
+        running = True
+        while running:
+            items = scores.nextBatch(self.queue, self.delay)
+            running = items[-1] is not None
+            try:
+                self.write(items)
+            finally:
+                for item in items:
+                    self.queue.task_done()
+
+    # writes a batch of saves; a file that fails, even in the function
+    # making its contents, doesn't stop the others or the thread
+    def write(self, items):
+        latest = {}  # path -> data, the last saved wins
+        for item in items:
+            if item is not None:
+                path, data = item
+                latest[path] = data
+        for path, data in latest.items():
+            try:
+                replace(path, data() if callable(data) else data)
+                self.writes += 1
+            except Exception as message:
+                print('Cannot save {0}: {1}'.format(path, message))
+
+
+writer = Writer()
+
+
+def save(path, data):
+    writer.save(path, data)